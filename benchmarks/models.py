@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from ed_token.utils.models import Profile
+
+
+def _pydantic_profile() -> Optional[Callable[..., object]]:
+    try:
+        from pydantic import BaseModel
+    except ImportError:
+        return None
+
+    class PydanticProfile(BaseModel):
+        id: str
+        template: str = ""
+        content: Optional[Dict] = None
+
+    return PydanticProfile
+
+
+def _profile_contents(profiles: int) -> List[Dict]:
+    return [
+        {
+            "user": f"user{i}",
+            "template": "git push https://{?token}@github.com/{user}/repository.git",
+            "token": {"token": "dG9rZW4=", "cbc_iv": "aXY=", "padding_size": 11},
+        }
+        for i in range(profiles)
+    ]
+
+
+def measure(model: Callable[..., object], contents: List[Dict]) -> Dict:
+    start = time.perf_counter()
+    for i, content in enumerate(contents):
+        model(**{"id": f"profile{i}", "content": content})
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    profiles = [
+        model(**{"id": f"profile{i}", "content": content})
+        for i, content in enumerate(contents)
+    ]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del profiles
+
+    return {
+        "construct_us_per_profile": seconds / len(contents) * 1e6,
+        "bytes_per_profile": memory / len(contents),
+    }
+
+
+def run(profiles: int) -> Dict:
+    contents = _profile_contents(profiles)
+    results = {"benchmark": "models", "profiles": profiles}
+    results["slots"] = measure(Profile, contents)
+
+    pydantic_profile = _pydantic_profile()
+    if pydantic_profile is not None:
+        results["pydantic"] = measure(pydantic_profile, contents)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Profile construction cost and memory (python -m benchmarks.models)"
+    )
+    parser.add_argument("--profiles", type=int, default=10000)
+    parser.add_argument("--output", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    result = run(args.profiles)
+    print(json.dumps(result, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
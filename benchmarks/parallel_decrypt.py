@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict
+
+from ed_token import token_cipher
+from ed_token.token_cipher import SymTokenCipher
+
+
+def measure(records: Dict[str, Dict], workers: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        token_cipher._decrypted_tokens.clear()
+        start = time.perf_counter()
+        SymTokenCipher.decrypt_many(records, "bench-key", workers)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(tokens: int, token_size: int, repeat: int) -> Dict:
+    records = SymTokenCipher.encrypt_many(
+        {f"token{i}": "x" * token_size for i in range(tokens)}, "bench-key"
+    )
+    serial = measure(records, 1, repeat)
+    results = {
+        "benchmark": "parallel_decrypt",
+        "tokens": tokens,
+        "token_size": token_size,
+        "workers": {"1": {"seconds": serial, "speedup": 1.0}},
+    }
+    workers = 2
+    while workers <= max(os.cpu_count() or 1, 2):
+        seconds = measure(records, workers, repeat)
+        results["workers"][str(workers)] = {
+            "seconds": seconds,
+            "speedup": serial / seconds,
+        }
+        workers *= 2
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serial vs thread pool decryption "
+        "(python -m benchmarks.parallel_decrypt)"
+    )
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-size", type=int, default=256 * 1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    result = run(args.tokens, args.token_size, args.repeat)
+    print(json.dumps(result, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
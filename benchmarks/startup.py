@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Set, Tuple
+
+SUBCOMMANDS: Dict[str, List[str]] = {
+    "list": ["list"],
+    "profile get": ["profile", "get", "bench-profile", "-k", "user"],
+    "profile show": ["profile", "show", "bench-profile"],
+    "wallet close": ["wallet", "close", "bench-profile"],
+}
+
+FORBIDDEN_MODULES: Dict[str, Tuple[str, ...]] = {
+    "list": ("cryptography", "pydantic", "socketserver"),
+    "profile get": ("cryptography", "pydantic", "socketserver"),
+    "profile show": ("cryptography", "pydantic", "socketserver"),
+    "wallet close": ("cryptography", "pydantic", "socketserver"),
+}
+
+
+def _create_home(directory: str) -> None:
+    os.makedirs(f"{directory}/.edtoken/cache")
+    with open(f"{directory}/.edtoken/user_data.json", "w") as user_data:
+        json.dump(
+            {"bench-profile": {"user": "bench", "file": f"{directory}/wallet"}},
+            user_data,
+            indent=4,
+        )
+    with open(f"{directory}/.edtoken/cache/wallet", "w") as cached_wallet:
+        cached_wallet.write("user={user}")
+    with open(f"{directory}/wallet", "w") as wallet:
+        wallet.write("user=bench")
+
+
+def measure(home: str, argv: List[str]) -> Tuple[int, Set[str]]:
+    env = dict(os.environ, HOME=home)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "ed_token", *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    total_us, modules = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line[len("import time:") :].split("|")
+        total_us += int(self_us)
+        modules.add(module.strip())
+    return total_us, modules
+
+
+def run(repeat: int) -> Dict:
+    results: Dict[str, Dict] = {}
+    for name, argv in SUBCOMMANDS.items():
+        timings: List[int] = []
+        modules: Set[str] = set()
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as home:
+                _create_home(home)
+                total_us, modules = measure(home, argv)
+            timings.append(total_us)
+
+        forbidden = sorted(
+            module
+            for module in modules
+            if module.split(".")[0] in FORBIDDEN_MODULES.get(name, ())
+        )
+        results[name] = {
+            "import_us": min(timings),
+            "modules": len(modules),
+            "forbidden_modules": forbidden,
+        }
+    return {"benchmark": "startup", "subcommands": results}
+
+
+def find_regressions(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions: List[str] = []
+    for name, current in result["subcommands"].items():
+        if current["forbidden_modules"]:
+            regressions.append(f"{name} imports {current['forbidden_modules']}")
+
+        previous = baseline.get("subcommands", {}).get(name)
+        if previous and current["import_us"] > previous["import_us"] * (1 + tolerance):
+            regressions.append(
+                f"{name} import time {current['import_us']}us "
+                f"> baseline {previous['import_us']}us"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Import time of each CLI subcommand (python -m benchmarks.startup)"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help="Fail on regressions against this JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    result = run(args.repeat)
+    print(json.dumps(result, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+
+    baseline: Dict = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    regressions = find_regressions(result, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
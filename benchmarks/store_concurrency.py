@@ -0,0 +1,77 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from ed_token.edtoken import EDToken
+
+PROFILE = "bench-profile"
+
+
+def _writer(path: str, worker: int, writes: int) -> None:
+    for i in range(writes):
+        edtoken = EDToken(PROFILE, path)
+        edtoken.set_content_to_profile(f"worker{worker}", str(i + 1))
+        edtoken.set_content_to_profile("last", f"worker{worker}")
+        edtoken.save_profile()
+
+
+def run(writers: int, writes: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/user_data.json"
+        content: Dict = {f"worker{worker}": "0" for worker in range(writers)}
+        with open(path, "w") as user_data:
+            user_data.write(json.dumps({PROFILE: content}, indent=4))
+
+        processes = [
+            multiprocessing.Process(target=_writer, args=(path, worker, writes))
+            for worker in range(writers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        saved: Dict = EDToken(PROFILE, path).profile.get_dict()
+        expected_writes = writers * writes
+        return {
+            "benchmark": "store_concurrency",
+            "writers": writers,
+            "writes_per_writer": writes,
+            "seconds": elapsed,
+            "writes_per_second": expected_writes / elapsed,
+            "lost_updates": sum(
+                writes - int(saved[f"worker{worker}"]) for worker in range(writers)
+            ),
+            "failed_writers": sum(p.exitcode != 0 for p in processes),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Concurrent writers against one JSON store "
+        "(python -m benchmarks.store_concurrency)"
+    )
+    parser.add_argument("--writers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--writes", type=int, default=100)
+    parser.add_argument("--output", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    result = run(args.writers, args.writes)
+    print(json.dumps(result, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+
+    if result["lost_updates"] or result["failed_writers"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+from unittest.mock import patch
+
+from ed_token.edtoken import EDToken
+from ed_token import token_cipher
+from ed_token.token_cipher import SymTokenCipher, clear_caches
+from ed_token.utils import binary_storage, json_files, kdf, paths
+from ed_token.utils.binary_storage import BinaryStorage
+from ed_token.utils.json_files import JsonFiles
+from ed_token.utils.models import Cipher
+from ed_token.utils.render_cache import RenderCache
+from ed_token.utils.templates import CommandTemplate
+from ed_token.wallet import Wallet
+
+GROUPS = ("cipher", "template", "store", "edtoken", "wallet")
+KEY = "bench-key"
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+WALLET_LINE = "user={user} password={?token} host=db.example.com\n"
+KDF_PARAMS = kdf.new_params()
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for unit, multiplier in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[: -len(unit)]) * multiplier)
+    return int(value)
+
+
+def parse_list(value: str, parse: Callable[[str], int] = int) -> List[int]:
+    return [parse(item) for item in value.split(",") if item.strip()]
+
+
+def measure(
+    func: Callable[[], object], repeat: int, setup: Optional[Callable] = None
+) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _create_store(path: str, profiles: int) -> None:
+    record = SymTokenCipher("bench-token").encrypt(KEY, KDF_PARAMS)
+    content = {
+        f"profile{i}": {
+            "template": "echo {user} {?token}",
+            "user": f"user{i}",
+            "host": "db.example.com",
+            "token": record,
+        }
+        for i in range(profiles)
+    }
+    with open(path, "w") as f:
+        json.dump(content, f, indent=4)
+
+
+def _get_content(placeholders: int) -> Dict:
+    record = SymTokenCipher("bench-token").encrypt(KEY, KDF_PARAMS)
+    content: Dict = {}
+    parts: List[str] = []
+    for i in range(placeholders):
+        if i % 2:
+            content[f"token{i}"] = record
+            parts.append(f"{{?token{i}}}")
+        else:
+            content[f"key{i}"] = f"value{i}"
+            parts.append(f"{{key{i}}}")
+    content["template"] = "echo " + " ".join(parts)
+    return content
+
+
+def bench_cipher(placeholders: List[int], repeat: int) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {
+        "cipher.derive_key": {
+            "seconds": measure(
+                lambda: SymTokenCipher.derive_key(KEY, KDF_PARAMS),
+                repeat,
+                setup=clear_caches,
+            )
+        }
+    }
+    for tokens in placeholders:
+        plain = {f"token{i}": f"value{i}" for i in range(tokens)}
+        records = SymTokenCipher.encrypt_many(plain, KEY, KDF_PARAMS)
+        results[f"cipher.encrypt[tokens={tokens}]"] = {
+            "seconds": measure(
+                lambda: [
+                    SymTokenCipher(t).encrypt(KEY, KDF_PARAMS) for t in plain.values()
+                ],
+                repeat,
+            )
+        }
+        results[f"cipher.decrypt[tokens={tokens}]"] = {
+            "seconds": measure(
+                lambda: [
+                    SymTokenCipher.decrypt_record(record, KEY)
+                    for record in records.values()
+                ],
+                repeat,
+                setup=token_cipher._decrypted_tokens.clear,
+            )
+        }
+    return results
+
+
+def bench_template(placeholders: List[int], repeat: int) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    for count in placeholders:
+        content = _get_content(count)
+        template = CommandTemplate(cipher_type="sym", decrypt_key=KEY, content=content)
+        results[f"template.get_command[placeholders={count}]"] = {
+            "seconds": measure(
+                template.get_command,
+                repeat,
+                setup=token_cipher._decrypted_tokens.clear,
+            ),
+            "cached_seconds": measure(template.get_command, repeat),
+        }
+    return results
+
+
+def bench_store(profiles: List[int], repeat: int, directory: str) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    for count in profiles:
+        path = f"{directory}/store-{count}.json"
+        _create_store(path, count)
+        store = JsonFiles(path)
+        results[f"store.load[profiles={count}]"] = {
+            "seconds": measure(
+                lambda: JsonFiles(path), repeat, setup=json_files._parsed_stores.clear
+            ),
+            "bytes": os.path.getsize(path),
+        }
+        results[f"store.save[profiles={count}]"] = {
+            "seconds": measure(store.save_changes, repeat)
+        }
+
+        binary_path = f"{directory}/store-{count}.edb"
+        binary_store = BinaryStorage(binary_path, migrate_from=path)
+        profile_id = f"profile{count // 2}"
+
+        def binary_load():
+            BinaryStorage(binary_path).get_value(profile_id)
+
+        def binary_save():
+            binary_store.set_value(profile_id, {"user": "changed"})
+            binary_store.save_changes()
+
+        results[f"store.binary_load[profiles={count}]"] = {
+            "seconds": measure(
+                binary_load, repeat, setup=binary_storage._parsed_tables.clear
+            ),
+            "bytes": os.path.getsize(binary_path),
+        }
+        results[f"store.binary_save[profiles={count}]"] = {
+            "seconds": measure(binary_save, repeat)
+        }
+    return results
+
+
+def bench_edtoken(profiles: List[int], repeat: int, directory: str) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    for count in profiles:
+        path = f"{directory}/edtoken-{count}.json"
+        _create_store(path, count)
+        edtoken = EDToken(path=path)
+        profile_id = f"profile{count // 2}"
+
+        def create():
+            edtoken.initialize_profile("bench-new")
+            edtoken.set_content_to_profile("user", "bench")
+            edtoken.save_profile()
+
+        def update():
+            edtoken.set_content_to_profile("user", "changed")
+            edtoken.save_profile()
+
+        results[f"edtoken.create[profiles={count}]"] = {
+            "seconds": measure(create, repeat)
+        }
+        results[f"edtoken.read[profiles={count}]"] = {
+            "seconds": measure(lambda: edtoken.load_profile(profile_id), repeat)
+        }
+        edtoken.load_profile(profile_id)
+        results[f"edtoken.update[profiles={count}]"] = {
+            "seconds": measure(update, repeat)
+        }
+        results[f"edtoken.delete[profiles={count}]"] = {
+            "seconds": measure(
+                lambda: edtoken.remove_profile("bench-new"), repeat, setup=create
+            )
+        }
+    return results
+
+
+def _create_wallet_file(path: str, size: int) -> None:
+    lines_per_chunk = max(1, (1024 * 1024) // len(WALLET_LINE))
+    chunk = WALLET_LINE * lines_per_chunk
+    with open(path, "w") as f:
+        written = 0
+        while written + len(chunk) <= size:
+            f.write(chunk)
+            written += len(chunk)
+        f.write(WALLET_LINE * max(1, (size - written) // len(WALLET_LINE)))
+
+
+def bench_wallet(sizes: List[int], repeat: int, directory: str) -> Dict[str, Dict]:
+    edtoken = EDToken()
+    edtoken.initialize_profile("bench-profile")
+    edtoken.set_content_to_profile("user", "bench")
+    edtoken.set_content_to_profile("token", "bench-token", Cipher("sym", KEY))
+
+    results: Dict[str, Dict] = {}
+    with patch.object(paths, "cache", lambda: f"{directory}/cache"):
+        cache = RenderCache()
+        for size in sizes:
+            path = f"{directory}/wallet-{size}"
+            cache_path = f"{directory}/wallet-{size}.cache"
+            _create_wallet_file(path, size)
+
+            open_timings: List[float] = []
+            cached_timings: List[float] = []
+            close_timings: List[float] = []
+            for timings in (open_timings, cached_timings):
+                for _ in range(repeat):
+                    if timings is open_timings:
+                        cache.clear()
+                    start = time.perf_counter()
+                    Wallet(path, edtoken, cache_path).open_file(KEY)
+                    timings.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    Wallet(path, edtoken, cache_path).close_file()
+                    close_timings.append(time.perf_counter() - start)
+            results[f"wallet.open_file[bytes={size}]"] = {
+                "seconds": min(open_timings),
+                "mb_per_second": size / min(open_timings) / 1024 ** 2,
+                "cached_seconds": min(cached_timings),
+            }
+            results[f"wallet.close_file[bytes={size}]"] = {
+                "seconds": min(close_timings)
+            }
+            os.remove(path)
+    return results
+
+
+def run(
+    groups: List[str],
+    profiles: List[int],
+    placeholders: List[int],
+    wallet_sizes: List[int],
+    repeat: int,
+) -> Dict:
+    cases: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if "cipher" in groups:
+            cases.update(bench_cipher(placeholders, repeat))
+        if "template" in groups:
+            cases.update(bench_template(placeholders, repeat))
+        if "store" in groups:
+            cases.update(bench_store(profiles, repeat, directory))
+        if "edtoken" in groups:
+            cases.update(bench_edtoken(profiles, repeat, directory))
+        if "wallet" in groups:
+            cases.update(bench_wallet(wallet_sizes, repeat, directory))
+    return {"benchmark": "suite", "repeat": repeat, "cases": cases}
+
+
+def find_regressions(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions: List[str] = []
+    for name, current in result["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if previous and current["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{name} {current['seconds']:.6f}s "
+                f"> baseline {previous['seconds']:.6f}s"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Cipher, template, store, EDToken and wallet hot paths "
+        "(python -m benchmarks.suite)"
+    )
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--profiles", default="10,1000,10000")
+    parser.add_argument("--placeholders", default="1,10,100,1000")
+    parser.add_argument("--wallet-sizes", default="1KB,1MB,16MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", help="Fail on regressions against this JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help="Write the results to a JSON file")
+    args = parser.parse_args()
+
+    result = run(
+        args.only,
+        parse_list(args.profiles),
+        parse_list(args.placeholders),
+        parse_list(args.wallet_sizes, parse_size),
+        args.repeat,
+    )
+    print(json.dumps(result, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+
+    baseline: Dict = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    regressions = find_regressions(result, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,26 @@
-from ed_token.edtoken import EDToken
-from ed_token.token_cipher import AsymTokenCipher, SymTokenCipher
-from ed_token.wallet import Wallet
+from importlib import import_module
+from typing import Any
 
-__all__ = ["AsymTokenCipher", "SymTokenCipher", "Wallet", "EDToken"]
+_exports = {
+    "AsymTokenCipher": "ed_token.token_cipher",
+    "SymTokenCipher": "ed_token.token_cipher",
+    "Wallet": "ed_token.wallet",
+    "EDToken": "ed_token.edtoken",
+    "AsyncEDToken": "ed_token.aio",
+    "AsyncWallet": "ed_token.aio",
+}
+
+__all__ = [
+    "AsymTokenCipher",
+    "SymTokenCipher",
+    "Wallet",
+    "EDToken",
+    "AsyncEDToken",
+    "AsyncWallet",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_exports[name]), name)
@@ -1,21 +1,42 @@
 #!/usr/bin/env python3
 import argparse
 import getpass
-from subprocess import PIPE, Popen
+import os
+import sys
 from sys import path, stderr, stdin, stdout
-from typing import Any, Callable, Dict, Optional, Union
+from time import perf_counter, strftime
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from ed_token.edtoken import EDToken
-from ed_token.utils import paths
+from ed_token.utils import paths, timings
+from ed_token.utils.config import get_setting, set_setting, store_path
+from ed_token.utils.exceptions import AgentLocked, ProfileNotFound
 from ed_token.utils.json_files import JsonFiles
-from ed_token.utils.models import Cipher
-from ed_token.wallet import Wallet
+
+if TYPE_CHECKING:
+    from ed_token.runner import CommandSpec
+    from ed_token.utils.models import Cipher
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="EDToken commands", formatter_class=argparse.RawTextHelpFormatter
     )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print the time spent in each phase of the command",
+    )
     subparser = parser.add_subparsers(help="")
 
     wallet_parser = subparser.add_parser("wallet", help="Actions for using the wallet")
@@ -23,14 +44,85 @@ def parse_args() -> argparse.Namespace:
     wallet_group = wallet_parser.add_argument_group("Wallet")
     wallet_group.add_argument(
         "wallet_action",
-        choices=["open", "close"],
+        choices=["open", "close", "serve"],
         help=(
-            "\nopen   Decrypts file contents\n" "close  Re-encrypt file contents\n\n"
+            "\nopen   Decrypts file contents\n"
+            "close  Re-encrypt file contents\n"
+            "serve  Passes the decrypted files in memory to a command\n\n"
         ),
     )
+    wallet_group.add_argument(
+        "--fifo",
+        action="store_true",
+        help="Serve the files through named pipes instead of memfd buffers",
+    )
     wallet_group.add_argument(
         "profilename", help="Profile name to obtain the saved configurations"
     )
+    wallet_group.add_argument(
+        "command",
+        nargs=argparse.REMAINDER,
+        help="Command of serve, every {} argument is replaced by the file paths",
+    )
+
+    agent_parser = subparser.add_parser(
+        "agent", help="Keep unlocked profiles in memory between commands"
+    )
+    agent_parser.formatter_class = argparse.RawTextHelpFormatter
+    agent_group = agent_parser.add_argument_group("Agent")
+    agent_group.add_argument(
+        "agent_action",
+        choices=["start", "stop", "lock", "status"],
+        help=(
+            "\nstart   Starts the agent listening on EDTOKEN_AGENT_SOCK\n"
+            "stop    Stops the running agent\n"
+            "lock    Forgets all unlocked profiles\n"
+            "status  Shows if the agent is running\n\n"
+        ),
+    )
+    agent_group.add_argument(
+        "--ttl", type=float, help="Seconds that a profile stays unlocked (900)",
+    )
+
+    migrate_parser = subparser.add_parser(
+        "migrate", help="Re-encrypt old tokens with the current token format and KDF"
+    )
+    migrate_group = migrate_parser.add_argument_group("Migrate")
+    migrate_group.add_argument(
+        "migrate_profilename",
+        nargs="?",
+        help="Profile name to migrate, all profiles by default",
+    )
+
+    calibrate_parser = subparser.add_parser(
+        "calibrate", help="Tune the password key derivation to a latency budget"
+    )
+    calibrate_group = calibrate_parser.add_argument_group("Calibrate")
+    calibrate_group.add_argument(
+        "--budget",
+        dest="kdf_budget",
+        type=float,
+        help="Milliseconds to derive the key of a profile (100)",
+    )
+    calibrate_group.add_argument(
+        "--kdf",
+        choices=["scrypt", "pbkdf2-sha256"],
+        default="scrypt",
+        help="Key derivation function",
+    )
+
+    export_parser = subparser.add_parser("export", help="Export the whole store")
+    export_group = export_parser.add_argument_group("Export")
+    export_format = export_group.add_mutually_exclusive_group()
+    export_format.add_argument(
+        "--json", action="store_true", help="Human readable JSON (default)"
+    )
+    export_format.add_argument(
+        "--binary", action="store_true", help="Compact binary store, needs -o"
+    )
+    export_group.add_argument(
+        "-o", "--output", dest="export_output", help="File path, stdout by default"
+    )
 
     list_parser = subparser.add_parser("list", help="Show all saved profiles")
     list_group = list_parser.add_argument_group("List")
@@ -44,10 +136,11 @@ def parse_args() -> argparse.Namespace:
 
     profile_actions_group.add_argument(
         "profile_action",
-        choices=["add", "set", "get", "remove", "show", "exec"],
+        choices=["add", "set", "import", "get", "remove", "show", "exec"],
         help=(
             "\nadd          Add a EDToken profile\n"
             "set          Set profile values using key and encryptation algorithms\n"
+            "import       Set many values from a dotenv or JSON file or pipe\n"
             "get          Get a profile value\n"
             "remove       Removes a profile or keys in the profile\n"
             "show         Show the profile data\n"
@@ -55,7 +148,12 @@ def parse_args() -> argparse.Namespace:
         ),
     )
     profile_actions_group.add_argument(
-        "profilename", help="Profile name to obtain the saved configurations"
+        "profilename",
+        nargs="+",
+        help=(
+            "Profile name to obtain the saved configurations, exec accepts\n"
+            "several names or glob patterns"
+        ),
     )
 
     profile_actions_group.add_argument(
@@ -65,6 +163,11 @@ def parse_args() -> argparse.Namespace:
     profile_actions_group.add_argument(
         "-i", "--input", help="Set a value for the dictionary using a file or pipe",
     )
+    profile_actions_group.add_argument(
+        "-e",
+        "--encrypt",
+        help="Comma separated keys to encrypt on import (all keys by default)",
+    )
     profile_actions_group.add_argument(
         "--sym", action="store_true", help="Symetric key to encrypt or decrypt value"
     )
@@ -73,9 +176,42 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Uses asymetric encryptation to encrypt value",
     )
+    profile_actions_group.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Threads used to decrypt the tokens (workers setting or 1)",
+    )
+    profile_actions_group.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Profiles executed at the same time by exec (jobs setting or 4)",
+    )
+    profile_actions_group.add_argument(
+        "--blob",
+        action="store_true",
+        help="Encrypt the input in chunks to a file in ~/.edtoken/blobs",
+    )
+    profile_actions_group.add_argument(
+        "--no-shell",
+        action="store_true",
+        help="Split the template into arguments and run it without a shell",
+    )
+    profile_actions_group.add_argument(
+        "--secrets",
+        choices=["argv", "env", "stdin"],
+        default="argv",
+        help=(
+            "How exec passes the encrypted values: in the command line,\n"
+            "as EDTOKEN_<KEY> variables or as stdin lines (argv)"
+        ),
+    )
     profile_actions_group.add_argument("--temp", help="Set a command template")
     profile_actions_group.add_argument(
-        "--file", help="Set the file path in the profile"
+        "--file",
+        nargs="+",
+        help="Set the file paths or glob patterns of the wallet in the profile",
     )
     profile_actions_group.add_argument(
         "-rfp", "--rmfromprofile", help="Remove a key in the profile"
@@ -95,47 +231,154 @@ def _show_input_hiding(msg: str) -> str:
     return getpass.getpass(msg)
 
 
-def _get_input(args_value: str) -> Any:
-    if not stdin.isatty():
-        return stdin.read()
-    else:
-        with open("args_value", "r") as f:
+def _get_input(args_value: Optional[str]) -> Optional[str]:
+    if args_value is not None and args_value != "-":
+        with open(args_value, "r") as f:
             return f.read()
+    elif args_value == "-" or not stdin.isatty():
+        return stdin.read()
+    return None
+
+
+def _request_agent(op: str, profile: str, **params) -> Tuple[bool, Any]:
+    if not os.path.exists(paths.agent_socket()):
+        return False, None
+
+    from ed_token.agent import AgentClient
+
+    client: Optional[AgentClient] = AgentClient.connect()
+    if client is None:
+        return False, None
+
+    try:
+        try:
+            return True, client.request(op, profile=profile, **params)
+        except AgentLocked:
+            password: str = _show_input_hiding("Enter a password: ")
+            client.request("unlock", profile=profile, password=password)
+            return True, client.request(op, profile=profile, **params)
+    finally:
+        client.close()
+
+
+def _get_workers(args: argparse.Namespace) -> int:
+    return args.workers if args.workers else get_setting("workers", 1)
+
+
+def _get_jobs(args: argparse.Namespace) -> int:
+    from ed_token.runner import DEFAULT_JOBS
+
+    return args.jobs if args.jobs else get_setting("jobs", DEFAULT_JOBS)
+
+
+def _is_many_profiles(patterns: List[str]) -> bool:
+    from glob import has_magic
+
+    return len(patterns) > 1 or has_magic(patterns[0])
+
 
+def _resolve_profiles(patterns: List[str]) -> List[str]:
+    from fnmatch import fnmatchcase
+    from glob import has_magic
 
-def exists_crypted_values(edtoken: EDToken) -> bool:
-    return edtoken.profile.get_token("crypted-values") > 0
+    all_profiles: List[str] = EDToken(path=store_path()).get_all_profiles()
+    profile_ids: Dict[str, None] = {}
+    for pattern in patterns:
+        if not has_magic(pattern):
+            profile_ids[pattern] = None
+            continue
+
+        matches = [p for p in all_profiles if fnmatchcase(p, pattern)]
+        if not matches:
+            raise ProfileNotFound(f"No profile matches '{pattern}'")
+        profile_ids.update(dict.fromkeys(matches))
+    return list(profile_ids)
+
+
+def _get_cipher(args: argparse.Namespace, edtoken: EDToken) -> "Cipher":
+    from ed_token.utils.models import Cipher
+
+    if args.asym:
+        # New profiles only need the public key, next tokens reuse the profile key.
+        cipher_key: str = ""
+        if edtoken.get_envelope() is not None:
+            cipher_key = _show_input_hiding("Enter a password: ")
+        return Cipher(**{"type": "asym", "key": cipher_key})
+
+    cipher_key = _show_input_hiding("Enter a password: ")
+    return Cipher(**{"type": "sym", "key": cipher_key})
+
+
+def _open_binary_input(args_value: Optional[str]) -> IO[bytes]:
+    if args_value is not None and args_value != "-":
+        return open(args_value, "rb")
+    elif args_value == "-" or not stdin.isatty():
+        return os.fdopen(os.dup(stdin.fileno()), "rb")
+    raise RuntimeError("Set the blob with -i <file> or a pipe")
 
 
 def command_set(args: argparse.Namespace, edtoken: EDToken):
+    from ed_token.blobs import is_blob, remove_blob
+
+    if args.blob:
+        if not (args.sym or args.asym):
+            raise RuntimeError("Blobs must be encrypted, pls use --sym or --asym")
+        with _open_binary_input(args.input) as source:
+            previous = edtoken.set_blob(args.key, source, _get_cipher(args, edtoken))
+        edtoken.save_profile()
+        if is_blob(previous):
+            remove_blob(previous)
+        return
+
     k: str = args.key
-    v: str = args.value
-    crypted_values: int = edtoken.profile.get_token("crypted-values")
-    crypted_values += int(any([args.sym, args.asym]))
-
-    if args.sym:
-        token: str = _show_input_hiding("Enter a token: ")
-        cipher_key: str = _show_input_hiding("Enter a password: ")
-        edtoken.set_content_to_profile(
-            k, token, Cipher(**{"type": "sym", "key": cipher_key})
-        )
-    elif args.asym:
-        raise NotImplementedError()
+    v: str = args.value if args.input is None else _get_input(args.input)
+
+    if args.sym or args.asym:
+        token: str = v if v is not None else _show_input_hiding("Enter a token: ")
+        edtoken.set_content_to_profile(k, token, _get_cipher(args, edtoken))
     elif args.temp is not None:
         edtoken.set_template(args.temp)
     elif args.file is not None:
-        edtoken.set_content_to_profile("file", args.file)
+        file_setting = args.file[0] if len(args.file) == 1 else args.file
+        edtoken.set_content_to_profile("file", file_setting)
     elif k is not None and v is not None:
         edtoken.set_content_to_profile(k, v)
 
-    edtoken.set_content_to_profile("crypted-values", crypted_values)
+    edtoken.save_profile()
+
+
+def command_import(args: argparse.Namespace, edtoken: EDToken) -> None:
+    from ed_token.utils.env_files import parse_mapping
+    from ed_token.utils.models import Cipher
+
+    if edtoken.profile is None:
+        print(f"The profile '{args.profilename}' does not exists")
+        return
+
+    content: Optional[str] = _get_input(args.input)
+    if content is None:
+        raise RuntimeError("Set the values to import with -i <file> or a pipe")
+
+    cipher: Optional[Cipher] = None
+    encrypt_keys: Optional[List[str]] = None
+    if args.encrypt is not None:
+        encrypt_keys = [key.strip() for key in args.encrypt.split(",")]
+
+    if args.sym or args.asym:
+        cipher = _get_cipher(args, edtoken)
+    elif encrypt_keys is not None:
+        raise RuntimeError(
+            "Select a cipher to encrypt the keys, pls use --sym or --asym"
+        )
+
+    edtoken.set_many(parse_mapping(content), cipher, encrypt_keys)
     edtoken.save_profile()
 
 
 def command_add(args: argparse.Namespace, edtoken: EDToken) -> None:
     if edtoken.profile is None:
         edtoken.initialize_profile(args.profilename)
-        edtoken.set_content_to_profile("crypted-values", 0)
+        edtoken.profile.get_index()
         edtoken.save_profile()
     else:
         print(f"The profile {args.profilename} already exists")
@@ -167,52 +410,288 @@ def command_show(args: argparse.Namespace, edtoken: EDToken) -> None:
         print(f"The profile '{args.profilename}' does not exists")
 
 
+def _get_command_spec(
+    args: argparse.Namespace, edtoken: EDToken, get_password: Callable[[], str]
+) -> "CommandSpec":
+    from ed_token.runner import build_command
+
+    profile = edtoken.profile
+    missing_keys: List[str] = profile.get_missing_keys()
+    if missing_keys:
+        raise KeyError(f"Keys not found in {profile.id}: {missing_keys}")
+
+    records: Dict[str, Dict] = profile.get_template_records()
+    cipher_type: Optional[str] = "sym" if args.sym else "asym" if args.asym else None
+    other_keys: List[str] = [
+        key for key, record in records.items() if record["cipher"] != cipher_type
+    ]
+    if cipher_type is not None and other_keys:
+        raise RuntimeError(
+            f"Keys of {profile.id} not encrypted with {cipher_type}: {other_keys}"
+        )
+
+    crypted_keys: List[str] = list(records)
+    decrypted_tokens: Dict[str, str] = {}
+    if crypted_keys:
+        found, decrypted_tokens = _request_agent(
+            "decrypt", edtoken.profile_id, keys=crypted_keys
+        )
+        if not found:
+            decrypted_tokens = profile.decrypt_many(
+                crypted_keys, get_password(), _get_workers(args)
+            )
+
+    return build_command(
+        profile.get_token("template") or "",
+        profile.content,
+        decrypted_tokens,
+        shell=not args.no_shell,
+        secrets=args.secrets,
+    )
+
+
+def _password_prompt() -> Callable[[], str]:
+    passwords: List[str] = []
+
+    def get_password() -> str:
+        if not passwords:
+            passwords.append(_show_input_hiding("Enter a password: "))
+        return passwords[0]
+
+    return get_password
+
+
 def command_exec(args: argparse.Namespace, edtoken: EDToken) -> None:
-    cipher_type: Optional[str] = None
-    key_cert: Optional[str] = None
+    from ed_token.runner import get_exit_status
 
-    if args.sym is not None:
-        cipher_type = "sym"
-        key_cert = _show_input_hiding("Enter a password: ")
-    elif args.asym is not None:
-        raise NotImplementedError()
-    elif exists_crypted_values(edtoken):
-        raise RuntimeError("Template includes an encrypted token, pls select a cipher.")
+    spec = _get_command_spec(args, edtoken, _password_prompt())
+    print(f"Command executed: {spec.display}", flush=True)
+    with timings.span("exec.spawn"):
+        proc = spec.popen()
+    returncode: int = proc.wait()
+    if returncode:
+        sys.exit(get_exit_status(returncode))
 
-    command: str = edtoken.profile.get_template(cipher_type=cipher_type, key=key_cert)
-    print(f"Command executed: {command}")
-    proc = Popen(command, shell=True)
+
+def command_exec_many(args: argparse.Namespace, profile_ids: List[str]) -> None:
+    from ed_token.runner import PrefixedOutput, format_summary, run_commands
+
+    edtoken: EDToken = EDToken(path=store_path())
+    get_password: Callable[[], str] = _password_prompt()
+    specs: Dict[str, CommandSpec] = {}
+    for profile_id in profile_ids:
+        if edtoken.load_profile(profile_id) is None:
+            raise ProfileNotFound(f"The profile '{profile_id}' does not exists")
+        specs[profile_id] = _get_command_spec(args, edtoken, get_password)
+
+    output = PrefixedOutput()
+    for profile_id, spec in specs.items():
+        output.write(profile_id, f"Command executed: {spec.display}", stdout)
+    with timings.span("exec.run"):
+        results = run_commands(specs, _get_jobs(args), output)
+
+    print(format_summary(results), file=stderr)
+    if any(result.returncode for result in results):
+        sys.exit(1)
 
 
 def command_get(args: argparse.Namespace, edtoken: EDToken) -> None:
+    from ed_token.blobs import is_blob, iter_blob
+
     key: str = args.key
     value: Union[str, int, None] = edtoken.profile.get_token(key)
 
+    if (args.sym or args.asym) and is_blob(value):
+        password: str = _show_input_hiding("Enter a password: ")
+        for data in iter_blob(value, password):
+            stdout.buffer.write(data)
+        stdout.buffer.flush()
+        return
+    elif (args.sym or args.asym) and type(value) == dict:
+        found, value = _request_agent("get", edtoken.profile_id, key=key)
+        if not found:
+            password = _show_input_hiding("Enter a password: ")
+            value = edtoken.profile.decrypt_many([key], password)[key]
+
     if value is not None:
         print(value, file=stdout)
     else:
         print(None, file=stderr)
 
 
-def command_wallet(edtoken: EDToken) -> None:
-    file_path: Optional[str] = edtoken.profile.get_token("file")
+def _get_wallet_keys(edtoken: EDToken) -> List[str]:
+    blob_keys: List[str] = edtoken.profile.get_blob_keys()
+    return [key for key in edtoken.profile.get_crypted_keys() if key not in blob_keys]
+
+
+def command_wallet(args: argparse.Namespace, edtoken: EDToken) -> None:
+    if edtoken.profile.get_token("file") is None:
+        raise RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
 
-    if file_path is None:
-        RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
+    from ed_token.wallet import open_wallet
+
+    found, decrypted_tokens = _request_agent(
+        "decrypt", edtoken.profile_id, keys=_get_wallet_keys(edtoken)
+    )
+    if found:
+        open_wallet(edtoken, "", decrypted_tokens=decrypted_tokens)
+        return
 
-    wallet: Wallet = Wallet(file_path, edtoken)
     key: str = _show_input_hiding("Key to decrypt file: ")
-    wallet.open_file(key)
+    open_wallet(edtoken, key)
+
+
+def command_closewallet(args: argparse.Namespace, edtoken: EDToken) -> None:
+    from ed_token.wallet import close_wallet
+
+    close_wallet(edtoken)
+
+
+def command_serve(args: argparse.Namespace, edtoken: EDToken) -> None:
+    from ed_token.runner import get_exit_status
+    from ed_token.wallet import WalletServer
 
+    command: List[str] = args.command
+    if command[:1] == ["--"]:
+        command = command[1:]
+    server = WalletServer(edtoken, mode="fifo" if args.fifo else None)
+
+    key: str = ""
+    crypted_keys: List[str] = _get_wallet_keys(edtoken)
+    if crypted_keys:
+        found, server.decrypted_tokens = _request_agent(
+            "decrypt", edtoken.profile_id, keys=crypted_keys
+        )
+        if not found:
+            key = _show_input_hiding("Key to decrypt file: ")
+
+    returncode: int = server.serve(key, command)
+    if returncode:
+        sys.exit(get_exit_status(returncode))
+
+
+def _read_store() -> Dict:
+    from ed_token.utils.storage import open_storage
+
+    with open_storage(store_path()) as storage:
+        return {name: storage.get_value(name) for name in storage.list_keys()}
+
+
+def _backup_store() -> str:
+    backup_path: str = f"{store_path()}.{strftime('%Y%m%d%H%M%S')}.bak.json"
+    fd: int = os.open(backup_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(JsonFiles.pretty_print(_read_store()) + "\n")
+    return backup_path
 
-def command_closewallet(edtoken: EDToken) -> None:
-    file_path: Optional[str] = edtoken.profile.get_token("file")
 
-    if file_path is None:
-        RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
+def command_export(args: argparse.Namespace) -> None:
+    from ed_token.utils.storage import BINARY_EXTENSIONS
 
-    wallet: Wallet = Wallet(file_path, edtoken)
-    wallet.close_file()
+    content: Dict = _read_store()
+
+    if args.binary:
+        from ed_token.utils.binary_storage import BinaryStorage
+
+        output: Optional[str] = args.export_output
+        if output is None or os.path.splitext(output)[1] not in BINARY_EXTENSIONS:
+            raise RuntimeError(
+                f"Set the binary store path with -o <path>{BINARY_EXTENSIONS[0]}"
+            )
+        with BinaryStorage(output, migrate_from="") as binary_storage:
+            for name in binary_storage.list_keys():
+                binary_storage.remove_key(name)
+            for name, value in content.items():
+                binary_storage.set_value(name, value)
+    elif args.export_output is not None:
+        with open(args.export_output, "w") as f:
+            f.write(JsonFiles.pretty_print(content) + "\n")
+    else:
+        print(JsonFiles.pretty_print(content), file=stdout)
+
+
+def command_calibrate(args: argparse.Namespace) -> None:
+    from ed_token.utils import kdf
+
+    budget: float = args.kdf_budget
+    if budget is None:
+        budget = get_setting("kdf_budget_ms", kdf.DEFAULT_BUDGET_MS)
+
+    params: Dict = kdf.calibrate(budget, args.kdf)
+    set_setting("kdf", params)
+    set_setting("kdf_budget_ms", budget)
+    print(f"KDF parameters: {params} ({kdf.measure(params) * 1000:.1f} ms)")
+
+
+def command_agent(args: argparse.Namespace) -> None:
+    from ed_token.agent import AGENT_TTL, Agent, AgentClient
+
+    if args.agent_action == "start":
+        ttl: float = args.ttl if args.ttl is not None else AGENT_TTL
+        agent: Agent = Agent(store_path(), ttl=ttl)
+        agent.bind()
+        print(f"EDTOKEN_AGENT_SOCK={agent.socket_path}; export EDTOKEN_AGENT_SOCK;")
+        stdout.flush()
+        agent.serve_forever()
+        return
+
+    client: Optional[AgentClient] = AgentClient.connect()
+    if client is None:
+        print("The agent is not running", file=stderr)
+        return
+
+    try:
+        if args.agent_action == "stop":
+            client.request("stop")
+        elif args.agent_action == "lock":
+            client.request("lock")
+        elif args.agent_action == "status":
+            client.request("ping")
+            print(f"The agent is running on {paths.agent_socket()}")
+    finally:
+        client.close()
+
+
+def command_migrate(args: argparse.Namespace) -> None:
+    from ed_token.utils.exceptions import DecryptionError, UnverifiedPassword
+
+    edtoken: EDToken = EDToken(path=store_path())
+    profiles: List[str] = (
+        [args.migrate_profilename]
+        if args.migrate_profilename
+        else edtoken.get_all_profiles()
+    )
+    key: str = _show_input_hiding("Enter a password: ")
+    backup_path: Optional[str] = None
+
+    for profile in profiles:
+        if edtoken.load_profile(profile) is None:
+            print(f"The profile '{profile}' does not exists", file=stderr)
+            continue
+
+        try:
+            try:
+                migrated_records: int = edtoken.migrate_records(key)
+            except UnverifiedPassword:
+                response: str = ""
+                while not response in ["n", "y"]:
+                    response = input(
+                        f"'{profile}' has only legacy tokens, the password can not "
+                        "be verified and a wrong one destroys them. Migrate? (y/n): "
+                    )
+                if response == "n":
+                    continue
+                migrated_records = edtoken.migrate_records(key, verified=True)
+        except (DecryptionError, UnicodeDecodeError, ValueError):
+            print(f"Could not decrypt the tokens of '{profile}'", file=stderr)
+            continue
+
+        if migrated_records:
+            if backup_path is None:
+                backup_path = _backup_store()
+                print(f"Store saved to {backup_path} before migrating", file=stderr)
+            edtoken.save_profile()
+        print(f"{profile}: {migrated_records} tokens migrated")
 
 
 def main():
@@ -221,6 +700,7 @@ def main():
     ] = {
         "add": command_add,
         "set": command_set,
+        "import": command_import,
         "get": command_get,
         "remove": command_remove,
         "show": command_show,
@@ -228,22 +708,55 @@ def main():
         "get": command_get,
     }
 
-    wallet_actions: Dict[str, Callable[[EDToken], None]] = {
+    wallet_actions: Dict[str, Callable[[argparse.Namespace, EDToken], None]] = {
         "open": command_wallet,
         "close": command_closewallet,
+        "serve": command_serve,
     }
 
     args: argparse.Namespace = parse_args()
+    if args.timings:
+        recorder = timings.Timings()
+        timings.add_hook(recorder)
+        timings.record("cli.imports", perf_counter() - timings.STARTED_AT)
+        try:
+            run_command(args, profile_actions, wallet_actions)
+        finally:
+            print(recorder.format(), file=stderr)
+    else:
+        run_command(args, profile_actions, wallet_actions)
+
+
+def run_command(
+    args: argparse.Namespace,
+    profile_actions: Dict[str, Callable[[argparse.Namespace, EDToken], None]],
+    wallet_actions: Dict[str, Callable[[argparse.Namespace, EDToken], None]],
+) -> None:
     if "profile_action" in args:
-        edtoken: EDToken = EDToken(args.profilename, paths.user_json())
+        if args.profile_action == "exec" and _is_many_profiles(args.profilename):
+            command_exec_many(args, _resolve_profiles(args.profilename))
+            return
+        elif len(args.profilename) > 1:
+            raise RuntimeError("Only exec accepts several profiles")
+
+        args.profilename = args.profilename[0]
+        edtoken: EDToken = EDToken(args.profilename, store_path())
         profile_actions[args.profile_action](args, edtoken)
         if args.verbose:
             command_show(args, edtoken)
     elif "wallet_action" in args:
-        edtoken: EDToken = EDToken(args.profilename, paths.user_json())
-        wallet_actions[args.wallet_action](edtoken)
+        edtoken: EDToken = EDToken(args.profilename, store_path())
+        wallet_actions[args.wallet_action](args, edtoken)
+    elif "migrate_profilename" in args:
+        command_migrate(args)
+    elif "agent_action" in args:
+        command_agent(args)
+    elif "export_output" in args:
+        command_export(args)
+    elif "kdf_budget" in args:
+        command_calibrate(args)
     elif "list" in args:
-        edtoken: EDToken = EDToken(path=paths.user_json())
+        edtoken: EDToken = EDToken(path=store_path())
         list_all_profiles(edtoken)
 
 
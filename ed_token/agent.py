@@ -0,0 +1,163 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from ed_token.edtoken import EDToken
+from ed_token.utils import paths
+from ed_token.utils.cache import TTLCache
+from ed_token.utils.exceptions import AgentError, AgentLocked
+
+AGENT_TTL = 900.0
+MAX_PROFILES = 256
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            request: Dict = {}
+            try:
+                message: Any = json.loads(line)
+                if type(message) != dict:
+                    raise AgentError("The request must be a JSON object")
+                request = message
+                response = {"ok": True, "result": self.server.agent.dispatch(request)}
+            except AgentLocked as err:
+                response = {"ok": False, "locked": True, "error": str(err)}
+            except Exception as err:
+                response = {"ok": False, "error": f"{type(err).__name__}: {err}"}
+
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            if request.get("op") == "stop":
+                threading.Thread(target=self.server.shutdown).start()
+                return
+
+
+class _AgentServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class Agent:
+    def __init__(self, store: str, socket_path: Optional[str] = None, ttl=AGENT_TTL):
+        self.store: str = store
+        self.socket_path: str = socket_path if socket_path else paths.agent_socket()
+        self.passwords: TTLCache = TTLCache(maxsize=MAX_PROFILES, ttl=ttl)
+        self.server: Optional[_AgentServer] = None
+        self.operations: Dict[str, Callable[..., Any]] = {
+            "ping": lambda: "pong",
+            "unlock": self.unlock,
+            "lock": self.lock,
+            "render": self.render,
+            "get": self.get,
+            "decrypt": self.decrypt,
+            "stop": lambda: None,
+        }
+
+    def _load(self, profile: str) -> EDToken:
+        edtoken = EDToken(profile, self.store)
+        if edtoken.profile is None:
+            raise RuntimeError(f"The profile '{profile}' does not exists")
+        return edtoken
+
+    def _get_password(self, profile: str) -> str:
+        password: Optional[str] = self.passwords.get(profile)
+        if password is None:
+            raise AgentLocked(f"The profile '{profile}' is locked")
+        return password
+
+    def unlock(self, profile: str, password: str) -> None:
+        self._load(profile).decrypt_all(password)
+        self.passwords.set(profile, password)
+
+    def lock(self, profile: Optional[str] = None) -> None:
+        from ed_token.token_cipher import clear_caches
+
+        if profile is None:
+            self.passwords.clear()
+        else:
+            self.passwords.pop(profile)
+        clear_caches()
+
+    def render(self, profile: str) -> str:
+        password: str = self._get_password(profile)
+        return self._load(profile).profile.get_template(cipher_type="sym", key=password)
+
+    def get(self, profile: str, key: str) -> Any:
+        password: str = self._get_password(profile)
+        return self._load(profile).profile.decrypt_many([key], password)[key]
+
+    def decrypt(self, profile: str, keys: List[str]) -> Dict[str, str]:
+        password: str = self._get_password(profile)
+        return self._load(profile).profile.decrypt_many(keys, password)
+
+    def dispatch(self, request: Dict) -> Any:
+        operation = self.operations.get(request.get("op"))
+        if operation is None:
+            raise AgentError(f"Unknown operation '{request.get('op')}'")
+        return operation(**request.get("params", {}))
+
+    def bind(self) -> None:
+        if os.path.exists(self.socket_path):
+            client: Optional[AgentClient] = AgentClient.connect(self.socket_path)
+            if client is not None:
+                client.close()
+                raise AgentError(f"An agent is already listening on {self.socket_path}")
+            os.remove(self.socket_path)
+
+        umask = os.umask(0o177)
+        try:
+            self.server = _AgentServer(self.socket_path, _AgentHandler)
+        finally:
+            os.umask(umask)
+        self.server.agent = self
+
+    def serve_forever(self) -> None:
+        if self.server is None:
+            self.bind()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.lock()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+class AgentClient:
+    def __init__(self, connection: socket.socket):
+        self.connection: socket.socket = connection
+        self.stream = connection.makefile("rwb")
+
+    @classmethod
+    def connect(cls, socket_path: Optional[str] = None) -> Optional["AgentClient"]:
+        socket_path = socket_path if socket_path else paths.agent_socket()
+        if not os.path.exists(socket_path):
+            return None
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(socket_path)
+        except OSError:
+            connection.close()
+            return None
+        return cls(connection)
+
+    def request(self, op: str, **params) -> Any:
+        self.stream.write((json.dumps({"op": op, "params": params}) + "\n").encode())
+        self.stream.flush()
+        line: bytes = self.stream.readline()
+        if not line:
+            raise AgentError("The agent closed the connection")
+
+        response: Dict = json.loads(line)
+        if response.get("locked"):
+            raise AgentLocked(response["error"])
+        elif not response["ok"]:
+            raise AgentError(response["error"])
+        return response["result"]
+
+    def close(self) -> None:
+        self.stream.close()
+        self.connection.close()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional
+
+from ed_token.edtoken import EDToken
+from ed_token.utils.exceptions import ProfileNotFound
+
+if TYPE_CHECKING:
+    from ed_token.utils.models import Cipher, Profile
+
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncEDToken:
+    def __init__(
+        self,
+        path: str = "",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        executor: Optional[Executor] = None,
+    ):
+        self.path: str = path
+        self.concurrency: int = concurrency
+        self.executor: Optional[Executor] = executor
+        self.edtoken: EDToken = EDToken(path=path)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    async def open(cls, profile: str, path: str = "", **kwargs) -> "AsyncEDToken":
+        aedtoken = cls(path, **kwargs)
+        await aedtoken.load_profile(profile)
+        return aedtoken
+
+    @property
+    def profile_id(self) -> Optional[str]:
+        return self.edtoken.profile_id
+
+    @property
+    def profile(self) -> Optional[Profile]:
+        return self.edtoken.profile
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, partial(func, *args, **kwargs)
+            )
+
+    async def load_profile(self, profile_id: str) -> Optional[Profile]:
+        return await self.run(self.edtoken.load_profile, profile_id)
+
+    def initialize_profile(self, profile_name: str) -> Profile:
+        return self.edtoken.initialize_profile(profile_name)
+
+    async def save_profile(self) -> None:
+        await self.run(self.edtoken.save_profile)
+
+    async def remove_profile(self, profile_id: str) -> None:
+        await self.run(self.edtoken.remove_profile, profile_id)
+
+    async def remove_profile_content(self, key: str) -> None:
+        await self.run(self.edtoken.remove_profile_content, key)
+
+    async def get_all_profiles(self) -> List[str]:
+        return await self.run(self.edtoken.get_all_profiles)
+
+    async def set_content_to_profile(
+        self, token_id: str, token: str, cipher: Optional[Cipher] = None
+    ) -> None:
+        await self.run(self.edtoken.set_content_to_profile, token_id, token, cipher)
+
+    async def set_template(self, template: str) -> None:
+        await self.set_content_to_profile("template", template)
+
+    async def set_many(
+        self,
+        tokens: Dict[str, str],
+        cipher: Optional[Cipher] = None,
+        encrypt_keys: Optional[Iterable[str]] = None,
+    ) -> int:
+        return await self.run(self.edtoken.set_many, tokens, cipher, encrypt_keys)
+
+    async def decrypt_all(self, key: str, workers: int = 1) -> Dict[str, str]:
+        return await self.run(self.edtoken.decrypt_all, key, workers)
+
+    async def migrate_records(self, key: str) -> int:
+        return await self.run(self.edtoken.migrate_records, key)
+
+    async def render(
+        self,
+        profile_id: Optional[str] = None,
+        cipher_type: Optional[str] = None,
+        key: str = "",
+    ) -> str:
+        if profile_id is None or profile_id == self.profile_id:
+            if self.profile is None:
+                raise RuntimeError("No profile has been initializate")
+            return await self.run(
+                self.profile.get_template, cipher_type=cipher_type, key=key
+            )
+        return await self.run(
+            _render_stored_profile, self.path, profile_id, cipher_type, key
+        )
+
+    async def render_many(
+        self,
+        profile_ids: Iterable[str],
+        cipher_type: Optional[str] = None,
+        key: str = "",
+    ) -> Dict[str, str]:
+        profile_ids = list(profile_ids)
+        commands: List[str] = await asyncio.gather(
+            *(self.render(profile_id, cipher_type, key) for profile_id in profile_ids)
+        )
+        return dict(zip(profile_ids, commands))
+
+    async def exec(
+        self,
+        profile_id: Optional[str] = None,
+        cipher_type: Optional[str] = None,
+        key: str = "",
+        shell: bool = True,
+        **kwargs,
+    ) -> asyncio.subprocess.Process:
+        if shell:
+            command: str = await self.render(profile_id, cipher_type, key)
+            return await asyncio.create_subprocess_shell(command, **kwargs)
+
+        profile: Optional[Profile] = self.profile
+        if profile_id is not None and profile_id != self.profile_id:
+            profile = await self.run(_load_stored_profile, self.path, profile_id)
+        elif profile is None:
+            raise RuntimeError("No profile has been initializate")
+        args: List[str] = await self.run(_get_exec_args, profile, key)
+        return await asyncio.create_subprocess_exec(*args, **kwargs)
+
+
+class AsyncWallet:
+    def __init__(self, file_path: str, aedtoken: AsyncEDToken):
+        self.file_path: str = file_path
+        self.aedtoken: AsyncEDToken = aedtoken
+
+    def _get_wallet(self):
+        from ed_token.wallet import Wallet
+
+        return Wallet(self.file_path, self.aedtoken.edtoken)
+
+    async def decrypt_file(self, decrypt_key: str) -> List[str]:
+        return await self.aedtoken.run(
+            lambda: self._get_wallet().decrypt_file(decrypt_key)
+        )
+
+    async def open_file(self, decrypt_key: str) -> None:
+        await self.aedtoken.run(lambda: self._get_wallet().open_file(decrypt_key))
+
+    async def close_file(self) -> None:
+        await self.aedtoken.run(lambda: self._get_wallet().close_file())
+
+
+async def open_wallet(
+    aedtoken: AsyncEDToken, decrypt_key: str, workers: Optional[int] = None
+) -> None:
+    from ed_token.wallet import open_wallet
+
+    await aedtoken.run(open_wallet, aedtoken.edtoken, decrypt_key, workers)
+
+
+async def close_wallet(aedtoken: AsyncEDToken, workers: Optional[int] = None) -> None:
+    from ed_token.wallet import close_wallet
+
+    await aedtoken.run(close_wallet, aedtoken.edtoken, workers)
+
+
+async def render_template(
+    template: str,
+    content: Dict,
+    cipher_type: Optional[str] = None,
+    decrypt_key: Optional[str] = None,
+    executor: Optional[Executor] = None,
+) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, _render_template, template, content, cipher_type, decrypt_key
+    )
+
+
+def _render_template(
+    template: str, content: Dict, cipher_type: Optional[str], decrypt_key: Optional[str]
+) -> str:
+    from ed_token.utils.templates import CommandTemplate
+
+    command_template = CommandTemplate(
+        cipher_type=cipher_type, decrypt_key=decrypt_key, content=content
+    )
+    command_template.template = template
+    return command_template.get_command()
+
+
+def _load_stored_profile(path: str, profile_id: str) -> Profile:
+    edtoken = EDToken(profile_id, path)
+    if edtoken.profile is None:
+        raise ProfileNotFound(f"The profile '{profile_id}' does not exists")
+    return edtoken.profile
+
+
+def _render_stored_profile(
+    path: str, profile_id: str, cipher_type: Optional[str], key: str
+) -> str:
+    profile: Profile = _load_stored_profile(path, profile_id)
+    return profile.get_template(cipher_type=cipher_type, key=key)
+
+
+def _get_exec_args(profile: Profile, key: str) -> List[str]:
+    from ed_token.runner import build_command
+
+    crypted_keys: List[str] = list(profile.get_template_records())
+    decrypted_tokens: Dict[str, str] = (
+        profile.decrypt_many(crypted_keys, key) if crypted_keys else {}
+    )
+    return build_command(
+        profile.get_token("template") or "",
+        profile.content,
+        decrypted_tokens,
+        shell=False,
+    ).args
@@ -0,0 +1,60 @@
+import os
+import secrets
+import tempfile
+from base64 import b64decode, b64encode
+from typing import IO, Dict, Iterator, Tuple
+
+from ed_token.utils import paths
+from ed_token.utils.aead_stream import StreamWriter, iter_stream
+from ed_token.utils.timings import span
+
+BLOB_MAGIC = b"EDBLOB1"
+BLOB_KEY_SIZE = 32
+READ_SIZE = 1024 * 1024
+
+
+def get_blob_path(blob_id: str) -> str:
+    return f"{paths.blobs()}/{blob_id}"
+
+
+def is_blob(value) -> bool:
+    return type(value) == dict and "blob" in value
+
+
+def write_blob(source: IO[bytes]) -> Tuple[str, Dict]:
+    blob_id: str = secrets.token_hex(16)
+    blob_key: bytes = os.urandom(BLOB_KEY_SIZE)
+    directory: str = paths.blobs()
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".blob.")
+    try:
+        with span("blob.encrypt"), os.fdopen(fd, "wb") as f:
+            stream = StreamWriter(f, blob_key, blob_id, BLOB_MAGIC)
+            for block in iter(lambda: source.read(READ_SIZE), b""):
+                stream.write(block)
+            stream.close()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, get_blob_path(blob_id))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return b64encode(blob_key).decode("utf-8"), {"id": blob_id, "size": stream.size}
+
+
+def iter_blob(record: Dict, password: str) -> Iterator[bytes]:
+    from ed_token.token_cipher import decrypt_records
+
+    key_record: Dict = {key: value for key, value in record.items() if key != "blob"}
+    blob_key: bytes = b64decode(decrypt_records({"": key_record}, password)[""])
+    blob_id: str = record["blob"]["id"]
+    with open(get_blob_path(blob_id), "rb") as f:
+        yield from iter_stream(f, blob_key, blob_id, BLOB_MAGIC)
+
+
+def remove_blob(record: Dict) -> None:
+    path: str = get_blob_path(record["blob"]["id"])
+    if os.path.exists(path):
+        os.remove(path)
@@ -1,10 +1,15 @@
-from typing import List, Optional, Union
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
 
-from ed_token.token_cipher import AsymTokenCipher, SymTokenCipher
 from ed_token.utils.exceptions import ProfileNotFound
-from ed_token.utils.json_files import JsonFiles
-from ed_token.utils.models import Cipher, Profile
-from ed_token.utils.templates import CommandTemplate
+from ed_token.utils.storage import open_storage
+from ed_token.utils.timings import span
+
+if TYPE_CHECKING:
+    from ed_token.utils.models import Cipher, Profile
 
 
 class EDToken:
@@ -16,10 +21,17 @@ class EDToken:
             self.load_profile(self.profile_id)
 
     def remove_profile(self, profile_id: str, path: Optional[str] = None) -> None:
+        from ed_token.blobs import is_blob, remove_blob
+
         path = path if path else self.path
-        with JsonFiles(path) as user_json_obj:
+        with open_storage(path) as user_json_obj:
+            content: Optional[Dict] = user_json_obj.get_value(profile_id)
             user_json_obj.remove_key(profile_id)
 
+        for value in (content or {}).values():
+            if is_blob(value):
+                remove_blob(value)
+
         if profile_id == self.profile_id:
             self.profile_id, self.profile = None, None
 
@@ -27,17 +39,56 @@ class EDToken:
         if self.profile is None:
             raise RuntimeError("No profile has been initializate")
 
-        with JsonFiles(self.path) as user_json_obj:
+        from ed_token.blobs import is_blob, remove_blob
+
+        previous = self.profile.get_token(key)
+        self.profile.remove_token(key)
+        self.profile.changes.pop(key, None)
+        with open_storage(self.path) as user_json_obj:
             user_json_obj.remove_key([self.profile_id, key])
-            self.profile.content = user_json_obj.content
+            if user_json_obj.get_value(self.profile_id) is not None:
+                user_json_obj.set_value(
+                    self.profile_id, self._merge_index(user_json_obj, {})
+                )
+
+        if is_blob(previous):
+            remove_blob(previous)
+
+    def _merge_index(self, user_json_obj, content: Dict) -> Dict:
+        from ed_token.utils.models import INDEX_KEY
+
+        stored: Dict = user_json_obj.get_value(self.profile_id) or {}
+        merged: Profile = _load_profile(self.profile_id, {**stored, **content})
+        merged.index = None
+        return {**content, INDEX_KEY: merged.get_index()}
 
     def save_profile(self, path=None) -> None:
-        with JsonFiles(self.path) as user_json_obj:
-            user_json_obj.set_value(self.profile_id, self.profile.content)
+        profile: Profile = self.profile
+        with span("edtoken.save_profile"), open_storage(self.path) as user_json_obj:
+            content: Dict = dict(profile.content)
+            if user_json_obj.get_value(self.profile_id) is not None:
+                content = {
+                    key: profile.content[key]
+                    for key in profile.changes
+                    if key in profile.content
+                }
+                for key in profile.changes:
+                    if key not in profile.content:
+                        user_json_obj.remove_key([self.profile_id, key])
+
+            user_json_obj.set_value(
+                self.profile_id, self._merge_index(user_json_obj, content)
+            )
+            stored: Profile = _load_profile(
+                self.profile_id, user_json_obj.get_value(self.profile_id)
+            )
+
+        profile.content, profile.index = stored.content, stored.index
+        profile.changes = {}
 
     def load_profile(self, profile_id: str) -> Optional[Profile]:
         profile: Optional[Dict]
-        with JsonFiles(self.path) as user_json_obj:
+        with span("edtoken.load_profile"), open_storage(self.path) as user_json_obj:
             profile = user_json_obj.get_value(profile_id)
 
         if profile == None:
@@ -45,28 +96,174 @@ class EDToken:
             return None
         else:
             self.profile_id = profile_id
-            self.profile = Profile(**{"id": profile_id, "content": profile})
+            self.profile = _load_profile(profile_id, profile)
             return self.profile
 
     def initialize_profile(self, profile_name: str) -> Profile:
+        from ed_token.utils.models import Profile
+
         self.profile_id = profile_name
         self.profile = Profile(**{"id": profile_name, "content": {}})
         return self.profile
 
     def get_all_profiles(self) -> List[str]:
-        with JsonFiles(self.path) as user_json_obj:
+        with open_storage(self.path) as user_json_obj:
             return user_json_obj.list_keys()
 
+    def decrypt_all(self, key: str, workers: int = 1) -> Dict[str, str]:
+        if self.profile is None:
+            raise RuntimeError("No profile has been initializate")
+
+        blob_keys: List[str] = self.profile.get_blob_keys()
+        crypted_keys: List[str] = [
+            token_id
+            for token_id in self.profile.get_crypted_keys()
+            if token_id not in blob_keys
+        ]
+        return self.profile.decrypt_many(crypted_keys, key, workers)
+
+    def render_profiles(
+        self,
+        profile_ids: Iterable[str],
+        cipher_type: Optional[str] = None,
+        key: str = "",
+        workers: int = 1,
+    ) -> Dict[str, str]:
+        profiles: List[Profile] = []
+        with open_storage(self.path) as user_json_obj:
+            for profile_id in profile_ids:
+                content: Optional[Dict] = user_json_obj.get_value(profile_id)
+                if content is None:
+                    raise ProfileNotFound(f"The profile '{profile_id}' does not exists")
+                profiles.append(_load_profile(profile_id, content))
+
+        render = partial(_render_profile, cipher_type=cipher_type, key=key)
+        if workers > 1 and len(profiles) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                commands = list(executor.map(render, profiles))
+        else:
+            commands = [render(profile) for profile in profiles]
+        return {profile.id: command for profile, command in zip(profiles, commands)}
+
+    def migrate_records(self, key: str, verified: bool = False) -> int:
+        if self.profile is None:
+            raise RuntimeError("No profile has been initializate")
+
+        from ed_token.token_cipher import SymTokenCipher
+
+        records: Dict[str, Dict] = {
+            token_id: self.profile.get_token(token_id)
+            for token_id in self.profile.get_crypted_keys()
+        }
+        migrated_records = SymTokenCipher.migrate_many(
+            records, key, self.get_kdf_params(), verified
+        )
+        for token_id, record in migrated_records.items():
+            self.profile.set_token(token_id, record)
+        return len(migrated_records)
+
+    def get_kdf_params(self) -> Optional[Dict]:
+        if self.profile is None:
+            return None
+
+        for value in self.profile.content.values():
+            if type(value) == dict and "kdf" in value:
+                return value["kdf"]
+        return None
+
+    def get_envelope(self) -> Optional[Dict]:
+        if self.profile is None:
+            return None
+
+        for value in self.profile.content.values():
+            if type(value) == dict and value.get("cipher") == "asym":
+                return value.get("envelope")
+        return None
+
     def set_template(self, template: str) -> None:
         self.set_content_to_profile("template", template)
 
     def set_content_to_profile(
         self, token_id: str, token: str, cipher: Optional[Cipher] = None,
     ) -> None:
+        self.profile.set_token(token_id, self._encrypt_token(token_id, token, cipher))
+
+    def set_blob(self, token_id: str, source: IO[bytes], cipher: Cipher) -> Any:
+        from ed_token.blobs import write_blob
+
+        if self.profile is None:
+            raise RuntimeError("No profile has been initializate")
+
+        blob_key, blob = write_blob(source)
+        previous = self.profile.get_token(token_id)
+        record: Dict = self._encrypt_token(token_id, blob_key, cipher)
+        self.profile.set_token(token_id, {**record, "blob": blob})
+        return previous
+
+    def _encrypt_token(
+        self, token_id: str, token: str, cipher: Optional[Cipher]
+    ) -> Union[str, Dict]:
+        if cipher and cipher.type == "sym":
+            from ed_token.token_cipher import SymTokenCipher
+
+            tchiper = SymTokenCipher(token)
+            token = tchiper.encrypt(cipher.key, self.get_kdf_params())
+        elif cipher and cipher.type == "asym":
+            from ed_token.token_cipher import AsymTokenCipher
+
+            token = AsymTokenCipher.encrypt_many(
+                {token_id: token}, cipher.key, self.get_envelope()
+            )[token_id]
+        return token
+
+    def set_many(
+        self,
+        tokens: Dict[str, str],
+        cipher: Optional[Cipher] = None,
+        encrypt_keys: Optional[Iterable[str]] = None,
+    ) -> int:
+        if self.profile is None:
+            raise RuntimeError("No profile has been initializate")
+
+        encrypt_keys = set(tokens if encrypt_keys is None else encrypt_keys)
+        if cipher is None:
+            encrypt_keys = set()
+        elif not encrypt_keys.issubset(tokens):
+            missing_keys = sorted(encrypt_keys.difference(tokens))
+            raise KeyError(f"Keys to encrypt not found in the input: {missing_keys}")
+
+        crypted_tokens = {k: tokens[k] for k in tokens if k in encrypt_keys}
         if cipher and cipher.type == "sym":
-            tchiper = SymTokenCipher(token, token_id)
-            token = tchiper.encrypt(cipher.key)
+            from ed_token.token_cipher import SymTokenCipher
+
+            crypted_tokens = SymTokenCipher.encrypt_many(
+                crypted_tokens, cipher.key, self.get_kdf_params()
+            )
         elif cipher and cipher.type == "asym":
-            raise NotImplementedError()
+            from ed_token.token_cipher import AsymTokenCipher
+
+            crypted_tokens = AsymTokenCipher.encrypt_many(
+                crypted_tokens, cipher.key, self.get_envelope()
+            )
+
+        self.profile.set_tokens(
+            {
+                token_id: crypted_tokens.get(token_id, token)
+                for token_id, token in tokens.items()
+            }
+        )
+        return len(crypted_tokens)
+
+
+def _load_profile(profile_id: str, content: Dict) -> Profile:
+    from ed_token.utils.models import INDEX_KEY, Profile, is_valid_index
+
+    content = dict(content)
+    index: Optional[Dict] = content.pop(INDEX_KEY, None)
+    if not is_valid_index(index, content):
+        index = None
+    return Profile(**{"id": profile_id, "content": content, "index": index})
+
 
-        self.profile.set_token(token_id, token)
+def _render_profile(profile: Profile, cipher_type: Optional[str], key: str) -> str:
+    return profile.get_template(cipher_type=cipher_type, key=key)
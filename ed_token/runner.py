@@ -0,0 +1,221 @@
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Dict, List, Optional, Union
+
+from ed_token.utils.templates import CRYPTED, CompiledTemplate
+
+DEFAULT_JOBS = 4
+SPAWN_ERROR_STATUS = 127
+SECRETS_MODES = ("argv", "env", "stdin")
+SECRET_MASK = "****"
+ENV_PREFIX = "EDTOKEN_"
+
+
+class CommandSpec:
+    __slots__ = ("args", "shell", "env", "input", "display")
+
+    def __init__(
+        self,
+        args: Union[str, List[str]],
+        shell: bool = True,
+        env: Optional[Dict[str, str]] = None,
+        input: Optional[str] = None,
+        display: Optional[str] = None,
+    ):
+        self.args: Union[str, List[str]] = args
+        self.shell: bool = shell
+        self.env: Optional[Dict[str, str]] = env
+        self.input: Optional[str] = input
+        self.display: str = display if display is not None else self._join(args)
+
+    @staticmethod
+    def _join(args: Union[str, List[str]]) -> str:
+        if type(args) == str:
+            return args
+        return " ".join(shlex.quote(arg) for arg in args)
+
+    def popen(self, **kwargs) -> subprocess.Popen:
+        if self.input is not None:
+            kwargs["stdin"] = subprocess.PIPE
+        if not self.shell:
+            # An absolute executable and close_fds=False let subprocess use
+            # posix_spawn, the descriptors of edtoken are not inheritable anyway.
+            kwargs.setdefault("executable", shutil.which(self.args[0]))
+            kwargs.setdefault("close_fds", False)
+
+        proc = subprocess.Popen(self.args, shell=self.shell, env=self.env, **kwargs)
+        if self.input is not None:
+            try:
+                proc.stdin.write(self.input.encode("utf-8"))
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        return proc
+
+
+def get_env_name(key: str) -> str:
+    return ENV_PREFIX + re.sub(r"\W", "_", key).upper()
+
+
+def build_command(
+    template: str,
+    content: Dict,
+    decrypted_tokens: Dict[str, str],
+    shell: bool = True,
+    secrets: str = "argv",
+) -> CommandSpec:
+    if secrets not in SECRETS_MODES:
+        raise ValueError(
+            f"Unknown secrets mode '{secrets}', use one of {list(SECRETS_MODES)}"
+        )
+
+    values: Dict[str, str] = decrypted_tokens
+    masked: Dict[str, str] = {key: SECRET_MASK for key in decrypted_tokens}
+    if secrets == "env" and shell:
+        values = masked = {key: "${%s}" % get_env_name(key) for key in decrypted_tokens}
+    elif secrets != "argv":
+        values = masked = {key: "" for key in decrypted_tokens}
+
+    env: Optional[Dict[str, str]] = None
+    if secrets == "env":
+        env = dict(os.environ)
+        for key, token in decrypted_tokens.items():
+            env[get_env_name(key)] = token
+
+    compiled: CompiledTemplate = CompiledTemplate.compile(template)
+    stdin_input: Optional[str] = None
+    if secrets == "stdin":
+        stdin_input = "".join(
+            f"{decrypted_tokens[key]}\n"
+            for key in compiled.crypted_keys
+            if key in decrypted_tokens
+        )
+
+    if shell:
+        return CommandSpec(
+            compiled.render(content, values),
+            env=env,
+            input=stdin_input,
+            display=compiled.render(content, masked),
+        )
+
+    args: List[str] = []
+    display_args: List[str] = []
+    for word in shlex.split(template):
+        compiled_word: CompiledTemplate = CompiledTemplate.compile(word)
+        if (
+            secrets != "argv"
+            and compiled_word.segments
+            and all(kind == CRYPTED for kind, _, _ in compiled_word.segments)
+        ):
+            continue
+        args.append(compiled_word.render(content, values))
+        display_args.append(compiled_word.render(content, masked))
+    if not args:
+        raise ValueError(
+            f"The template '{template}' has no program to run without its secrets"
+        )
+    return CommandSpec(
+        args,
+        shell=False,
+        env=env,
+        input=stdin_input,
+        display=CommandSpec._join(display_args),
+    )
+
+
+class CommandResult:
+    __slots__ = ("name", "returncode", "seconds")
+
+    def __init__(self, name: str, returncode: int, seconds: float):
+        self.name: str = name
+        self.returncode: int = returncode
+        self.seconds: float = seconds
+
+    def __repr__(self) -> str:
+        return (
+            f"CommandResult(name={self.name!r}, returncode={self.returncode}, "
+            f"seconds={self.seconds:.3f})"
+        )
+
+
+class PrefixedOutput:
+    def __init__(self, stdout: Optional[IO] = None, stderr: Optional[IO] = None):
+        self.stdout: IO = stdout if stdout else sys.stdout
+        self.stderr: IO = stderr if stderr else sys.stderr
+        self.lock = threading.Lock()
+
+    def write(self, name: str, line: str, stream: IO) -> None:
+        if not line.endswith("\n"):
+            line += "\n"
+        with self.lock:
+            stream.write(f"[{name}] {line}")
+            stream.flush()
+
+    def copy(self, name: str, pipe: IO[bytes], stream: IO) -> None:
+        for line in iter(pipe.readline, b""):
+            self.write(name, line.decode("utf-8", errors="replace"), stream)
+        pipe.close()
+
+
+def run_command(
+    name: str,
+    command: Union[str, CommandSpec],
+    output: PrefixedOutput,
+    shell: bool = True,
+) -> CommandResult:
+    spec: CommandSpec = CommandSpec(command, shell) if type(command) == str else command
+    start = time.perf_counter()
+    try:
+        proc = spec.popen(stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as err:
+        output.write(name, f"Could not run the command: {err}", output.stderr)
+        return CommandResult(name, SPAWN_ERROR_STATUS, time.perf_counter() - start)
+
+    stderr_thread = threading.Thread(
+        target=output.copy, args=(name, proc.stderr, output.stderr), daemon=True
+    )
+    stderr_thread.start()
+    output.copy(name, proc.stdout, output.stdout)
+    stderr_thread.join()
+    returncode: int = proc.wait()
+    return CommandResult(name, returncode, time.perf_counter() - start)
+
+
+def run_commands(
+    commands: Dict[str, Union[str, CommandSpec]],
+    jobs: int = DEFAULT_JOBS,
+    output: Optional[PrefixedOutput] = None,
+    shell: bool = True,
+) -> List[CommandResult]:
+    output = output if output else PrefixedOutput()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(run_command, name, command, output, shell)
+            for name, command in commands.items()
+        ]
+        return [future.result() for future in futures]
+
+
+def get_exit_status(returncode: int) -> int:
+    return returncode if returncode >= 0 else 128 - returncode
+
+
+def format_summary(results: List[CommandResult]) -> str:
+    width: int = max([len("profile")] + [len(result.name) for result in results])
+    lines: List[str] = [f"{'profile':<{width}}  {'status':>6}  {'seconds':>8}"]
+    for result in results:
+        lines.append(
+            f"{result.name:<{width}}  {result.returncode:>6}  {result.seconds:>8.2f}"
+        )
+
+    failed: int = sum(1 for result in results if result.returncode != 0)
+    lines.append(f"{failed} of {len(results)} commands failed")
+    return "\n".join(lines)
@@ -1,17 +1,87 @@
+from __future__ import annotations
+
 import hashlib
 import os
 from base64 import b64decode, b64encode
-from typing import Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple, Union
 
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding, rsa, utils
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives.serialization import (
-    load_pem_private_key,
-    load_pem_public_key,
-)
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ed_token.utils import kdf, paths
+from ed_token.utils.cache import TTLCache
+from ed_token.utils.config import get_setting
+from ed_token.utils.exceptions import DecryptionError, UnverifiedPassword
+from ed_token.utils.timings import span
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric import rsa
 
 IV_BLOCK_SIZE = 16
+NONCE_SIZE = 12
+LEGACY_FORMAT_VERSION = 1
+FORMAT_VERSION = 2
+AEAD_ALGORITHM = "aes-256-gcm"
+ENVELOPE_ALGORITHM = "rsa-oaep-sha256"
+DATA_KEY_SIZE = 32
+ASYM = "asym"
+CACHE_TTL = 300.0
+
+_derived_keys: TTLCache = TTLCache(maxsize=32, ttl=CACHE_TTL)
+_decrypted_tokens: TTLCache = TTLCache(maxsize=1024, ttl=CACHE_TTL)
+_loaded_keys: TTLCache = TTLCache(maxsize=8, ttl=CACHE_TTL)
+_data_keys: TTLCache = TTLCache(maxsize=32, ttl=CACHE_TTL)
+
+
+def clear_caches() -> None:
+    _derived_keys.clear()
+    _decrypted_tokens.clear()
+    _loaded_keys.clear()
+    _data_keys.clear()
+
+
+def decrypt_records(
+    records: Dict[str, Dict], key: str, workers: int = 1
+) -> Dict[str, str]:
+    for token_id, record in records.items():
+        if "blob" in record:
+            raise ValueError(f"'{token_id}' is a blob, it can only be read with get")
+
+    asym_records: Dict[str, Dict] = {
+        token_id: record
+        for token_id, record in records.items()
+        if record.get("cipher") == ASYM
+    }
+    if not asym_records:
+        return SymTokenCipher.decrypt_many(records, key, workers)
+
+    sym_records: Dict[str, Dict] = {
+        token_id: record
+        for token_id, record in records.items()
+        if token_id not in asym_records
+    }
+    decrypted: Dict[str, str] = {
+        **SymTokenCipher.decrypt_many(sym_records, key, workers),
+        **AsymTokenCipher.decrypt_many(asym_records, key, workers),
+    }
+    return {token_id: decrypted[token_id] for token_id in records}
+
+
+def _get_oaep_padding() -> Any:
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    return padding.OAEP(
+        mgf=padding.MGF1(algorithm=hashes.SHA256()),
+        algorithm=hashes.SHA256(),
+        label=None,
+    )
+
+
+def _get_cache_key(cipher_key: bytes, record: Dict) -> Tuple[bytes, str, Optional[str]]:
+    return (cipher_key, record["token"], record.get("nonce"))
 
 
 class SymTokenCipher:
@@ -19,63 +89,195 @@ class SymTokenCipher:
         self.token = token
         self.padding_size = padding_size
 
-    def _get_chiper(
-        self, key: bytes, iv: Optional[bytes] = None
-    ) -> Union[Cipher, Tuple[Cipher, bytes]]:
-        if iv is not None:
-            return Cipher(algorithms.AES(key), modes.CBC(iv))
-        else:
-            iv = os.urandom(IV_BLOCK_SIZE)
-            cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
-            return cipher, iv
+    def _get_chiper(self, key: bytes, iv: bytes) -> Cipher:
+        return Cipher(algorithms.AES(key), modes.CBC(iv))
 
-    def _get_32_bytes_key(self, key: str) -> bytes:
-        return hashlib.sha256(key.encode()).digest()[:32]
-
-    def _set_token_padding(self, token, curr_length):
-        self.padding_size = IV_BLOCK_SIZE - curr_length
-        padded_token = token + os.urandom(self.padding_size)
-        return padded_token
-
-    def _get_token_blocks(self):
-        token_blocks = []
-        for i in range(0, len(self.token), IV_BLOCK_SIZE):
-            if i + (IV_BLOCK_SIZE) > len(self.token):
-                len_last_block = len(self.token) - i
-                last_block = self.token[i : i + len_last_block]
-                token_blocks.append(self._set_token_padding(last_block, len_last_block))
-            else:
-                token_blocks.append(self.token[i : i + 16])
-        return token_blocks
+    @staticmethod
+    def _get_kdf_key(key: str, kdf_params: Dict) -> bytes:
+        cache_key: Tuple[str, str] = (key, kdf.get_params_id(kdf_params))
+        derived_key: Optional[bytes] = _derived_keys.get(cache_key)
+        if derived_key is None:
+            with span("cipher.derive_key"):
+                derived_key = kdf.derive(key, kdf_params)
+            _derived_keys.set(cache_key, derived_key)
+        return derived_key
 
-    def encrypt(self, key: str) -> dict:
-        self.token = self.token.encode("utf8")
-        cipher, iv = self._get_chiper(self._get_32_bytes_key(key))
-        encrypted_context = cipher.encryptor()
+    @classmethod
+    def derive_key(cls, key: str, kdf_params: Optional[Dict] = None) -> bytes:
+        if kdf_params:
+            return cls._get_kdf_key(key, kdf_params)
+        return cls("")._get_32_bytes_key(key)
 
-        self.token = self._get_token_blocks()
-        blocks_context = b""
-        for block in self.token:
-            blocks_context += encrypted_context.update(block)
+    @classmethod
+    def _get_record_key(cls, key: str, record: Dict) -> bytes:
+        return cls.derive_key(key, record.get("kdf"))
 
-        encrypted_token = blocks_context + encrypted_context.finalize()
+    def _get_32_bytes_key(self, key: str) -> bytes:
+        derived_key: Optional[bytes] = _derived_keys.get(key)
+        if derived_key is None:
+            with span("cipher.derive_key"):
+                derived_key = hashlib.sha256(key.encode()).digest()[:32]
+            _derived_keys.set(key, derived_key)
+        return derived_key
+
+    def _encrypt_with(self, cipher_key: bytes) -> dict:
+        nonce: bytes = os.urandom(NONCE_SIZE)
+        with span("cipher.encrypt"):
+            encrypted_token = AESGCM(cipher_key).encrypt(
+                nonce, self.token.encode("utf8"), None
+            )
         return {
+            "version": FORMAT_VERSION,
+            "alg": AEAD_ALGORITHM,
             "token": b64encode(encrypted_token).decode("utf-8"),
-            "cbc_iv": b64encode(iv).decode("utf-8"),
-            "padding_size": self.padding_size,
+            "nonce": b64encode(nonce).decode("utf-8"),
         }
 
+    def encrypt(self, key: str, kdf_params: Optional[Dict] = None) -> dict:
+        kdf_params = kdf_params if kdf_params else kdf.new_params()
+        record: dict = self._encrypt_with(self._get_kdf_key(key, kdf_params))
+        record["kdf"] = kdf_params
+        return record
+
     def decrypt(self, key: str, iv: bytes) -> str:
-        cipher = self._get_chiper(self._get_32_bytes_key(key), iv)
+        return self._decrypt_with(self._get_32_bytes_key(key), iv)
+
+    def _decrypt_with(self, cipher_key: bytes, iv: bytes) -> str:
+        cipher = self._get_chiper(cipher_key, iv)
         decrypted_ctx = cipher.decryptor()
 
-        self.token = self._get_token_blocks()
-        blocks_context = b""
-        for block in self.token:
-            blocks_context += decrypted_ctx.update(block)
+        utf8_token = decrypted_ctx.update(self.token) + decrypted_ctx.finalize()
+        return utf8_token[: len(utf8_token) - self.padding_size].decode("utf-8")
+
+    @staticmethod
+    def get_record_version(record: Dict) -> int:
+        return record.get("version", LEGACY_FORMAT_VERSION)
+
+    @classmethod
+    def _decrypt_record_with(cls, record: Dict, cipher_key: bytes) -> str:
+        with span("cipher.decrypt"):
+            return cls._decrypt_record(record, cipher_key)
+
+    @classmethod
+    def _decrypt_record(cls, record: Dict, cipher_key: bytes) -> str:
+        encrypted_token: bytes = b64decode(record["token"].encode("utf-8"))
+        if cls.get_record_version(record) == LEGACY_FORMAT_VERSION:
+            iv = b64decode(record["cbc_iv"].encode("utf-8"))
+            return cls(encrypted_token, record["padding_size"])._decrypt_with(
+                cipher_key, iv
+            )
+        elif record.get("alg") != AEAD_ALGORITHM:
+            raise ValueError(f"Unsupported token algorithm '{record.get('alg')}'")
+
+        nonce: bytes = b64decode(record["nonce"].encode("utf-8"))
+        try:
+            token = AESGCM(cipher_key).decrypt(nonce, encrypted_token, None)
+        except InvalidTag:
+            raise DecryptionError("Wrong password or corrupted token") from None
+        return token.decode("utf-8")
 
-        utf8_token = blocks_context + decrypted_ctx.finalize()
-        return utf8_token[: -self.padding_size].decode("utf-8")
+    @classmethod
+    def encrypt_many(
+        cls, tokens: Dict[str, str], key: str, kdf_params: Optional[Dict] = None
+    ) -> Dict[str, Dict]:
+        if not tokens:
+            return {}
+
+        kdf_params = kdf_params if kdf_params else kdf.new_params()
+        cipher_key: bytes = cls._get_kdf_key(key, kdf_params)
+        records: Dict[str, Dict] = {}
+        for token_id, token in tokens.items():
+            records[token_id] = cls(token)._encrypt_with(cipher_key)
+            records[token_id]["kdf"] = kdf_params
+        return records
+
+    @classmethod
+    def decrypt_record(cls, record: Dict, key: str) -> str:
+        return cls.decrypt_many({"": record}, key)[""]
+
+    @classmethod
+    def decrypt_many(
+        cls, records: Dict[str, Dict], key: str, workers: int = 1
+    ) -> Dict[str, str]:
+        if not records:
+            return {}
+
+        return cls.decrypt_many_with(
+            {
+                token_id: (record, cls._get_record_key(key, record))
+                for token_id, record in records.items()
+            },
+            workers,
+        )
+
+    @classmethod
+    def decrypt_many_with(
+        cls, records: Dict[str, Tuple[Dict, bytes]], workers: int = 1
+    ) -> Dict[str, str]:
+        decrypted: Dict[str, str] = {}
+        pending_records: Dict[str, Tuple[Dict, bytes]] = {}
+        for token_id, (record, cipher_key) in records.items():
+            token: Optional[str] = _decrypted_tokens.get(
+                _get_cache_key(cipher_key, record)
+            )
+            if token is None:
+                pending_records[token_id] = (record, cipher_key)
+            else:
+                decrypted[token_id] = token
+
+        decrypt = lambda pending: cls._decrypt_record_with(*pending)
+        if workers > 1 and len(pending_records) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                tokens = list(executor.map(decrypt, pending_records.values()))
+        else:
+            tokens = [decrypt(pending) for pending in pending_records.values()]
+
+        for (token_id, (record, cipher_key)), token in zip(
+            pending_records.items(), tokens
+        ):
+            _decrypted_tokens.set(_get_cache_key(cipher_key, record), token)
+            decrypted[token_id] = token
+        return {token_id: decrypted[token_id] for token_id in records}
+
+    @classmethod
+    def needs_migration(cls, record: Dict) -> bool:
+        if record.get("cipher") == ASYM:
+            return False
+        return (
+            cls.get_record_version(record) == LEGACY_FORMAT_VERSION
+            or "kdf" not in record
+        )
+
+    @classmethod
+    def migrate_many(
+        cls,
+        records: Dict[str, Dict],
+        key: str,
+        kdf_params: Optional[Dict] = None,
+        verified: bool = False,
+    ) -> Dict[str, Dict]:
+        legacy_records = {
+            token_id: record
+            for token_id, record in records.items()
+            if cls.needs_migration(record)
+        }
+        if not legacy_records:
+            return {}
+
+        authenticated: Optional[Dict] = next(
+            (
+                record
+                for record in records.values()
+                if record.get("cipher") != ASYM
+                and cls.get_record_version(record) != LEGACY_FORMAT_VERSION
+            ),
+            None,
+        )
+        if authenticated is not None:
+            cls.decrypt_record(authenticated, key)
+        elif not verified:
+            raise UnverifiedPassword("Legacy tokens can not verify the password")
+        return cls.encrypt_many(cls.decrypt_many(legacy_records, key), key, kdf_params)
 
 
 class AsymTokenCipher:
@@ -83,14 +285,138 @@ class AsymTokenCipher:
         self.token = token
 
     def load_key(
-        self,
-        path: str,
-        t: Union[rsa.RSAPublicKey, rsa.RSAPrivateKey] = rsa.RSAPrivateKey,
+        self, path: str, t: Optional[type] = None, password: Optional[str] = None
+    ) -> Union[rsa.RSAPublicKey, rsa.RSAPrivateKey]:
+        return self.load_key_file(path, t, password)
+
+    @staticmethod
+    def load_key_file(
+        path: str, t: Optional[type] = None, password: Optional[str] = None
     ) -> Union[rsa.RSAPublicKey, rsa.RSAPrivateKey]:
-        pass
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        path = os.path.abspath(os.path.expanduser(path))
+        stat = os.stat(path)
+        cache_key = (path, stat.st_mtime_ns, stat.st_size, t, password)
+        key = _loaded_keys.get(cache_key)
+        if key is not None:
+            return key
+
+        with open(path, "rb") as f:
+            data: bytes = f.read()
+
+        with span("cipher.load_key"):
+            if b"PRIVATE KEY" in data:
+                try:
+                    key = serialization.load_pem_private_key(
+                        data, password.encode("utf-8") if password else None
+                    )
+                except (TypeError, ValueError):
+                    raise DecryptionError(
+                        f"Wrong password for the private key {path}"
+                    ) from None
+                if t is rsa.RSAPublicKey:
+                    key = key.public_key()
+            elif t is rsa.RSAPrivateKey:
+                raise ValueError(f"{path} is not a private key")
+            else:
+                key = serialization.load_pem_public_key(data)
+
+        if not isinstance(key, (rsa.RSAPublicKey, rsa.RSAPrivateKey)):
+            raise ValueError(f"{path} is not a RSA key")
+        _loaded_keys.set(cache_key, key)
+        return key
+
+    @staticmethod
+    def get_fingerprint(public_key: rsa.RSAPublicKey) -> str:
+        from cryptography.hazmat.primitives import serialization
+
+        der: bytes = public_key.public_bytes(
+            serialization.Encoding.DER,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        return hashlib.sha256(der).hexdigest()
+
+    @classmethod
+    def new_envelope(cls, public_key: rsa.RSAPublicKey) -> Tuple[bytes, Dict]:
+        data_key: bytes = os.urandom(DATA_KEY_SIZE)
+        with span("cipher.wrap_key"):
+            wrapped_key: bytes = public_key.encrypt(data_key, _get_oaep_padding())
+        return data_key, {
+            "alg": ENVELOPE_ALGORITHM,
+            "key": b64encode(wrapped_key).decode("utf-8"),
+            "fingerprint": cls.get_fingerprint(public_key),
+        }
+
+    @classmethod
+    def open_envelope(cls, envelope: Dict, password: str) -> bytes:
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        if envelope.get("alg") != ENVELOPE_ALGORITHM:
+            raise ValueError(f"Unsupported envelope algorithm '{envelope.get('alg')}'")
+
+        cache_key: Tuple[str, str] = (envelope["key"], password)
+        data_key: Optional[bytes] = _data_keys.get(cache_key)
+        if data_key is None:
+            private_key = cls.load_key_file(
+                get_setting("private_key", paths.private_key()),
+                rsa.RSAPrivateKey,
+                password,
+            )
+            with span("cipher.unwrap_key"):
+                try:
+                    data_key = private_key.decrypt(
+                        b64decode(envelope["key"].encode("utf-8")),
+                        _get_oaep_padding(),
+                    )
+                except ValueError:
+                    raise DecryptionError(
+                        "The private key does not open the profile key"
+                    ) from None
+            _data_keys.set(cache_key, data_key)
+        return data_key
+
+    @classmethod
+    def encrypt_many(
+        cls, tokens: Dict[str, str], password: str = "", envelope: Optional[Dict] = None
+    ) -> Dict[str, Dict]:
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        if not tokens:
+            return {}
+
+        if envelope is None:
+            public_key = cls.load_key_file(
+                get_setting("public_key", paths.public_key()), rsa.RSAPublicKey
+            )
+            data_key, envelope = cls.new_envelope(public_key)
+        else:
+            data_key = cls.open_envelope(envelope, password)
+
+        records: Dict[str, Dict] = {}
+        for token_id, token in tokens.items():
+            record: Dict = SymTokenCipher(token)._encrypt_with(data_key)
+            records[token_id] = {"cipher": ASYM, **record, "envelope": envelope}
+        return records
+
+    @classmethod
+    def decrypt_many(
+        cls, records: Dict[str, Dict], password: str, workers: int = 1
+    ) -> Dict[str, str]:
+        data_keys: Dict[str, bytes] = {}
+        keyed_records: Dict[str, Tuple[Dict, bytes]] = {}
+        for token_id, record in records.items():
+            envelope: Dict = record["envelope"]
+            if envelope["key"] not in data_keys:
+                data_keys[envelope["key"]] = cls.open_envelope(envelope, password)
+            keyed_records[token_id] = (record, data_keys[envelope["key"]])
+        return SymTokenCipher.decrypt_many_with(keyed_records, workers)
 
     @staticmethod
     def get_private_key() -> rsa.RSAPrivateKey:
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
         return rsa.generate_private_key(public_exponent=65537, key_size=2048)
 
     @staticmethod
@@ -99,6 +425,9 @@ class AsymTokenCipher:
 
     @staticmethod
     def verify(public_key: rsa.RSAPublicKey, signature: bytes, token: bytes) -> bool:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding, utils
+
         public_key.verify(
             signature,
             token,
@@ -110,6 +439,9 @@ class AsymTokenCipher:
 
     @staticmethod
     def sign(private_key: rsa.RSAPrivateKey, token) -> bytes:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
         signature = private_key.sign(
             token,
             padding.PSS(
@@ -120,6 +452,9 @@ class AsymTokenCipher:
         return signature
 
     def encrypt(self, public_key: rsa.RSAPublicKey) -> bytes:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
         encrypted_token = public_key.encrypt(
             self.token,
             padding.OAEP(
@@ -131,6 +466,9 @@ class AsymTokenCipher:
         return encrypted_token
 
     def decrypt(self, private_key: rsa.RSAPrivateKey, signature: bytes) -> str:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
         decrypted_token = private_key.decrypt(
             self.token,
             padding.OAEP(
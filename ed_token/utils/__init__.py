@@ -1,14 +1,28 @@
-from ed_token.utils import paths
-from ed_token.utils.exceptions import ProfileNotFound
-from ed_token.utils.json_files import JsonFiles
-from ed_token.utils.models import Cipher, Profile
-from ed_token.utils.templates import CommandTemplate
-
-__all__ = [
-    "ProfileNotFound",
-    "Profile",
-    "Cipher",
-    "paths",
-    "JsonFiles",
-    "CommandTemplate",
-]
+from importlib import import_module
+from typing import Any
+
+_exports = {
+    "ProfileNotFound": "ed_token.utils.exceptions",
+    "AgentError": "ed_token.utils.exceptions",
+    "AgentLocked": "ed_token.utils.exceptions",
+    "DecryptionError": "ed_token.utils.exceptions",
+    "Profile": "ed_token.utils.models",
+    "Cipher": "ed_token.utils.models",
+    "paths": "ed_token.utils.paths",
+    "JsonFiles": "ed_token.utils.json_files",
+    "SqliteStorage": "ed_token.utils.sqlite_storage",
+    "Storage": "ed_token.utils.storage",
+    "open_storage": "ed_token.utils.storage",
+    "CommandTemplate": "ed_token.utils.templates",
+    "CompiledTemplate": "ed_token.utils.templates",
+    "TTLCache": "ed_token.utils.cache",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = import_module(_exports[name])
+    return module if name == "paths" else getattr(module, name)
@@ -0,0 +1,83 @@
+import os
+import struct
+from typing import IO, Iterator
+
+from ed_token.utils.exceptions import DecryptionError
+
+NONCE_PREFIX_SIZE = 8
+RECORD_SIZE = 1024 * 1024
+RECORD_HEADER = struct.Struct(">I?")
+
+
+def _get_nonce(prefix: bytes, counter: int) -> bytes:
+    return prefix + struct.pack(">I", counter)
+
+
+def _get_aad(stream_id: str, counter: int, final: bool) -> bytes:
+    return stream_id.encode("utf-8") + struct.pack(">I?", counter, final)
+
+
+class StreamWriter:
+    def __init__(self, file: IO[bytes], key: bytes, stream_id: str, magic: bytes):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        self.file: IO[bytes] = file
+        self.stream_id: str = stream_id
+        self.aead = AESGCM(key)
+        self.prefix: bytes = os.urandom(NONCE_PREFIX_SIZE)
+        self.counter: int = 0
+        self.buffer: bytearray = bytearray()
+        self.size: int = 0
+        self.file.write(magic + self.prefix)
+
+    def _write_record(self, data: bytes, final: bool) -> None:
+        encrypted = self.aead.encrypt(
+            _get_nonce(self.prefix, self.counter),
+            data,
+            _get_aad(self.stream_id, self.counter, final),
+        )
+        self.file.write(RECORD_HEADER.pack(len(encrypted), final) + encrypted)
+        self.counter += 1
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        self.size += len(data)
+        while len(self.buffer) > RECORD_SIZE:
+            self._write_record(bytes(self.buffer[:RECORD_SIZE]), False)
+            del self.buffer[:RECORD_SIZE]
+
+    def close(self) -> None:
+        self._write_record(bytes(self.buffer), True)
+        self.buffer = bytearray()
+
+
+def iter_stream(
+    file: IO[bytes], key: bytes, stream_id: str, magic: bytes
+) -> Iterator[bytes]:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    header: bytes = file.read(len(magic) + NONCE_PREFIX_SIZE)
+    if len(header) < len(magic) + NONCE_PREFIX_SIZE or not header.startswith(magic):
+        raise DecryptionError(f"The stream {stream_id} has not a valid header")
+
+    aead = AESGCM(key)
+    prefix: bytes = header[len(magic) :]
+    counter, final = 0, False
+    while not final:
+        record_header: bytes = file.read(RECORD_HEADER.size)
+        if len(record_header) < RECORD_HEADER.size:
+            raise DecryptionError(f"The stream {stream_id} is truncated")
+
+        size, final = RECORD_HEADER.unpack(record_header)
+        try:
+            yield aead.decrypt(
+                _get_nonce(prefix, counter),
+                file.read(size),
+                _get_aad(stream_id, counter, final),
+            )
+        except InvalidTag:
+            raise DecryptionError(
+                f"Wrong key or corrupted record {counter} of {stream_id}"
+            ) from None
+        counter += 1
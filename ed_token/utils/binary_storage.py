@@ -0,0 +1,309 @@
+import binascii
+import json
+import os
+import shutil
+import struct
+import tempfile
+from base64 import b64decode, b64encode
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+from ed_token.utils.storage import FileLock, Storage
+from ed_token.utils.timings import span
+
+MAGIC = b"EDTB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sBII")
+ENTRY = struct.Struct(">QI")
+FLOAT = struct.Struct(">d")
+BINARY_KEYS = frozenset(("token", "nonce", "cbc_iv", "salt", "key"))
+
+NONE, FALSE, TRUE, INT, FLOAT_TAG, STR, BYTES, LIST, DICT = range(9)
+
+_Stamp = Tuple[int, int, int]
+_parsed_tables: Dict[str, Tuple[_Stamp, Dict[str, Tuple[int, int]], int, Dict]] = {}
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _get_raw_bytes(value: str) -> Optional[bytes]:
+    try:
+        raw: bytes = b64decode(value.encode("ascii"), validate=True)
+    except (binascii.Error, UnicodeEncodeError):
+        return None
+    return raw if b64encode(raw).decode("ascii") == value else None
+
+
+def _write_str(out: bytearray, value: str) -> None:
+    encoded: bytes = value.encode("utf-8")
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def encode_value(out: bytearray, value: Any, key: Optional[str] = None) -> None:
+    if value is None:
+        out.append(NONE)
+    elif value is False or value is True:
+        out.append(TRUE if value else FALSE)
+    elif type(value) == int:
+        out.append(INT)
+        _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif type(value) == float:
+        out.append(FLOAT_TAG)
+        out += FLOAT.pack(value)
+    elif type(value) == str:
+        raw: Optional[bytes] = _get_raw_bytes(value) if key in BINARY_KEYS else None
+        if raw is None:
+            out.append(STR)
+            _write_str(out, value)
+        else:
+            out.append(BYTES)
+            _write_varint(out, len(raw))
+            out += raw
+    elif type(value) == list:
+        out.append(LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            encode_value(out, item)
+    elif type(value) == dict:
+        out.append(DICT)
+        _write_varint(out, len(value))
+        for item_key, item in value.items():
+            _write_str(out, item_key)
+            encode_value(out, item, item_key)
+    else:
+        raise TypeError(f"Can not save values of type {type(value).__name__}")
+
+
+def decode_value(data: bytes, pos: int = 0) -> Tuple[Any, int]:
+    tag: int = data[pos]
+    pos += 1
+    if tag == NONE:
+        return None, pos
+    elif tag == FALSE or tag == TRUE:
+        return tag == TRUE, pos
+    elif tag == INT:
+        value, pos = _read_varint(data, pos)
+        return (value >> 1) if not value & 1 else -((value + 1) >> 1), pos
+    elif tag == FLOAT_TAG:
+        return FLOAT.unpack_from(data, pos)[0], pos + FLOAT.size
+    elif tag == STR or tag == BYTES:
+        size, pos = _read_varint(data, pos)
+        raw: bytes = bytes(data[pos : pos + size])
+        if tag == STR:
+            return raw.decode("utf-8"), pos + size
+        return b64encode(raw).decode("ascii"), pos + size
+    elif tag == LIST:
+        count, pos = _read_varint(data, pos)
+        items: List = []
+        for _ in range(count):
+            item, pos = decode_value(data, pos)
+            items.append(item)
+        return items, pos
+    elif tag == DICT:
+        count, pos = _read_varint(data, pos)
+        content: Dict = {}
+        for _ in range(count):
+            size, pos = _read_varint(data, pos)
+            item_key: str = bytes(data[pos : pos + size]).decode("utf-8")
+            content[item_key], pos = decode_value(data, pos + size)
+        return content, pos
+    raise ValueError(f"Unknown value tag {tag}")
+
+
+def _get_stamp(f: IO[bytes]) -> _Stamp:
+    stat = os.fstat(f.fileno())
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+def _read_table(f: IO[bytes]) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    header: bytes = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{f.name} is not an edtoken binary store")
+    magic, version, count, table_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{f.name} is not an edtoken binary store")
+    elif version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary store version {version}")
+
+    table: bytes = f.read(table_size)
+    offsets: Dict[str, Tuple[int, int]] = {}
+    pos: int = 0
+    for _ in range(count):
+        size, pos = _read_varint(table, pos)
+        name: str = table[pos : pos + size].decode("utf-8")
+        offsets[name] = ENTRY.unpack_from(table, pos + size)
+        pos += size + ENTRY.size
+    return offsets, HEADER.size + table_size
+
+
+class BinaryStorage(FileLock, Storage):
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        self.path: str = path
+        self.modified_file: bool = False
+        self.lock_file: Optional[IO] = None
+        self.file: Optional[IO[bytes]] = None
+
+        if migrate_from is None:
+            migrate_from = "%s.json" % (os.path.splitext(path)[0])
+        if not os.path.exists(path) and os.path.exists(migrate_from):
+            self._migrate_json(migrate_from)
+        self._load()
+
+    def __enter__(self) -> "BinaryStorage":
+        self.lock()
+        self._load()
+        return self
+
+    def _migrate_json(self, json_path: str) -> None:
+        with open(json_path, "r") as f:
+            raw_content: str = f.read()
+        content: Dict = json.loads(raw_content) if raw_content.strip() else {}
+
+        self.offsets, self.data_start = {}, 0
+        self.values, self.names = content, dict.fromkeys(content)
+        self.dirty = set(content)
+        self._save_content()
+
+    def _load(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self.data_start: int = 0
+        self.values: Dict[str, Any] = {}
+        self.dirty: set = set()
+        if os.path.exists(self.path):
+            self.file = open(self.path, "rb")
+            cache_key: str = os.path.abspath(self.path)
+            stamp: _Stamp = _get_stamp(self.file)
+            cached = _parsed_tables.get(cache_key)
+            if cached is not None and cached[0] == stamp:
+                _, self.offsets, self.data_start, values = cached
+            else:
+                with span("store.parse"):
+                    self.offsets, self.data_start = _read_table(self.file)
+                values = {}
+                _parsed_tables[cache_key] = (
+                    stamp,
+                    self.offsets,
+                    self.data_start,
+                    values,
+                )
+            self.values = dict(values)
+            self._decoded: Dict[str, Any] = values
+        else:
+            self._decoded = {}
+        self.names: Dict[str, None] = dict.fromkeys(self.offsets)
+
+    def _read_raw(self, name: str) -> bytes:
+        offset, length = self.offsets[name]
+        self.file.seek(self.data_start + offset)
+        return self.file.read(length)
+
+    @property
+    def content(self) -> Dict:
+        return {name: self.get_value(name) for name in self.names}
+
+    def remove_key(self, key: Union[str, list]):
+        self.modified_file = True
+        if type(key) == str and key in self.names:
+            del self.names[key]
+            self.values.pop(key, None)
+            self.dirty.discard(key)
+        elif type(key) != str and key[0] in self.names:
+            profile = self.get_value(key[0])
+            if type(profile) == dict and key[1] in profile:
+                profile = dict(profile)
+                del profile[key[1]]
+                self._set(key[0], profile)
+
+    def get_value(self, key: str) -> Optional[Any]:
+        if key not in self.names:
+            return None
+        elif key not in self.values:
+            value, _ = decode_value(self._read_raw(key))
+            self.values[key] = self._decoded[key] = value
+        return self.values[key]
+
+    def list_keys(self, key: str = None) -> list:
+        if key is not None:
+            if key not in self.names:
+                raise KeyError(key)
+            return list(self.get_value(key).keys())
+        return list(self.names)
+
+    def _set(self, key: str, value: Any) -> None:
+        self.names[key] = None
+        self.values[key] = value
+        self.dirty.add(key)
+
+    def set_value(self, key: str, value: Union[str, dict]):
+        self.modified_file = True
+        if type(value) == str or not len(value):
+            self._set(key, value)
+        else:
+            self._set(key, {**(self.get_value(key) or {}), **value})
+
+    def save_changes(self):
+        with span("store.save"):
+            self._save_content()
+        self.modified_file = False
+
+    def _save_content(self) -> None:
+        table, data = bytearray(), bytearray()
+        for name in self.names:
+            if name in self.dirty or name not in self.offsets:
+                encoded = bytearray()
+                encode_value(encoded, self.values[name])
+            else:
+                encoded = self._read_raw(name)
+            _write_str(table, name)
+            table += ENTRY.pack(len(data), len(encoded))
+            data += encoded
+
+        directory: str = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(self.path)}."
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(self.names), len(table)))
+                f.write(table)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        values: Dict[str, Any] = dict(self.values)
+        self._load()
+        self.values.update(values)
+        self._decoded.update(values)
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.unlock()
@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 128, ttl: float = 300.0):
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock: Lock = Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, (expires, _) in self._items.items() if expires <= now]
+        for key in expired:
+            del self._items[key]
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._items[key]
+                return default
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._items[key] = (now + self.ttl, value)
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._evict_expired(now)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Optional[Any]:
+        with self._lock:
+            item = self._items.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,40 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+from ed_token.utils import paths
+
+STORES = {
+    "json": paths.user_json,
+    "sqlite": paths.user_db,
+    "binary": paths.user_binary,
+}
+
+
+def load_config(path: Optional[str] = None) -> Dict:
+    path = path if path else paths.config()
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r") as f:
+        raw_config: str = f.read()
+    return json.loads(raw_config) if raw_config.strip() else {}
+
+
+def get_setting(name: str, default: Any = None, path: Optional[str] = None) -> Any:
+    return load_config(path).get(name, default)
+
+
+def set_setting(name: str, value: Any, path: Optional[str] = None) -> None:
+    path = path if path else paths.config()
+    config: Dict = load_config(path)
+    config[name] = value
+    with open(path, "w") as f:
+        json.dump(config, f, indent=4)
+
+
+def store_path(config_path: Optional[str] = None) -> str:
+    store: str = get_setting("storage", "json", config_path)
+    if store not in STORES:
+        raise RuntimeError(f"Unknown storage '{store}', use one of {list(STORES)}")
+    return STORES[store]()
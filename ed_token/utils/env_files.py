@@ -0,0 +1,38 @@
+import json
+from typing import Dict
+
+QUOTES = ("'", '"')
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in QUOTES:
+        if value[0] == '"':
+            return value[1:-1].replace("\\n", "\n").replace('\\"', '"')
+        return value[1:-1]
+    return value.split(" #", 1)[0].rstrip()
+
+
+def parse_dotenv(content: str) -> Dict[str, str]:
+    values: Dict[str, str] = {}
+    for number, line in enumerate(content.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("export "):
+            line = line[len("export ") :].lstrip()
+        if "=" not in line:
+            raise ValueError(f"Line {number} is not a KEY=VALUE pair")
+
+        key, value = line.split("=", 1)
+        values[key.strip()] = _unquote(value.strip())
+    return values
+
+
+def parse_mapping(content: str) -> Dict[str, str]:
+    if content.lstrip().startswith("{"):
+        values = json.loads(content)
+        return {
+            key: value if type(value) == str else json.dumps(value)
+            for key, value in values.items()
+        }
+    return parse_dotenv(content)
@@ -1,2 +1,18 @@
 class ProfileNotFound(Exception):
     pass
+
+
+class AgentError(Exception):
+    pass
+
+
+class AgentLocked(AgentError):
+    pass
+
+
+class DecryptionError(Exception):
+    pass
+
+
+class UnverifiedPassword(Exception):
+    pass
@@ -1,27 +1,51 @@
 import json
-from typing import Any, Optional, Union
+import os
+import shutil
+import tempfile
+from typing import IO, Any, Dict, Optional, Tuple, Union
 
+from ed_token.utils.storage import FileLock, Storage
+from ed_token.utils.timings import span
 
-class JsonFiles:
+_parsed_stores: Dict[str, Tuple[Tuple[int, int, int], Dict]] = {}
+
+
+def _get_stamp(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
+def _load_content(path: str) -> Dict:
+    cache_key: str = os.path.abspath(path)
+    stamp: Tuple[int, int, int] = _get_stamp(path)
+    cached = _parsed_stores.get(cache_key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with span("store.parse"), open(path, "r") as f:
+        content: Dict = json.loads(f.read())
+    _parsed_stores[cache_key] = (stamp, content)
+    return content
+
+
+class JsonFiles(FileLock, Storage):
     def __init__(self, path: str):
-        self.file = open(path, "r")
         self.path = path
-        self.content = json.loads(self.file.read())
+        self.content = dict(_load_content(path))
         self.modified_file = False
+        self.lock_file: Optional[IO] = None
 
     def __enter__(self) -> "JsonFiles":
+        self.lock()
+        self.content = dict(_load_content(self.path))
         return self
 
-    def __exit__(self, type, value, traceback):
-        if self.modified_file:
-            self.save_changes()
-        self.close_file()
-
     def remove_key(self, key: Union[str, list]):
         self.modified_file = True
         if type(key) == str and key in self.content:
             del self.content[key]
         elif key[0] in self.content and key[1] in self.content[key[0]]:
+            self.content[key[0]] = dict(self.content[key[0]])
             del self.content[key[0]][key[1]]
 
     def get_value(self, key: str) -> Optional[Any]:
@@ -39,17 +63,38 @@ class JsonFiles:
         if type(value) == str or not len(value):
             self.content[key] = value
         else:
-            value_key_dict = list(value.keys())[0]
-            if key not in self.content:
-                self.content[key] = {}
-            self.content[key].update(value)
+            self.content[key] = {**self.content.get(key, {}), **value}
 
     def save_changes(self):
-        self.file = open(self.path, "w")
-        json.dump(self.content, self.file, indent=4)
+        with span("store.save"):
+            self._save_content()
+
+        _parsed_stores[os.path.abspath(self.path)] = (
+            _get_stamp(self.path),
+            dict(self.content),
+        )
+        self.modified_file = False
+
+    def _save_content(self) -> None:
+        directory: str = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(self.path)}."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.content, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
 
     def close_file(self):
-        self.file.close()
+        self.unlock()
 
     @staticmethod
     def pretty_print(content: str) -> str:
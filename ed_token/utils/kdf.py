@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import time
+from base64 import b64decode, b64encode
+from typing import Dict, Optional
+
+from ed_token.utils.config import get_setting
+
+SALT_SIZE = 16
+KEY_SIZE = 32
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2-sha256"
+DEFAULT_PARAMS: Dict = {"name": SCRYPT, "n": 2 ** 14, "r": 8, "p": 1}
+DEFAULT_BUDGET_MS = 100
+MIN_SCRYPT_N = 2 ** 10
+MAX_SCRYPT_N = 2 ** 17
+MIN_PBKDF2_ITERATIONS = 10000
+
+
+def new_params(config_path: Optional[str] = None) -> Dict:
+    params: Dict = dict(get_setting("kdf", DEFAULT_PARAMS, config_path))
+    params["salt"] = b64encode(os.urandom(SALT_SIZE)).decode("utf-8")
+    return params
+
+
+def get_params_id(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+def derive(password: str, params: Dict) -> bytes:
+    salt: bytes = b64decode(params["salt"].encode("utf-8"))
+    if params["name"] == SCRYPT:
+        n, r, p = params["n"], params["r"], params["p"]
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r * p + 2 ** 20,
+            dklen=KEY_SIZE,
+        )
+    elif params["name"] == PBKDF2:
+        return hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), salt, params["iterations"], KEY_SIZE
+        )
+    raise ValueError(f"Unsupported KDF '{params['name']}'")
+
+
+def measure(params: Dict) -> float:
+    params = {**params, "salt": b64encode(os.urandom(SALT_SIZE)).decode("utf-8")}
+    start = time.perf_counter()
+    derive("calibrate", params)
+    return time.perf_counter() - start
+
+
+def calibrate(budget_ms: float = DEFAULT_BUDGET_MS, name: str = SCRYPT) -> Dict:
+    budget: float = budget_ms / 1000
+    if name == SCRYPT:
+        params: Dict = {"name": SCRYPT, "n": MIN_SCRYPT_N, "r": 8, "p": 1}
+        seconds: float = measure(params)
+        while params["n"] < MAX_SCRYPT_N and seconds * 2 <= budget:
+            params["n"] *= 2
+            seconds = measure(params)
+        if seconds > budget and params["n"] > MIN_SCRYPT_N:
+            params["n"] //= 2
+        return params
+    elif name == PBKDF2:
+        params = {"name": PBKDF2, "iterations": MIN_PBKDF2_ITERATIONS}
+        seconds = measure(params)
+        iterations = int(MIN_PBKDF2_ITERATIONS * budget / seconds) // 1000 * 1000
+        params["iterations"] = max(MIN_PBKDF2_ITERATIONS, iterations)
+        return params
+    raise ValueError(f"Unsupported KDF '{name}'")
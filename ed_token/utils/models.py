@@ -1,26 +1,111 @@
+import hashlib
 import json
-from typing import Dict, Optional, Union
+from typing import Dict, Iterable, List, Optional, Union
 
-from pydantic import BaseModel
+from ed_token.utils.timings import span
 
-from ed_token.utils.templates import CommandTemplate
+INDEX_KEY = "_index"
+INDEX_VERSION = 1
 
 
-class Cipher(BaseModel):
-    type: str
-    key: str
+class Cipher:
+    __slots__ = ("type", "key")
 
+    def __init__(self, type: str, key: str):
+        self.type: str = type
+        self.key: str = key
 
-class Profile(BaseModel):
-    id: str
-    template: str = ""
-    content: Optional[Dict] = None
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Cipher):
+            return NotImplemented
+        return (self.type, self.key) == (other.type, other.key)
+
+    def __repr__(self) -> str:
+        return f"Cipher(type={self.type!r}, key='***')"
+
+
+class Profile:
+    __slots__ = ("id", "template", "content", "index", "changes")
+
+    def __init__(
+        self,
+        id: str,
+        template: str = "",
+        content: Optional[Dict] = None,
+        index: Optional[Dict] = None,
+    ):
+        self.id: str = id
+        self.template: str = template
+        self.content: Optional[Dict] = content
+        self.index: Optional[Dict] = index
+        self.changes: Dict[str, None] = {}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Profile):
+            return NotImplemented
+        return (self.id, self.template, self.content) == (
+            other.id,
+            other.template,
+            other.content,
+        )
+
+    def __repr__(self) -> str:
+        return f"Profile(id={self.id!r}, template={self.template!r})"
 
     def __str__(self) -> str:
         return json.dumps({self.id: self.content}, indent=4)
 
     def set_token(self, id: str, token: str) -> None:
-        self.content[id] = token
+        self.set_tokens({id: token})
+
+    def set_tokens(self, tokens: Dict[str, Union[str, Dict]]) -> None:
+        self.content.update(tokens)
+        self.changes.update(dict.fromkeys(tokens))
+        self._update_index(tokens)
+
+    def remove_token(self, id: str) -> None:
+        if id in self.content:
+            del self.content[id]
+            self.changes[id] = None
+            self._update_index([id])
+
+    def get_index(self) -> Dict:
+        if type(self.index) != dict or self.index.get("version") != INDEX_VERSION:
+            self.index = {"version": INDEX_VERSION, "encrypted": {}}
+            self.index.update(_get_template_index(self.content.get("template")))
+            for key, value in self.content.items():
+                if type(value) == dict:
+                    self.index["encrypted"][key] = _get_record_index(value)
+        return self.index
+
+    def _update_index(self, keys: Iterable[str]) -> None:
+        index: Dict = self.get_index()
+        index = {**index, "encrypted": dict(index["encrypted"])}
+        for key in keys:
+            value = self.content.get(key)
+            if type(value) == dict:
+                index["encrypted"][key] = _get_record_index(value)
+            else:
+                index["encrypted"].pop(key, None)
+            if key == "template":
+                index.update(_get_template_index(value))
+        self.index = index
+
+    def get_missing_keys(self) -> List[str]:
+        index: Dict = self.get_index()
+        return [
+            key
+            for key in index["placeholders"] + index["encrypted_placeholders"]
+            if key not in self.content
+        ]
+
+    def get_template_records(self) -> Dict[str, Dict]:
+        index: Dict = self.get_index()
+        return {
+            key: index["encrypted"][key]
+            for key in index["encrypted_placeholders"]
+            if key in index["encrypted"]
+        }
 
     def get_token(self, id: str) -> Union[str, int, None]:
         return self.content[id] if id in self.content else None
@@ -28,8 +113,76 @@ class Profile(BaseModel):
     def get_dict(self) -> Dict:
         return self.content
 
-    def get_template(self, cipher_type: Optional[str], key: str = "") -> str:
-        if cipher_type == "sym" or not cipher_type:
-            return CommandTemplate(self.id, "sym", key, self.content).get_command()
-        elif cipher_type == "asym":
-            raise NotImplementedError()
+    def get_template(
+        self, cipher_type: Optional[str], key: str = "", workers: int = 1
+    ) -> str:
+        from ed_token.utils.templates import CommandTemplate
+
+        return CommandTemplate(
+            self.id, cipher_type or "sym", key, self.content, workers=workers
+        ).get_command()
+
+    def get_crypted_keys(self) -> list:
+        return list(self.get_index()["encrypted"])
+
+    def get_blob_keys(self) -> List[str]:
+        return [
+            key
+            for key, record in self.get_index()["encrypted"].items()
+            if record.get("blob")
+        ]
+
+    def decrypt_many(
+        self, keys: Iterable[str], password: str, workers: int = 1
+    ) -> Dict[str, str]:
+        with span("cipher.import"):
+            from ed_token.token_cipher import decrypt_records
+
+        records: Dict[str, Dict] = {}
+        for key in keys:
+            record = self.get_token(key)
+            if type(record) != dict:
+                raise KeyError(f"'{key}' is not an encrypted token of {self.id}")
+            records[key] = record
+        return decrypt_records(records, password, workers)
+
+
+def _get_record_index(record: Dict) -> Dict:
+    index: Dict = {
+        "cipher": record.get("cipher", "sym"),
+        "version": record.get("version", 1),
+        "alg": record.get("alg", "aes-256-cbc"),
+    }
+    if "blob" in record:
+        index["blob"] = True
+    return index
+
+
+def is_valid_index(index: Optional[Dict], content: Dict) -> bool:
+    if type(index) != dict or index.get("version") != INDEX_VERSION:
+        return False
+    elif index.get("template") != _get_template_digest(content.get("template")):
+        return False
+    return set(index.get("encrypted", ())) == {
+        key for key, value in content.items() if type(value) == dict
+    }
+
+
+def _get_template_digest(template: Optional[str]) -> Optional[str]:
+    if type(template) != str:
+        return None
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()
+
+
+def _get_template_index(template: Optional[str]) -> Dict:
+    if type(template) != str:
+        return {"placeholders": [], "encrypted_placeholders": [], "template": None}
+
+    from ed_token.utils.templates import CompiledTemplate
+
+    compiled = CompiledTemplate.compile(template)
+    return {
+        "placeholders": list(compiled.keys),
+        "encrypted_placeholders": list(compiled.crypted_keys),
+        "template": _get_template_digest(template),
+    }
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 
@@ -5,9 +6,35 @@ def user_json() -> str:
     return "%s/.edtoken/user_data.json" % (Path.home())
 
 
+def user_db() -> str:
+    return "%s/.edtoken/user_data.db" % (Path.home())
+
+
+def user_binary() -> str:
+    return "%s/.edtoken/user_data.edb" % (Path.home())
+
+
 def config() -> str:
     return "%s/.edtoken/config.json" % (Path.home())
 
 
 def cache() -> str:
     return "%s/.edtoken/cache" % (Path.home())
+
+
+def blobs() -> str:
+    return "%s/.edtoken/blobs" % (Path.home())
+
+
+def private_key() -> str:
+    return "%s/.edtoken/private_key.pem" % (Path.home())
+
+
+def public_key() -> str:
+    return "%s/.edtoken/public_key.pem" % (Path.home())
+
+
+def agent_socket() -> str:
+    return os.environ.get(
+        "EDTOKEN_AGENT_SOCK", "%s/.edtoken/agent.sock" % (Path.home())
+    )
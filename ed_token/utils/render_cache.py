@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import IO, Dict, List, Optional, Tuple
+
+from ed_token.utils import paths
+from ed_token.utils.aead_stream import StreamWriter, iter_stream
+from ed_token.utils.config import get_setting
+from ed_token.utils.exceptions import DecryptionError
+
+MAGIC = b"EDRC1"
+DEFAULT_MAX_SIZE_MB = 256
+READ_SIZE = 1024 * 1024
+
+
+def get_render_key(derived_key: bytes) -> bytes:
+    return hashlib.sha256(b"edtoken-render-cache\0" + derived_key).digest()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_digest(content: Dict) -> str:
+    encoded: bytes = json.dumps(content, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class _EntryWriter:
+    def __init__(self, cache: "RenderCache", entry_id: str, render_key: bytes):
+        self.cache: "RenderCache" = cache
+        self.entry_id: str = entry_id
+
+        os.makedirs(cache.directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(
+            dir=cache.directory, prefix=".render."
+        )
+        self.file: IO[bytes] = os.fdopen(fd, "wb")
+        self.stream = StreamWriter(self.file, render_key, entry_id, MAGIC)
+
+    def write(self, data: bytes) -> None:
+        self.stream.write(data)
+
+    def commit(self) -> None:
+        self.stream.close()
+        self.file.close()
+        os.replace(self.temp_path, self.cache.get_path(self.entry_id))
+        self.cache.evict()
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class RenderCache:
+    def __init__(
+        self, directory: Optional[str] = None, max_size: Optional[int] = None
+    ):
+        self.directory: str = directory if directory else f"{paths.cache()}/renders"
+        if max_size is None:
+            size_mb: int = get_setting("render_cache_size_mb", DEFAULT_MAX_SIZE_MB)
+            max_size = size_mb * 1024 * 1024
+        self.max_size: int = max_size
+
+    @staticmethod
+    def get_entry_id(
+        file_digest: str, store: str, profile_id: str, profile_digest: str, layout: str
+    ) -> str:
+        key: str = json.dumps([file_digest, store, profile_id, profile_digest, layout])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get_path(self, entry_id: str) -> str:
+        return f"{self.directory}/{entry_id}"
+
+    def writer(self, entry_id: str, render_key: bytes) -> _EntryWriter:
+        return _EntryWriter(self, entry_id, render_key)
+
+    def read_into(
+        self, entry_id: str, render_key: bytes, output: IO[bytes]
+    ) -> bool:
+        path: str = self.get_path(entry_id)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return False
+
+        with f:
+            try:
+                for data in iter_stream(f, render_key, entry_id, MAGIC):
+                    output.write(data)
+            except DecryptionError:
+                return False
+
+        os.utime(path)
+        return True
+
+    def evict(self) -> None:
+        entries: List[Tuple[float, int, str]] = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size: int = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            os.remove(path)
+            total_size -= size
+
+    def clear(self) -> None:
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                os.remove(entry.path)
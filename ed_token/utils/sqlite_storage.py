@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Optional, Union
+
+from ed_token.utils.storage import Storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    profile TEXT NOT NULL REFERENCES profiles (name) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    UNIQUE (profile, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SqliteStorage(Storage):
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        self.path: str = path
+        self.modified_file: bool = False
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+        if migrate_from is None:
+            migrate_from = "%s.json" % (os.path.splitext(path)[0])
+        self._migrate_json(migrate_from)
+
+    def __enter__(self) -> "SqliteStorage":
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self
+
+    def _migrate_json(self, json_path: str) -> None:
+        migrated = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'migrated_from'"
+        ).fetchone()
+        if migrated is not None or not os.path.exists(json_path):
+            return
+
+        with open(json_path, "r") as f:
+            raw_content: str = f.read()
+        content: Dict = json.loads(raw_content) if raw_content.strip() else {}
+
+        with self.connection:
+            for profile_id, profile in content.items():
+                if type(profile) == dict:
+                    self._set_profile(profile_id, profile)
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_from', ?)",
+                (json_path,),
+            )
+
+    def _set_profile(self, profile_id: str, profile: Dict) -> None:
+        self.connection.execute(
+            "INSERT OR IGNORE INTO profiles (name) VALUES (?)", (profile_id,)
+        )
+        self.connection.executemany(
+            "INSERT INTO tokens (profile, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (profile, key) DO UPDATE SET value = excluded.value",
+            [(profile_id, k, json.dumps(v)) for k, v in profile.items()],
+        )
+
+    def _exists_profile(self, profile_id: str) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM profiles WHERE name = ?", (profile_id,)
+        ).fetchone()
+        return row is not None
+
+    @property
+    def content(self) -> Dict:
+        return {
+            profile_id: self.get_value(profile_id) for profile_id in self.list_keys()
+        }
+
+    def remove_key(self, key: Union[str, list]):
+        self.modified_file = True
+        if type(key) == str:
+            self.connection.execute("DELETE FROM profiles WHERE name = ?", (key,))
+        else:
+            self.connection.execute(
+                "DELETE FROM tokens WHERE profile = ? AND key = ?", (key[0], key[1])
+            )
+
+    def get_value(self, key: str) -> Optional[Any]:
+        if not self._exists_profile(key):
+            return None
+
+        rows = self.connection.execute(
+            "SELECT key, value FROM tokens WHERE profile = ? ORDER BY rowid", (key,)
+        )
+        return {token_id: json.loads(value) for token_id, value in rows}
+
+    def list_keys(self, key: str = None) -> list:
+        if key is not None:
+            if not self._exists_profile(key):
+                raise KeyError(key)
+            rows = self.connection.execute(
+                "SELECT key FROM tokens WHERE profile = ? ORDER BY rowid", (key,)
+            )
+        else:
+            rows = self.connection.execute("SELECT name FROM profiles ORDER BY rowid")
+        return [row[0] for row in rows]
+
+    def set_value(self, key: str, value: Union[str, dict]):
+        if type(value) != dict:
+            raise TypeError("The SQLite storage only saves profile dictionaries")
+
+        self.modified_file = True
+        if not len(value):
+            self.connection.execute("DELETE FROM tokens WHERE profile = ?", (key,))
+        self._set_profile(key, value)
+
+    def save_changes(self):
+        self.connection.commit()
+
+    def close_file(self):
+        self.connection.close()
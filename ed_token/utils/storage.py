@@ -0,0 +1,81 @@
+import os
+from abc import ABC, abstractmethod
+from typing import IO, Any, Dict, Optional, Union
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+BINARY_EXTENSIONS = (".edb",)
+
+
+class Storage(ABC):
+    content: Dict
+    modified_file: bool = False
+
+    def __enter__(self) -> "Storage":
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if self.modified_file:
+            self.save_changes()
+        self.close_file()
+
+    @abstractmethod
+    def remove_key(self, key: Union[str, list]):
+        pass
+
+    @abstractmethod
+    def get_value(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def list_keys(self, key: str = None) -> list:
+        pass
+
+    @abstractmethod
+    def set_value(self, key: str, value: Union[str, dict]):
+        pass
+
+    @abstractmethod
+    def save_changes(self):
+        pass
+
+    @abstractmethod
+    def close_file(self):
+        pass
+
+
+class FileLock:
+    path: str
+    lock_file: Optional[IO] = None
+
+    def lock(self) -> None:
+        if fcntl is None or self.lock_file is not None:
+            return
+        self.lock_file = open(f"{self.path}.lock", "a")
+        fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+
+    def unlock(self) -> None:
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+
+def open_storage(path: str) -> Storage:
+    extension: str = os.path.splitext(path)[1]
+    if extension in SQLITE_EXTENSIONS:
+        from ed_token.utils.sqlite_storage import SqliteStorage
+
+        return SqliteStorage(path)
+    elif extension in BINARY_EXTENSIONS:
+        from ed_token.utils.binary_storage import BinaryStorage
+
+        return BinaryStorage(path)
+
+    from ed_token.utils.json_files import JsonFiles
+
+    return JsonFiles(path)
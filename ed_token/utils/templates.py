@@ -1,66 +1,127 @@
 import re
-from base64 import b64decode
-from pathlib import Path
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
-from ed_token.token_cipher import AsymTokenCipher, SymTokenCipher
-from ed_token.utils import paths
-from ed_token.utils.json_files import JsonFiles
+from ed_token.utils.config import store_path
+from ed_token.utils.storage import open_storage
+from ed_token.utils.timings import span
+
+LITERAL, PLAIN, CRYPTED = range(3)
+PLACEHOLDER_REGEX = re.compile(r"\{(\?)?([\w-]+)\}")
+COMPILED_CACHE_SIZE = 1024
+
+
+class CompiledTemplate:
+    def __init__(self, template: str):
+        self.template: str = template
+        self.segments: Tuple[Tuple[int, str, str], ...] = self._parse(template)
+        self.keys: List[str] = self._get_keys(PLAIN)
+        self.crypted_keys: List[str] = self._get_keys(CRYPTED)
+
+    @staticmethod
+    def _parse(template: str) -> Tuple[Tuple[int, str, str], ...]:
+        segments: List[Tuple[int, str, str]] = []
+        position: int = 0
+        for match in PLACEHOLDER_REGEX.finditer(template):
+            if match.start() > position:
+                literal = template[position : match.start()]
+                segments.append((LITERAL, literal, literal))
+            kind = CRYPTED if match.group(1) else PLAIN
+            segments.append((kind, match.group(2), match.group(0)))
+            position = match.end()
+
+        if position < len(template):
+            literal = template[position:]
+            segments.append((LITERAL, literal, literal))
+        return tuple(segments)
+
+    def _get_keys(self, kind: int) -> List[str]:
+        keys: Dict[str, None] = {}
+        for segment_kind, key, _ in self.segments:
+            if segment_kind == kind:
+                keys[key] = None
+        return list(keys)
+
+    @classmethod
+    def compile(cls, template: str) -> "CompiledTemplate":
+        return _compile(template)
+
+    def render(
+        self, content: Dict, decrypted_tokens: Optional[Dict[str, str]] = None
+    ) -> str:
+        decrypted_tokens = decrypted_tokens if decrypted_tokens else {}
+        parts: List[str] = []
+        for kind, key, raw in self.segments:
+            if kind == LITERAL:
+                parts.append(raw)
+            elif kind == PLAIN:
+                value = content.get(key)
+                if value is None or type(value) == dict:
+                    value = raw
+                parts.append(str(value))
+            else:
+                parts.append(decrypted_tokens.get(key, raw))
+        return "".join(parts)
+
+
+@lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compile(template: str) -> CompiledTemplate:
+    with span("template.compile"):
+        return CompiledTemplate(template)
 
 
 class CommandTemplate:
-    def __init__(self, name="", cipher_type=None, decrypt_key=None, content=None):
+    def __init__(
+        self,
+        name="",
+        cipher_type=None,
+        decrypt_key=None,
+        content=None,
+        workers=1,
+        decrypted_tokens=None,
+    ):
         self.name = name
         self.decrypt_key = decrypt_key
         self.cipher_type = cipher_type
-        self.json_file_obj = JsonFiles(paths.user_json())
+        self.workers = workers
+        self.decrypted_tokens: Optional[Dict[str, str]] = decrypted_tokens
 
-        if not content:
-            self.content = self.json_file_obj.get_value(name)
+        if content is None:
+            with open_storage(store_path()) as user_json_obj:
+                self.content = user_json_obj.get_value(name)
         else:
             self.content = content
         self.template = self.content["template"] if "template" in self.content else ""
 
-    def _get_blocks(self) -> list:
-        return re.findall(r"\{(\?{0}[\w-]+)\}", self.template)
+    def _get_crypted_blocks_values(self, crypted_keys: List[str]) -> Dict[str, str]:
+        if not crypted_keys:
+            return {}
+        elif self.decrypted_tokens is not None:
+            return {
+                key: self.decrypted_tokens[key]
+                for key in crypted_keys
+                if key in self.decrypted_tokens
+            }
+        elif self.cipher_type in ("sym", "asym"):
+            with span("cipher.import"):
+                from ed_token.token_cipher import decrypt_records
 
-    def _get_crypted_blocks(self) -> list:
-        return re.findall(r"\{(\?{1}[\w-]+)\}", self.template)
+            records = {
+                key: self.content[key]
+                for key in crypted_keys
+                if type(self.content.get(key)) == dict
+            }
+            return decrypt_records(records, self.decrypt_key, self.workers)
+        return {}
 
-    def _set_blocks_values(self, command: str, dict_values: dict) -> str:
-        for value in dict_values.values():
-            command = re.sub(r"\{(\?{0}[\w-]+)\}", value, command, 1)
-        return command
+    def render(self, compiled: CompiledTemplate) -> str:
+        for key in compiled.keys + compiled.crypted_keys:
+            if key not in self.content:
+                print(KeyError(key))
 
-    def _set_crypted_blocks_values(
-        self, command: str, crypted_dict_values: dict
-    ) -> str:
-        if self.cipher_type == "sym":
-            for key, value in crypted_dict_values.items():
-                if not type(value) == dict:
-                    continue
-                encrypted_token = b64decode(value["token"].encode("utf-8"))
-                iv = b64decode(value["cbc_iv"].encode("utf-8"))
-                padding = value["padding_size"]
-                tcipher = SymTokenCipher(encrypted_token, padding)
-                decrypted_token = tcipher.decrypt(self.decrypt_key, iv)
-                command = re.sub(r"\{(\?{1}[\w-]+)\}", decrypted_token, command, 1)
-        elif self.cipher_type == "asym":
-            raise NotImplementedError()
-        return command
+        decrypted_tokens = self._get_crypted_blocks_values(compiled.crypted_keys)
+        with span("template.render"):
+            return compiled.render(self.content, decrypted_tokens)
 
     def get_command(self) -> str:
-        dict_values = {}
-        crypted_dict_values = {}
-        keys = self._get_blocks()
-        crypted_keys = self._get_crypted_blocks()
-        try:
-            for key in keys:
-                dict_values[key] = self.content[key]
-            for crypted_key in crypted_keys:
-                crypted_dict_values[crypted_key[1:]] = self.content[crypted_key[1:]]
-        except KeyError as err:
-            print(err)
-
-        command = self._set_blocks_values(self.template, dict_values)
-        command = self._set_crypted_blocks_values(command, crypted_dict_values)
-        return command
+        return self.render(CompiledTemplate.compile(self.template))
@@ -0,0 +1,85 @@
+import threading
+from time import perf_counter
+from typing import Callable, Dict, List, Union
+
+Hook = Callable[[str, float], None]
+
+STARTED_AT: float = perf_counter()
+_hooks: List[Hook] = []
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.start: float = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        record(self.name, perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str) -> Union[_Span, _NullSpan]:
+    if not _hooks:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def record(name: str, seconds: float) -> None:
+    for hook in list(_hooks):
+        hook(name, seconds)
+
+
+def add_hook(hook: Hook) -> None:
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def is_enabled() -> bool:
+    return bool(_hooks)
+
+
+class Timings:
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def __enter__(self) -> "Timings":
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        remove_hook(self)
+
+    def format(self) -> str:
+        lines: List[str] = [f"{'span':<28}{'calls':>8}{'total ms':>12}"]
+        for name, total in sorted(self.totals.items(), key=lambda item: -item[1]):
+            lines.append(f"{name:<28}{self.counts[name]:>8}{total * 1000:>12.3f}")
+        return "\n".join(lines)
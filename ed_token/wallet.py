@@ -1,17 +1,52 @@
+import glob
+import hashlib
+import io
+import json
 import os
 import shutil
-from typing import List
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import IO, Dict, Iterator, List, Optional, Union
 
 from ed_token.edtoken import EDToken
 from ed_token.utils import paths
-from ed_token.utils.templates import CommandTemplate
+from ed_token.utils.config import get_setting, store_path
+from ed_token.utils.models import Profile
+from ed_token.utils.render_cache import (
+    RenderCache,
+    content_digest,
+    file_digest,
+    get_render_key,
+)
+from ed_token.utils.templates import (
+    PLACEHOLDER_REGEX,
+    CommandTemplate,
+    CompiledTemplate,
+)
+from ed_token.utils.timings import span
+
+CHUNK_SIZE = 64 * 1024
+MAX_PLACEHOLDER_SIZE = 4096
 
 
 class Wallet:
-    def __init__(self, file_path: str, edtoken: EDToken):
+    def __init__(
+        self,
+        file_path: str,
+        edtoken: EDToken,
+        cache_path: Optional[str] = None,
+        decrypted_tokens: Optional[Dict[str, str]] = None,
+        render_key: Optional[bytes] = None,
+    ):
         self.file_path: str = os.path.expanduser(file_path)
         self.cache_path: str = f"{paths.cache()}/{os.path.basename(file_path)}"
-        self.edtoken: EDToken = edtoken 
+        if cache_path is not None:
+            self.cache_path = cache_path
+        self.edtoken: EDToken = edtoken
+        self.decrypted_tokens: Optional[Dict[str, str]] = decrypted_tokens
+        self.render_key: Optional[bytes] = render_key
 
         if not edtoken.profile_id:
             raise RuntimeError(f"Does not exists the profile")
@@ -21,12 +56,16 @@ class Wallet:
         else:
             raise FileNotFoundError("File not found")
 
-    def decrypt_file(self, decrypt_key: str) -> List[str]:
-        template = CommandTemplate(
+    def _get_template(self, decrypt_key: str) -> CommandTemplate:
+        return CommandTemplate(
             cipher_type="sym",
             decrypt_key=decrypt_key,
             content=self.edtoken.profile.content,
+            decrypted_tokens=self.decrypted_tokens,
         )
+
+    def decrypt_file(self, decrypt_key: str) -> List[str]:
+        template = self._get_template(decrypt_key)
         decripted_file: List[str] = []
         for line in self.cred_file:
             template.template = line
@@ -34,26 +73,493 @@ class Wallet:
 
         return decripted_file
 
+    def _read_chunks(self) -> Iterator[str]:
+        pending: str = ""
+        while True:
+            chunk: str = self.cred_file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+
+            chunk = pending + chunk
+            cut: int = chunk.rfind("{")
+            pending = ""
+            if cut != -1 and "}" not in chunk[cut:]:
+                if len(chunk) - cut <= MAX_PLACEHOLDER_SIZE:
+                    chunk, pending = chunk[:cut], chunk[cut:]
+
+            if chunk:
+                yield chunk
+
+        if pending:
+            yield pending
+
+    def iter_decrypted(self, decrypt_key: str) -> Iterator[str]:
+        template = self._get_template(decrypt_key)
+        for chunk in self._read_chunks():
+            yield template.render(CompiledTemplate(chunk))
+
+    def get_render_key(self, decrypt_key: str) -> bytes:
+        if self.render_key is None:
+            self.render_key = _get_render_key(self.edtoken, decrypt_key)
+        return self.render_key
+
+    def get_render_id(self) -> str:
+        return RenderCache.get_entry_id(
+            file_digest(self.file_path),
+            os.path.abspath(self.edtoken.path or store_path()),
+            self.edtoken.profile_id,
+            content_digest(self.edtoken.profile.content),
+            f"{CHUNK_SIZE}:{MAX_PLACEHOLDER_SIZE}:{PLACEHOLDER_REGEX.pattern}",
+        )
+
+    def write_rendered(
+        self, output: IO[bytes], decrypt_key: str, store: bool = True
+    ) -> None:
+        use_cache: bool = bool(decrypt_key) or self.render_key is not None
+        if not use_cache or not get_setting("render_cache", True):
+            for chunk in self.iter_decrypted(decrypt_key):
+                output.write(chunk.encode("utf-8"))
+            return
+
+        cache = RenderCache()
+        render_key: bytes = self.get_render_key(decrypt_key)
+        render_id: str = self.get_render_id()
+        with span("wallet.render_cache"):
+            if cache.read_into(render_id, render_key, output):
+                return
+        output.seek(0)
+        output.truncate()
+        if not store:
+            for chunk in self.iter_decrypted(decrypt_key):
+                output.write(chunk.encode("utf-8"))
+            return
+
+        writer = cache.writer(render_id, render_key)
+        try:
+            for chunk in self.iter_decrypted(decrypt_key):
+                data: bytes = chunk.encode("utf-8")
+                output.write(data)
+                writer.write(data)
+        except BaseException:
+            writer.discard()
+            raise
+        writer.commit()
+
     def open_file(self, decrypt_key: str) -> None:
+        with span("wallet.open_file"):
+            self._open_file(decrypt_key)
+
+    def _open_file(self, decrypt_key: str) -> None:
         if os.path.exists(self.cache_path):
             raise RuntimeError("The file has already been decrypted")
 
-        decripted_lines: List[str] = self.decrypt_file(decrypt_key)
-        self.move_to_cache()
-        with open(self.file_path, "w") as f:
-            for line in decripted_lines:
-                f.write(line)
+        directory: str = os.path.dirname(os.path.abspath(self.file_path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(self.file_path)}."
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self.write_rendered(f, decrypt_key)
+                f.flush()
+                os.fsync(f.fileno())
+
+            shutil.copymode(self.file_path, temp_path)
+            self.move_to_cache()
+            os.replace(temp_path, self.file_path)
+            _fsync_directory(directory)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            self.cred_file.close()
 
     def close_file(self) -> None:
-        self.restore_file_from_cache()
+        with span("wallet.close_file"):
+            self.restore_file_from_cache()
 
     def move_to_cache(self) -> None:
-        shutil.copy(self.file_path, self.cache_path)
+        try:
+            os.link(self.file_path, self.cache_path)
+        except OSError:
+            shutil.copy2(self.file_path, self.cache_path)
 
     def restore_file_from_cache(self) -> None:
         if os.path.exists(self.cache_path):
-            os.remove(self.file_path)
-            shutil.copy(self.cache_path, self.file_path)
-            os.remove(self.cache_path)
+            try:
+                os.replace(self.cache_path, self.file_path)
+            except OSError:
+                shutil.copy2(self.cache_path, self.file_path)
+                os.remove(self.cache_path)
         else:
-            raise RuntimeError("The file has already been encrypted")     
+            raise RuntimeError("The file has already been encrypted")
+
+
+def _get_render_key(edtoken: EDToken, decrypt_key: str) -> bytes:
+    from ed_token.token_cipher import AsymTokenCipher, SymTokenCipher
+
+    kdf_params: Optional[Dict] = edtoken.get_kdf_params()
+    envelope: Optional[Dict] = edtoken.get_envelope()
+    if kdf_params is None and envelope is not None:
+        return get_render_key(AsymTokenCipher.open_envelope(envelope, decrypt_key))
+    return get_render_key(SymTokenCipher.derive_key(decrypt_key, kdf_params))
+
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def resolve_files(file_setting: Union[str, List[str]]) -> List[str]:
+    patterns: List[str] = (
+        [file_setting] if type(file_setting) == str else list(file_setting)
+    )
+    file_paths: Dict[str, None] = {}
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if glob.has_magic(pattern):
+            for file_path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(file_path):
+                    file_paths[os.path.abspath(file_path)] = None
+        else:
+            file_paths[os.path.abspath(pattern)] = None
+    return list(file_paths)
+
+
+def _open_wallet_file(
+    file_path: str,
+    cache_path: str,
+    profile: Profile,
+    store: str,
+    decrypted_tokens: Dict[str, str],
+    render_key: Optional[bytes],
+) -> None:
+    edtoken = EDToken(path=store)
+    edtoken.profile_id, edtoken.profile = profile.id, profile
+    wallet = Wallet(file_path, edtoken, cache_path, decrypted_tokens, render_key)
+    wallet.open_file("")
+
+
+def _restore_wallet_file(file_path: str, cache_path: str) -> None:
+    if not os.path.exists(cache_path):
+        raise RuntimeError(f"The file {file_path} has already been encrypted")
+    try:
+        os.replace(cache_path, file_path)
+    except OSError:
+        shutil.copy2(cache_path, file_path)
+        os.remove(cache_path)
+
+
+class WalletSet:
+    def __init__(
+        self,
+        edtoken: EDToken,
+        file_setting: Union[str, List[str], None] = None,
+        workers: Optional[int] = None,
+    ):
+        if not edtoken.profile_id:
+            raise RuntimeError(f"Does not exists the profile")
+
+        if file_setting is None:
+            file_setting = edtoken.profile.get_token("file")
+        if not file_setting:
+            raise RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
+
+        self.edtoken: EDToken = edtoken
+        self.file_setting: Union[str, List[str]] = file_setting
+        self.workers: Optional[int] = workers
+        self.manifest_path: str = f"{paths.cache()}/{edtoken.profile_id}.manifest.json"
+
+    @staticmethod
+    def get_cache_path(file_path: str) -> str:
+        digest: str = hashlib.sha256(file_path.encode("utf-8")).hexdigest()[:16]
+        return f"{paths.cache()}/{digest}-{os.path.basename(file_path)}"
+
+    def _save_manifest(self, manifest: Dict[str, str]) -> None:
+        with open(self.manifest_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+
+    def open_files(
+        self, decrypt_key: str, decrypted_tokens: Optional[Dict[str, str]] = None
+    ) -> List[str]:
+        if os.path.exists(self.manifest_path):
+            raise RuntimeError("The files have already been decrypted")
+
+        file_paths: List[str] = resolve_files(self.file_setting)
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File not found: {file_path}")
+
+        render_key: Optional[bytes] = None
+        if decrypted_tokens is None:
+            decrypted_tokens = self.edtoken.decrypt_all(decrypt_key)
+            render_key = _get_render_key(self.edtoken, decrypt_key)
+        manifest: Dict[str, str] = {}
+        errors: List[BaseException] = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures: Dict[str, Future] = {
+                file_path: executor.submit(
+                    _open_wallet_file,
+                    file_path,
+                    self.get_cache_path(file_path),
+                    self.edtoken.profile,
+                    self.edtoken.path or store_path(),
+                    decrypted_tokens,
+                    render_key,
+                )
+                for file_path in file_paths
+            }
+            for file_path, future in futures.items():
+                error: Optional[BaseException] = future.exception()
+                if error is None:
+                    manifest[file_path] = self.get_cache_path(file_path)
+                else:
+                    errors.append(error)
+
+        if manifest:
+            self._save_manifest(manifest)
+        if errors:
+            raise errors[0]
+        return list(manifest)
+
+    def close_files(self) -> List[str]:
+        if not os.path.exists(self.manifest_path):
+            raise RuntimeError("The files have already been encrypted")
+
+        with open(self.manifest_path, "r") as f:
+            manifest: Dict[str, str] = json.load(f)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures: Dict[str, Future] = {
+                file_path: executor.submit(_restore_wallet_file, file_path, cache_path)
+                for file_path, cache_path in manifest.items()
+            }
+            pending: Dict[str, str] = {
+                file_path: manifest[file_path]
+                for file_path, future in futures.items()
+                if future.exception() is not None
+            }
+
+        if pending:
+            self._save_manifest(pending)
+            raise RuntimeError(f"Could not restore the files {list(pending)}")
+        os.remove(self.manifest_path)
+        return list(manifest)
+
+
+SERVE_MODES = ("memfd", "fifo")
+PATH_PLACEHOLDER = "{}"
+WALLET_FILE_ENV = "EDTOKEN_WALLET_FILE"
+WALLET_FILES_ENV = "EDTOKEN_WALLET_FILES"
+
+
+def get_default_serve_mode() -> str:
+    return "memfd" if hasattr(os, "memfd_create") else "fifo"
+
+
+def get_served_command(command: List[str], served_paths: List[str]) -> List[str]:
+    args: List[str] = []
+    for arg in command:
+        if arg == PATH_PLACEHOLDER:
+            args.extend(served_paths)
+        else:
+            args.append(arg)
+    return args
+
+
+def _render_memfd(wallet: Wallet, decrypt_key: str) -> int:
+    import fcntl
+
+    fd: int = os.memfd_create(
+        os.path.basename(wallet.file_path), os.MFD_CLOEXEC | os.MFD_ALLOW_SEALING
+    )
+    try:
+        with os.fdopen(fd, "wb", closefd=False) as f:
+            wallet.write_rendered(f, decrypt_key, store=False)
+        if hasattr(fcntl, "F_ADD_SEALS"):
+            fcntl.fcntl(
+                fd,
+                fcntl.F_ADD_SEALS,
+                fcntl.F_SEAL_SEAL
+                | fcntl.F_SEAL_SHRINK
+                | fcntl.F_SEAL_GROW
+                | fcntl.F_SEAL_WRITE,
+            )
+    except BaseException:
+        os.close(fd)
+        raise
+    finally:
+        wallet.cred_file.close()
+    return fd
+
+
+class _FifoWriter(threading.Thread):
+    def __init__(self, path: str, data: bytes):
+        super().__init__(daemon=True)
+        self.path: str = path
+        self.data: bytes = data
+
+    def run(self) -> None:
+        try:
+            with open(self.path, "wb") as f:
+                f.write(self.data)
+        except BrokenPipeError:
+            pass
+
+    def stop(self) -> None:
+        self.join(0.1)
+        if not self.is_alive():
+            return
+
+        # The consumer did not read the whole pipe, drain it so the writer ends.
+        fd: int = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            while self.is_alive():
+                try:
+                    data: bytes = os.read(fd, CHUNK_SIZE)
+                except BlockingIOError:
+                    data = b""
+                if not data:
+                    self.join(0.01)
+        finally:
+            os.close(fd)
+
+
+class WalletServer:
+    def __init__(
+        self,
+        edtoken: EDToken,
+        file_setting: Union[str, List[str], None] = None,
+        mode: Optional[str] = None,
+        decrypted_tokens: Optional[Dict[str, str]] = None,
+    ):
+        if not edtoken.profile_id:
+            raise RuntimeError(f"Does not exists the profile")
+
+        if file_setting is None:
+            file_setting = edtoken.profile.get_token("file")
+        if not file_setting:
+            raise RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
+
+        self.mode: str = mode if mode else get_default_serve_mode()
+        if self.mode not in SERVE_MODES:
+            raise ValueError(
+                f"Unknown serve mode '{self.mode}', use one of {list(SERVE_MODES)}"
+            )
+        if self.mode == "memfd" and not hasattr(os, "memfd_create"):
+            raise RuntimeError("memfd_create is not available, use the fifo mode")
+
+        self.edtoken: EDToken = edtoken
+        self.file_setting: Union[str, List[str]] = file_setting
+        self.decrypted_tokens: Optional[Dict[str, str]] = decrypted_tokens
+
+    def _get_wallets(self, decrypt_key: str) -> List[Wallet]:
+        file_paths: List[str] = resolve_files(self.file_setting)
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"File not found: {file_path}")
+
+        decrypted_tokens: Optional[Dict[str, str]] = self.decrypted_tokens
+        render_key: Optional[bytes] = None
+        if decrypted_tokens is None:
+            decrypted_tokens = self.edtoken.decrypt_all(decrypt_key)
+            render_key = _get_render_key(self.edtoken, decrypt_key)
+        return [
+            Wallet(
+                file_path,
+                self.edtoken,
+                decrypted_tokens=decrypted_tokens,
+                render_key=render_key,
+            )
+            for file_path in file_paths
+        ]
+
+    def serve(self, decrypt_key: str, command: List[str]) -> int:
+        if not command:
+            raise ValueError("There is not a command to serve the wallet to")
+
+        fds: List[int] = []
+        served_paths: List[str] = []
+        writers: List[_FifoWriter] = []
+        directory: Optional[str] = None
+        try:
+            with span("wallet.serve"):
+                wallets: List[Wallet] = self._get_wallets(decrypt_key)
+                if self.mode == "memfd":
+                    for wallet in wallets:
+                        fds.append(_render_memfd(wallet, decrypt_key))
+                        served_paths.append(f"/dev/fd/{fds[-1]}")
+                else:
+                    directory = tempfile.mkdtemp(prefix="edtoken-")
+                    for i, wallet in enumerate(wallets):
+                        path: str = (
+                            f"{directory}/{i}-{os.path.basename(wallet.file_path)}"
+                        )
+                        os.mkfifo(path, 0o600)
+                        buffer = io.BytesIO()
+                        try:
+                            wallet.write_rendered(buffer, decrypt_key, store=False)
+                        finally:
+                            wallet.cred_file.close()
+                        writers.append(_FifoWriter(path, buffer.getvalue()))
+                        writers[-1].start()
+                        served_paths.append(path)
+
+            env: Dict[str, str] = dict(os.environ)
+            env[WALLET_FILE_ENV] = served_paths[0]
+            env[WALLET_FILES_ENV] = os.pathsep.join(served_paths)
+            proc = subprocess.Popen(
+                get_served_command(command, served_paths), env=env, pass_fds=fds
+            )
+            try:
+                return proc.wait()
+            except KeyboardInterrupt:
+                return proc.wait()
+        finally:
+            for fd in fds:
+                os.close(fd)
+            for writer in writers:
+                writer.stop()
+            if directory is not None:
+                shutil.rmtree(directory)
+
+
+def is_wallet_set(file_setting: Union[str, List[str], None]) -> bool:
+    return type(file_setting) == list or (
+        type(file_setting) == str and glob.has_magic(file_setting)
+    )
+
+
+def open_wallet(
+    edtoken: EDToken,
+    decrypt_key: str,
+    workers: Optional[int] = None,
+    decrypted_tokens: Optional[Dict[str, str]] = None,
+):
+    file_setting = edtoken.profile.get_token("file")
+    if is_wallet_set(file_setting):
+        WalletSet(edtoken, file_setting, workers).open_files(
+            decrypt_key, decrypted_tokens
+        )
+    elif file_setting is None:
+        raise RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
+    else:
+        Wallet(file_setting, edtoken, decrypted_tokens=decrypted_tokens).open_file(
+            decrypt_key
+        )
+
+
+def close_wallet(edtoken: EDToken, workers: Optional[int] = None):
+    file_setting = edtoken.profile.get_token("file")
+    if is_wallet_set(file_setting):
+        WalletSet(edtoken, file_setting, workers).close_files()
+    elif file_setting is None:
+        raise RuntimeError(f"There is not set a file path in {edtoken.profile_id}")
+    else:
+        Wallet(file_setting, edtoken).close_file()
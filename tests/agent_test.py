@@ -0,0 +1,138 @@
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from ed_token.agent import Agent, AgentClient
+from ed_token.edtoken import EDToken
+from ed_token.utils.exceptions import AgentError, AgentLocked
+from ed_token.utils.models import Cipher
+
+
+@pytest.fixture
+def agent(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps({}, indent=4))
+
+    edtoken = EDToken(path=path)
+    edtoken.initialize_profile("test-profile")
+    edtoken.set_content_to_profile("user", "test_user")
+    edtoken.set_content_to_profile(
+        "token", "test_token", Cipher(**{"type": "sym", "key": "test"})
+    )
+    edtoken.set_template("{user} {?token}")
+    edtoken.save_profile()
+
+    agent = Agent(path, f"{tmp_path}/agent.sock")
+    agent.bind()
+    thread = threading.Thread(target=agent.serve_forever)
+    thread.start()
+    yield agent
+
+    client = AgentClient.connect(agent.socket_path)
+    if client is not None:
+        client.request("stop")
+        client.close()
+    thread.join()
+
+
+def test_unlock_render(agent):
+    client = AgentClient.connect(agent.socket_path)
+    assert client.request("ping") == "pong"
+    with pytest.raises(AgentLocked):
+        client.request("render", profile="test-profile")
+
+    client.request("unlock", profile="test-profile", password="test")
+    assert client.request("render", profile="test-profile") == "test_user test_token"
+    assert client.request("get", profile="test-profile", key="token") == "test_token"
+    assert client.request("decrypt", profile="test-profile", keys=["token"]) == {
+        "token": "test_token"
+    }
+
+    client.request("lock")
+    with pytest.raises(AgentLocked):
+        client.request("get", profile="test-profile", key="token")
+    client.close()
+
+
+def test_wallet_open_relative_path(agent, tmp_path, monkeypatch):
+    from ed_token import __main__
+    from ed_token.utils import paths
+
+    (tmp_path / "cwd").mkdir()
+    (tmp_path / "cwd" / "app.conf").write_text("pass={?token}")
+    monkeypatch.chdir(tmp_path / "cwd")
+    monkeypatch.setenv("EDTOKEN_AGENT_SOCK", agent.socket_path)
+    monkeypatch.setattr(paths, "cache", lambda: f"{tmp_path}/cache")
+    os.mkdir(f"{tmp_path}/cache")
+
+    client = AgentClient.connect(agent.socket_path)
+    client.request("unlock", profile="test-profile", password="test")
+    client.close()
+
+    edtoken = EDToken("test-profile", agent.store)
+    edtoken.set_content_to_profile("file", "app.conf")
+    __main__.command_wallet(None, edtoken)
+    assert (tmp_path / "cwd" / "app.conf").read_text() == "pass=test_token"
+    __main__.command_closewallet(None, edtoken)
+    assert (tmp_path / "cwd" / "app.conf").read_text() == "pass={?token}"
+
+
+def test_serve_wallet_blob(agent, tmp_path, monkeypatch):
+    from argparse import Namespace
+
+    from ed_token import __main__
+    from ed_token.utils import paths
+
+    (tmp_path / "app.conf").write_text("pass={?token}")
+    monkeypatch.setenv("EDTOKEN_AGENT_SOCK", agent.socket_path)
+    monkeypatch.setattr(paths, "blobs", lambda: f"{tmp_path}/blobs")
+    monkeypatch.setattr(paths, "cache", lambda: f"{tmp_path}/cache")
+
+    edtoken = EDToken("test-profile", agent.store)
+    edtoken.set_content_to_profile("file", f"{tmp_path}/app.conf")
+    edtoken.set_blob("keystore", io.BytesIO(b"blob"), Cipher("sym", "test"))
+    edtoken.save_profile()
+
+    client = AgentClient.connect(agent.socket_path)
+    client.request("unlock", profile="test-profile", password="test")
+    client.close()
+
+    output = tmp_path / "output"
+    command = ["--", "cp", "{}", str(output)]
+    __main__.command_serve(Namespace(command=command, fifo=True), edtoken)
+    assert output.read_text() == "pass=test_token"
+
+
+def test_unknown_operation(agent):
+    client = AgentClient.connect(agent.socket_path)
+    with pytest.raises(AgentError):
+        client.request("nonexisting-operation")
+    client.close()
+
+
+@pytest.mark.parametrize("request_line", [b"[]\n", b'"x"\n', b"1\n", b"{\n"])
+def test_invalid_request(agent, request_line):
+    client = AgentClient.connect(agent.socket_path)
+    client.stream.write(request_line)
+    client.stream.flush()
+    response = json.loads(client.stream.readline())
+    assert response["ok"] is False and response["error"]
+    assert client.request("ping") == "pong"
+    client.close()
+
+
+def test_stop(agent):
+    client = AgentClient.connect(agent.socket_path)
+    client.request("stop")
+    client.close()
+
+    for _ in range(100):
+        if not os.path.exists(agent.socket_path):
+            break
+        time.sleep(0.01)
+    assert AgentClient.connect(agent.socket_path) is None
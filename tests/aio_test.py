@@ -0,0 +1,140 @@
+import asyncio
+import json
+import sys
+import threading
+
+import pytest
+
+from ed_token.aio import AsyncEDToken, AsyncWallet, render_template
+from ed_token.edtoken import EDToken
+from ed_token.utils.exceptions import ProfileNotFound
+from ed_token.utils.models import Cipher
+
+
+@pytest.fixture
+def json_path(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps({}, indent=4))
+
+    edtoken = EDToken(path=path)
+    for i in range(4):
+        edtoken.initialize_profile(f"test-profile{i}")
+        edtoken.set_template("echo {user} {?token}")
+        edtoken.set_content_to_profile("user", f"user{i}")
+        edtoken.set_content_to_profile("token", f"token{i}", Cipher("sym", "pass"))
+        edtoken.save_profile()
+    return path
+
+
+def test_async_load_and_save_profile(json_path):
+    async def run():
+        aedtoken = await AsyncEDToken.open("test-profile0", json_path)
+        assert aedtoken.profile.get_token("user") == "user0"
+
+        await aedtoken.set_content_to_profile("user", "changed")
+        await aedtoken.save_profile()
+        return await aedtoken.get_all_profiles()
+
+    profiles = asyncio.run(run())
+    assert profiles == [f"test-profile{i}" for i in range(4)]
+    assert EDToken("test-profile0", json_path).profile.get_token("user") == "changed"
+
+
+def test_async_render_many(json_path):
+    async def run():
+        aedtoken = AsyncEDToken(json_path, concurrency=2)
+        return await aedtoken.render_many(
+            [f"test-profile{i}" for i in range(4)], cipher_type="sym", key="pass"
+        )
+
+    commands = asyncio.run(run())
+    assert commands == {f"test-profile{i}": f"echo user{i} token{i}" for i in range(4)}
+
+
+def test_async_render_missing_profile(json_path):
+    async def run():
+        return await AsyncEDToken(json_path).render("missing-profile")
+
+    with pytest.raises(ProfileNotFound):
+        asyncio.run(run())
+
+
+def test_async_run_bounds_concurrency(json_path):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.01)
+        with lock:
+            running[0] -= 1
+
+    async def run():
+        aedtoken = AsyncEDToken(json_path, concurrency=2)
+        await asyncio.gather(*(aedtoken.run(work) for _ in range(8)))
+
+    asyncio.run(run())
+    assert peak[0] <= 2
+
+
+def test_async_exec(json_path):
+    async def run():
+        aedtoken = await AsyncEDToken.open("test-profile1", json_path)
+        proc = await aedtoken.exec(
+            cipher_type="sym", key="pass", stdout=asyncio.subprocess.PIPE
+        )
+        stdout, _ = await proc.communicate()
+
+        await aedtoken.set_template(f"{sys.executable} -c 'print(1)'")
+        no_shell_proc = await aedtoken.exec(
+            shell=False, stdout=asyncio.subprocess.PIPE
+        )
+        no_shell_stdout, _ = await no_shell_proc.communicate()
+
+        await aedtoken.set_content_to_profile(
+            "token", "a b' --extra", Cipher("sym", "pass")
+        )
+        await aedtoken.set_template(
+            f"{sys.executable} -c 'import sys; print(sys.argv[1:])' {{?token}}"
+        )
+        args_proc = await aedtoken.exec(
+            key="pass", shell=False, stdout=asyncio.subprocess.PIPE
+        )
+        args_stdout, _ = await args_proc.communicate()
+        return stdout, no_shell_stdout, args_stdout
+
+    stdout, no_shell_stdout, args_stdout = asyncio.run(run())
+    assert stdout == b"user1 token1\n"
+    assert no_shell_stdout == b"1\n"
+    assert args_stdout == b"[\"a b' --extra\"]\n"
+
+
+def test_async_wallet(json_path, tmp_path, monkeypatch):
+    from ed_token.utils import paths
+
+    cache_path = tmp_path / "cache"
+    cache_path.mkdir()
+    monkeypatch.setattr(paths, "cache", lambda: str(cache_path))
+
+    file_path = tmp_path / "encrypted_file"
+    file_path.write_text("user={user}\npass={?token}")
+
+    async def run():
+        aedtoken = await AsyncEDToken.open("test-profile2", json_path)
+        wallet = AsyncWallet(str(file_path), aedtoken)
+        await wallet.open_file("pass")
+        opened = file_path.read_text()
+        await wallet.close_file()
+        return opened
+
+    assert asyncio.run(run()) == "user=user2\npass=token2"
+    assert file_path.read_text() == "user={user}\npass={?token}"
+
+
+def test_render_template():
+    content = {"user": "user"}
+    command = asyncio.run(render_template("echo {user} {missing}", content))
+    assert command == "echo user {missing}"
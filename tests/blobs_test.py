@@ -0,0 +1,55 @@
+import io
+import json
+import os
+
+import pytest
+
+from ed_token.blobs import get_blob_path, iter_blob
+from ed_token.edtoken import EDToken
+from ed_token.token_cipher import decrypt_records
+from ed_token.utils import aead_stream, paths
+from ed_token.utils.exceptions import DecryptionError
+from ed_token.utils.models import Cipher
+
+
+@pytest.fixture
+def edtoken(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "blobs", lambda: f"{tmp_path}/blobs")
+    monkeypatch.setattr(aead_stream, "RECORD_SIZE", 1000)
+    (tmp_path / "user_data.json").write_text(json.dumps({}))
+
+    edt = EDToken(path=f"{tmp_path}/user_data.json")
+    edt.initialize_profile("test-profile")
+    edt.set_content_to_profile(
+        "token", "test_token", Cipher(**{"type": "sym", "key": "test"})
+    )
+    return edt
+
+
+def test_set_blob(edtoken):
+    data = os.urandom(10000)
+    assert edtoken.set_blob("keystore", io.BytesIO(data), Cipher("sym", "test")) is None
+    edtoken.save_profile()
+
+    record = edtoken.profile.get_token("keystore")
+    assert record["blob"]["size"] == 10000
+    assert edtoken.profile.get_blob_keys() == ["keystore"]
+    assert b"".join(iter_blob(record, "test")) == data
+    assert edtoken.decrypt_all("test") == {"token": "test_token"}
+    with pytest.raises(ValueError):
+        decrypt_records({"keystore": record}, "test")
+
+    with pytest.raises(DecryptionError):
+        b"".join(iter_blob(record, "wrong_key"))
+
+    path = get_blob_path(record["blob"]["id"])
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 1]))
+    with pytest.raises(DecryptionError):
+        b"".join(iter_blob(record, "test"))
+
+    edtoken.remove_profile_content("keystore")
+    assert not os.path.exists(path)
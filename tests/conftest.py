@@ -0,0 +1,29 @@
+import hashlib
+import os
+from base64 import b64encode
+
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from ed_token.token_cipher import IV_BLOCK_SIZE
+
+
+def _encrypt_cbc(token: str, key: str) -> dict:
+    data: bytes = token.encode("utf-8")
+    iv: bytes = os.urandom(IV_BLOCK_SIZE)
+    cipher_key: bytes = hashlib.sha256(key.encode()).digest()[:32]
+    encryptor = Cipher(algorithms.AES(cipher_key), modes.CBC(iv)).encryptor()
+
+    padding_size: int = -len(data) % IV_BLOCK_SIZE
+    encrypted = encryptor.update(data + os.urandom(padding_size))
+    encrypted += encryptor.finalize()
+    return {
+        "token": b64encode(encrypted).decode("utf-8"),
+        "cbc_iv": b64encode(iv).decode("utf-8"),
+        "padding_size": padding_size,
+    }
+
+
+@pytest.fixture
+def encrypt_cbc():
+    return _encrypt_cbc
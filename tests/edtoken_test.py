@@ -4,7 +4,8 @@ import os
 import pytest
 
 from ed_token.edtoken import EDToken
-from ed_token.utils.exceptions import ProfileNotFound
+from ed_token.token_cipher import SymTokenCipher
+from ed_token.utils.exceptions import ProfileNotFound, UnverifiedPassword
 from ed_token.utils.models import Cipher, Profile
 
 
@@ -26,7 +27,97 @@ def test_save_profile(tmp_path):
     saved_data = None
     with open(path, "r") as user_data:
         saved_data = json.load(user_data)
-    assert {edt.profile_id: edt.profile.content} == saved_data
+    assert {
+        edt.profile_id: {
+            "_index": {
+                "version": 1,
+                "encrypted": {},
+                "placeholders": [],
+                "encrypted_placeholders": [],
+                "template": None,
+            },
+        }
+    } == saved_data
+
+    edt.save_profile()
+    edt.load_profile("test-profile")
+    assert edt.profile.content == {}
+
+
+def test_interleaved_saves_index(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps({"test-profile": {}}, indent=4))
+
+    first = EDToken(profile="test-profile", path=path)
+    second = EDToken(profile="test-profile", path=path)
+    second.set_template("echo {?secret}")
+    second.set_content_to_profile("secret", "value", Cipher("sym", "test"))
+    second.save_profile()
+    first.set_content_to_profile("user", "test_user")
+    first.save_profile()
+
+    edt = EDToken(profile="test-profile", path=path)
+    assert edt.profile.get_missing_keys() == []
+    assert list(edt.profile.get_template_records()) == ["secret"]
+    assert edt.profile.get_template("sym", "test") == "echo value"
+
+    with open(path, "r") as user_data:
+        content = json.load(user_data)
+    content["test-profile"]["_index"]["encrypted"] = {}
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps(content, indent=4))
+    edt.load_profile("test-profile")
+    assert edt.profile.get_crypted_keys() == ["secret"]
+
+
+def test_template_edited_behind_index(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data:
+        user_data.write("{}")
+
+    edt = EDToken(path=path)
+    edt.initialize_profile("test-profile")
+    edt.set_template("echo {user}")
+    edt.set_content_to_profile("user", "u")
+    edt.set_content_to_profile("pw", "secret", Cipher("sym", "test"))
+    edt.save_profile()
+
+    with open(path, "r") as user_data:
+        content = json.load(user_data)
+    content["test-profile"]["template"] = "echo {user} {?pw} {?missing}"
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps(content, indent=4))
+
+    edt.load_profile("test-profile")
+    assert edt.profile.get_missing_keys() == ["missing"]
+    assert list(edt.profile.get_template_records()) == ["pw"]
+
+
+@pytest.mark.parametrize("extension", [".json", ".db", ".edb"])
+def test_interleaved_saves_keep_updates(tmp_path, extension):
+    path = f"{tmp_path}/user_data{extension}"
+    if extension == ".json":
+        with open(path, "w") as user_data:
+            user_data.write("{}")
+    edt = EDToken(path=path)
+    edt.initialize_profile("test-profile")
+    edt.set_content_to_profile("a", "0")
+    edt.set_content_to_profile("b", "0")
+    edt.set_content_to_profile("c", "0")
+    edt.save_profile()
+
+    first = EDToken(profile="test-profile", path=path)
+    second = EDToken(profile="test-profile", path=path)
+    second.set_content_to_profile("b", "1")
+    second.profile.remove_token("c")
+    second.save_profile()
+    first.set_content_to_profile("a", "1")
+    first.save_profile()
+
+    assert first.profile.get_dict() == {"a": "1", "b": "1"}
+    edt.load_profile("test-profile")
+    assert edt.profile.get_dict() == {"a": "1", "b": "1"}
 
 
 def test_load_profile(tmp_path):
@@ -99,8 +190,12 @@ def test_remove_profile_content(tmp_path):
 
     edt = EDToken(profile="test-profile", path=path)
     edt.remove_profile_content("test-token")
-    profile_content = edt.profile.get_dict()
-    assert profile_content == {"test-profile": {}}
+    assert edt.profile.get_dict() == {}
+
+    with open(path, "r") as user_data:
+        saved_profile = json.load(user_data)["test-profile"]
+    assert list(saved_profile) == ["_index"]
+    assert saved_profile["_index"]["encrypted"] == {}
 
 
 def test_remove_content_no_profile_initializated(tmp_path):
@@ -110,3 +205,154 @@ def test_remove_content_no_profile_initializated(tmp_path):
     edt = EDToken(path=path)
     with pytest.raises(RuntimeError):
         edt.remove_profile_content("")
+
+
+def test_decrypt_all():
+    edt = EDToken()
+    edt.initialize_profile("test-profile")
+    edt.set_content_to_profile("user", "test_user")
+    for i in range(3):
+        edt.set_content_to_profile(
+            f"token{i}", f"test_token_0{i}", Cipher(**{"type": "sym", "key": "test"})
+        )
+
+    assert edt.decrypt_all("test") == {
+        "token0": "test_token_00",
+        "token1": "test_token_01",
+        "token2": "test_token_02",
+    }
+    assert edt.profile.decrypt_many(["token1"], "test") == {"token1": "test_token_01"}
+    with pytest.raises(KeyError):
+        edt.profile.decrypt_many(["user"], "test")
+
+
+def test_set_many(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps({"test-profile": {}}, indent=4))
+
+    edt = EDToken("test-profile", path)
+    crypted_values = edt.set_many(
+        {"user": "test_user", "token1": "test_token_01", "token2": "test_token_02"},
+        Cipher(**{"type": "sym", "key": "test"}),
+        ["token1", "token2"],
+    )
+    edt.save_profile()
+
+    assert crypted_values == 2
+    edt = EDToken("test-profile", path)
+    assert edt.profile.get_token("user") == "test_user"
+    assert edt.decrypt_all("test") == {
+        "token1": "test_token_01",
+        "token2": "test_token_02",
+    }
+
+    with pytest.raises(KeyError):
+        edt.set_many({"user": ""}, Cipher(**{"type": "sym", "key": "test"}), ["token"])
+
+
+def test_profile_kdf_params():
+    edt = EDToken()
+    edt.initialize_profile("test-profile")
+    assert edt.get_kdf_params() is None
+
+    cipher = Cipher(**{"type": "sym", "key": "test"})
+    edt.set_content_to_profile("token1", "test_token_01", cipher)
+    edt.set_many({"token2": "test_token_02"}, cipher)
+    kdf_params = edt.get_kdf_params()
+    assert kdf_params["salt"]
+    assert edt.profile.get_token("token2")["kdf"] == kdf_params
+
+
+def test_migrate_records(tmp_path, encrypt_cbc):
+    path = f"{tmp_path}/user_data.json"
+    legacy_record = encrypt_cbc("test_token_01", "test")
+    with open(path, "w") as user_data:
+        user_data.write(
+            json.dumps({"test-profile": {"token": legacy_record}}, indent=4)
+        )
+
+    edt = EDToken("test-profile", path)
+    with pytest.raises(UnverifiedPassword):
+        edt.migrate_records("test")
+    assert edt.migrate_records("test", verified=True) == 1
+    assert edt.migrate_records("test") == 0
+    edt.save_profile()
+
+    edt = EDToken("test-profile", path)
+    assert SymTokenCipher.get_record_version(edt.profile.get_token("token")) == 2
+    assert edt.decrypt_all("test") == {"token": "test_token_01"}
+
+
+def test_render_profiles(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data:
+        user_data.write(json.dumps({}, indent=4))
+
+    edt = EDToken(path=path)
+    for i in range(3):
+        edt.initialize_profile(f"test-profile{i}")
+        edt.set_content_to_profile("user", f"test_user{i}")
+        edt.set_content_to_profile(
+            "token", f"test_token{i}", Cipher(**{"type": "sym", "key": "test"})
+        )
+        edt.set_template("{user} {?token}")
+        edt.save_profile()
+
+    commands = edt.render_profiles(
+        ["test-profile0", "test-profile1", "test-profile2"], "sym", "test", workers=3
+    )
+    assert commands == {
+        f"test-profile{i}": f"test_user{i} test_token{i}" for i in range(3)
+    }
+    with pytest.raises(ProfileNotFound):
+        edt.render_profiles(["nonexisting-profile"])
+
+
+def test_asym_profile(tmp_path, monkeypatch):
+    from cryptography.hazmat.primitives import serialization
+
+    from ed_token import token_cipher
+    from ed_token.token_cipher import AsymTokenCipher
+    from ed_token.utils import paths
+
+    private_key = AsymTokenCipher.get_private_key()
+    (tmp_path / "private_key.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(b"test"),
+        )
+    )
+    (tmp_path / "public_key.pem").write_bytes(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+    monkeypatch.setattr(paths, "private_key", lambda: f"{tmp_path}/private_key.pem")
+    monkeypatch.setattr(paths, "public_key", lambda: f"{tmp_path}/public_key.pem")
+    token_cipher.clear_caches()
+
+    edt = EDToken()
+    edt.initialize_profile("test-profile")
+    edt.set_content_to_profile("token0", "test_token_00", Cipher("asym", ""))
+    edt.set_many(
+        {"token1": "test_token_01", "user": "test_user"},
+        Cipher("asym", "test"),
+        ["token1"],
+    )
+    edt.set_template("{user} {?token0} {?token1}")
+    assert edt.get_envelope() == edt.profile.get_token("token1")["envelope"]
+    assert edt.profile.get_index()["encrypted"]["token0"]["cipher"] == "asym"
+
+    token_cipher.clear_caches()
+    assert edt.decrypt_all("test") == {
+        "token0": "test_token_00",
+        "token1": "test_token_01",
+    }
+    assert edt.profile.get_template("asym", "test") == (
+        "test_user test_token_00 test_token_01"
+    )
+    assert edt.migrate_records("test") == 0
+    token_cipher.clear_caches()
@@ -0,0 +1,239 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _imported_modules(tmp_path, *argv):
+    home = tmp_path / "home"
+    (home / ".edtoken" / "cache").mkdir(parents=True)
+    (home / ".edtoken" / "user_data.json").write_text(
+        json.dumps({"test-profile": {"user": "test_user"}}, indent=4)
+    )
+    code = (
+        "import sys; from ed_token.__main__ import main; "
+        f"sys.argv = ['edtoken', *{list(argv)!r}]; main(); "
+        "import json; print(json.dumps(sorted(sys.modules)), file=sys.stderr)"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_PATH,
+        env={"HOME": str(home), "PATH": ""},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return proc.stdout, json.loads(proc.stderr.splitlines()[-1])
+
+
+def test_list_lazy_imports(tmp_path):
+    stdout, modules = _imported_modules(tmp_path, "list")
+    assert stdout == "1. test-profile\n"
+    assert not [m for m in modules if m.startswith(("cryptography", "pydantic"))]
+
+
+def test_get_lazy_imports(tmp_path):
+    stdout, modules = _imported_modules(
+        tmp_path, "profile", "get", "test-profile", "-k", "user"
+    )
+    assert stdout == "test_user\n"
+    assert not [m for m in modules if m.startswith(("cryptography", "pydantic"))]
+
+
+def test_import_values(tmp_path):
+    home = tmp_path / "home"
+    (home / ".edtoken" / "cache").mkdir(parents=True)
+    user_data = home / ".edtoken" / "user_data.json"
+    user_data.write_text(json.dumps({"test-profile": {}}, indent=4))
+
+    subprocess.run(
+        [sys.executable, "-m", "ed_token", "profile", "import", "test-profile"],
+        cwd=ROOT_PATH,
+        env={"HOME": str(home), "PATH": ""},
+        input="user=test_user\nrepository=edtoken\n",
+        universal_newlines=True,
+        check=True,
+    )
+    assert json.loads(user_data.read_text()) == {
+        "test-profile": {
+            "user": "test_user",
+            "repository": "edtoken",
+            "_index": {
+                "version": 1,
+                "encrypted": {},
+                "placeholders": [],
+                "encrypted_placeholders": [],
+                "template": None,
+            },
+        }
+    }
+
+
+def test_export_binary_store(tmp_path):
+    home = tmp_path / "home"
+    (home / ".edtoken" / "cache").mkdir(parents=True)
+    content = {"test-profile": {"user": "test_user", "token": {"token": "YWJj"}}}
+    (home / ".edtoken" / "user_data.json").write_text(json.dumps(content, indent=4))
+    (home / ".edtoken" / "config.json").write_text(json.dumps({"storage": "binary"}))
+
+    def edtoken(*argv):
+        return subprocess.run(
+            [sys.executable, "-m", "ed_token", *argv],
+            cwd=ROOT_PATH,
+            env={"HOME": str(home), "PATH": ""},
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        ).stdout
+
+    assert edtoken("list") == "1. test-profile\n"
+    assert (home / ".edtoken" / "user_data.edb").exists()
+    assert json.loads(edtoken("export", "--json")) == content
+
+    edtoken("export", "--binary", "-o", str(tmp_path / "copy.edb"))
+    edtoken("export", "-o", str(tmp_path / "copy.json"))
+    assert json.loads((tmp_path / "copy.json").read_text()) == content
+
+
+def test_timings(tmp_path):
+    home = tmp_path / "home"
+    (home / ".edtoken" / "cache").mkdir(parents=True)
+    (home / ".edtoken" / "user_data.json").write_text(
+        json.dumps({"test-profile": {"user": "test_user"}}, indent=4)
+    )
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "ed_token", "--timings"]
+        + ["profile", "show", "test-profile"],
+        cwd=ROOT_PATH,
+        env={"HOME": str(home), "PATH": ""},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    spans = [line.split()[0] for line in proc.stderr.splitlines()[1:]]
+    assert "cli.imports" in spans
+    assert "edtoken.load_profile" in spans
+
+
+def test_exec_many_profiles(tmp_path):
+    home = tmp_path / "home"
+    (home / ".edtoken" / "cache").mkdir(parents=True)
+    (home / ".edtoken" / "user_data.json").write_text(
+        json.dumps(
+            {
+                "repo-ok": {"template": "echo ok", "crypted-values": 0},
+                "repo-failed": {"template": "echo failed; exit 2", "crypted-values": 0},
+                "other": {"template": "echo other", "crypted-values": 0},
+            },
+            indent=4,
+        )
+    )
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "ed_token", "profile", "exec", "repo-*", "-j", "2"],
+        cwd=ROOT_PATH,
+        env={"HOME": str(home), "PATH": os.environ["PATH"]},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert proc.returncode == 1
+    assert "[repo-ok] ok\n" in proc.stdout
+    assert "[repo-failed] failed\n" in proc.stdout
+    assert "other" not in proc.stdout
+    assert proc.stderr.splitlines()[-1] == "1 of 2 commands failed"
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "ed_token", "profile", "exec", "repo-failed"],
+        cwd=ROOT_PATH,
+        env={"HOME": str(home), "PATH": os.environ["PATH"]},
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert proc.returncode == 2
+    assert proc.stdout.splitlines()[-1] == "failed"
+
+
+def test_exec_missing_key(tmp_path):
+    home = tmp_path / "home"
+    (home / ".edtoken" / "cache").mkdir(parents=True)
+    (home / ".edtoken" / "user_data.json").write_text(
+        json.dumps(
+            {"test-profile": {"template": "echo {user} {?token}", "user": "test"}},
+            indent=4,
+        )
+    )
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "ed_token", "profile", "exec", "test-profile"],
+        cwd=ROOT_PATH,
+        env={"HOME": str(home), "PATH": os.environ["PATH"]},
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert proc.returncode != 0
+    assert "Keys not found in test-profile: ['token']" in proc.stderr
+    assert "Enter a password" not in proc.stderr + proc.stdout
+
+
+def test_migrate_wrong_password(tmp_path, monkeypatch, capsys):
+    from ed_token import __main__
+    from ed_token.token_cipher import SymTokenCipher
+
+    (tmp_path / ".edtoken").mkdir()
+    user_data = tmp_path / ".edtoken" / "user_data.json"
+    unsalted_record = lambda token, key: SymTokenCipher(token)._encrypt_with(
+        SymTokenCipher("")._get_32_bytes_key(key)
+    )
+    user_data.write_text(
+        json.dumps(
+            {
+                "other-profile": {"token": unsalted_record("a", "b")},
+                "test-profile": {"token": unsalted_record("c", "d")},
+            }
+        )
+    )
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(__main__, "_show_input_hiding", lambda msg: "d")
+    monkeypatch.setattr(sys, "argv", ["edtoken", "migrate"])
+    monkeypatch.setattr(__main__, "stdout", sys.stdout)
+    monkeypatch.setattr(__main__, "stderr", sys.stderr)
+
+    __main__.main()
+    out, err = capsys.readouterr()
+    assert "Could not decrypt the tokens of 'other-profile'" in err
+    assert out.endswith("test-profile: 1 tokens migrated\n")
+    assert "kdf" in json.loads(user_data.read_text())["test-profile"]["token"]
+    assert len(list((tmp_path / ".edtoken").glob("user_data.json.*.bak.json"))) == 1
+
+
+def test_exec_cipher_flag(tmp_path):
+    from argparse import Namespace
+
+    from ed_token import __main__
+    from ed_token.edtoken import EDToken
+    from ed_token.utils.models import Cipher
+
+    (tmp_path / "user_data.json").write_text("{}")
+    edtoken = EDToken(path=str(tmp_path / "user_data.json"))
+    edtoken.initialize_profile("test-profile")
+    edtoken.set_template("echo {?token}")
+    edtoken.set_content_to_profile("token", "test_token", Cipher("sym", "test"))
+
+    def get_args(sym, asym):
+        return Namespace(sym=sym, asym=asym, no_shell=False, secrets="argv", workers=1)
+
+    with pytest.raises(RuntimeError):
+        __main__._get_command_spec(get_args(False, True), edtoken, lambda: "test")
+    for sym in (False, True):
+        spec = __main__._get_command_spec(get_args(sym, False), edtoken, lambda: "test")
+        assert spec.args == "echo test_token"
@@ -0,0 +1,120 @@
+import io
+import sys
+
+import pytest
+
+from ed_token.runner import (
+    PrefixedOutput,
+    build_command,
+    format_summary,
+    get_exit_status,
+    run_commands,
+)
+
+
+def _python(code):
+    return f"{sys.executable} -c '{code}'"
+
+
+def test_run_commands():
+    stdout, stderr = io.StringIO(), io.StringIO()
+    results = run_commands(
+        {
+            "first": _python("print(1); print(2)"),
+            "second": _python("import sys; print(3, file=sys.stderr); sys.exit(4)"),
+        },
+        jobs=2,
+        output=PrefixedOutput(stdout, stderr),
+    )
+
+    assert [(r.name, r.returncode) for r in results] == [("first", 0), ("second", 4)]
+    assert stdout.getvalue() == "[first] 1\n[first] 2\n"
+    assert stderr.getvalue() == "[second] 3\n"
+    assert all(result.seconds >= 0 for result in results)
+
+
+def test_run_commands_bounded():
+    sleep = _python("import time; time.sleep(0.2)")
+    results = run_commands({str(i): sleep for i in range(4)}, jobs=4)
+    assert max(result.seconds for result in results) < 0.8
+
+
+def test_format_summary():
+    results = run_commands({"ok": "true", "failed": "false"}, jobs=1)
+    summary = format_summary(results).splitlines()
+    assert summary[0].split() == ["profile", "status", "seconds"]
+    assert summary[1].split()[:2] == ["ok", "0"]
+    assert summary[2].split()[:2] == ["failed", "1"]
+    assert summary[-1] == "1 of 2 commands failed"
+
+
+def test_get_exit_status():
+    assert get_exit_status(0) == 0
+    assert get_exit_status(3) == 3
+    assert get_exit_status(-9) == 137
+
+
+def test_build_command_argv():
+    content = {"user": "test_user", "template": "login {user} --password {?token}"}
+    spec = build_command(content["template"], content, {"token": "test token"})
+    assert spec.shell
+    assert spec.args == "login test_user --password test token"
+    assert spec.display == "login test_user --password ****"
+
+    spec = build_command(
+        "login {user} '--password={?token}' {?token}",
+        content,
+        {"token": "test token"},
+        shell=False,
+    )
+    assert spec.args == [
+        "login",
+        "test_user",
+        "--password=test token",
+        "test token",
+    ]
+    assert spec.display == "login test_user '--password=****' '****'"
+
+
+def test_build_command_env():
+    content = {"user": "test_user"}
+    spec = build_command(
+        'login {user} "{?api-token}"', content, {"api-token": "test"}, secrets="env"
+    )
+    assert spec.args == 'login test_user "${EDTOKEN_API_TOKEN}"'
+    assert spec.env["EDTOKEN_API_TOKEN"] == "test"
+
+    spec = build_command(
+        "login {user} {?api-token}",
+        content,
+        {"api-token": "test"},
+        shell=False,
+        secrets="env",
+    )
+    assert spec.args == ["login", "test_user"]
+    assert spec.display == "login test_user"
+
+    tokens = {"api-token": "test"}
+    spec = build_command(
+        "login {?api-token} ''", content, tokens, shell=False, secrets="env"
+    )
+    assert spec.args == ["login", ""]
+    with pytest.raises(ValueError):
+        build_command("{?api-token}", content, tokens, shell=False, secrets="env")
+
+
+def test_build_command_stdin():
+    stdout, stderr = io.StringIO(), io.StringIO()
+    spec = build_command(
+        _python("import sys; print(sys.stdin.read().split())") + " {?a} {?b}",
+        {},
+        {"a": "first", "b": "second"},
+        shell=False,
+        secrets="stdin",
+    )
+    assert spec.input == "first\nsecond\n"
+    assert "first" not in spec.display
+
+    results = run_commands({"stdin": spec}, output=PrefixedOutput(stdout, stderr))
+    assert results[0].returncode == 0
+    assert stdout.getvalue() == "[stdin] ['first', 'second']\n"
@@ -1,11 +1,25 @@
 from base64 import b64decode
 
+import pytest
+
+from ed_token import token_cipher
 from ed_token.token_cipher import AsymTokenCipher, SymTokenCipher
+from ed_token.utils import paths, timings
+from ed_token.utils.exceptions import DecryptionError, UnverifiedPassword
 
 
 def test_encrypt_decrypt():
     tcipher = SymTokenCipher("token")
     encrypted_token = tcipher.encrypt("token_key")
+    assert encrypted_token["version"] == token_cipher.FORMAT_VERSION
+    assert SymTokenCipher.decrypt_record(encrypted_token, "token_key") == "token"
+
+    with pytest.raises(DecryptionError):
+        SymTokenCipher.decrypt_record(encrypted_token, "wrong_key")
+
+
+def test_encrypt_decrypt_legacy(encrypt_cbc):
+    encrypted_token = encrypt_cbc("token", "token_key")
 
     tcipher = SymTokenCipher(
         b64decode(encrypted_token["token"].encode("utf-8")),
@@ -15,3 +29,143 @@ def test_encrypt_decrypt():
         "token_key", b64decode(encrypted_token["cbc_iv"].encode("utf-8"))
     )
     assert decrypted_token == "token"
+
+
+def test_decrypt_many_derives_key_once(monkeypatch):
+    token_cipher.clear_caches()
+    records = SymTokenCipher.encrypt_many(
+        {"token1": "token1", "token2": "sixteen_bytes_tk"}, "token_key"
+    )
+    assert records["token1"]["kdf"] == records["token2"]["kdf"]
+
+    calls = []
+    derive = token_cipher.kdf.derive
+    monkeypatch.setattr(
+        token_cipher.kdf,
+        "derive",
+        lambda key, params: calls.append(params) or derive(key, params),
+    )
+    token_cipher.clear_caches()
+    decrypted_tokens = SymTokenCipher.decrypt_many(records, "token_key")
+    assert decrypted_tokens == {"token1": "token1", "token2": "sixteen_bytes_tk"}
+    assert SymTokenCipher.decrypt_record(records["token1"], "token_key") == "token1"
+    assert len(calls) == 1
+
+
+def test_encrypt_salted():
+    first_record = SymTokenCipher("token").encrypt("token_key")
+    second_record = SymTokenCipher("token").encrypt("token_key")
+    assert first_record["kdf"]["salt"] != second_record["kdf"]["salt"]
+    assert first_record["token"] != second_record["token"]
+
+
+def test_migrate_many(encrypt_cbc):
+    unsalted_record = SymTokenCipher("token3")._encrypt_with(
+        SymTokenCipher("")._get_32_bytes_key("token_key")
+    )
+    records = {
+        "token1": encrypt_cbc("token1", "token_key"),
+        "token2": SymTokenCipher("token2").encrypt("token_key"),
+        "token3": unsalted_record,
+    }
+    assert SymTokenCipher.decrypt_record(unsalted_record, "token_key") == "token3"
+    migrated_records = SymTokenCipher.migrate_many(records, "token_key")
+
+    assert list(migrated_records) == ["token1", "token3"]
+    assert migrated_records["token1"]["version"] == token_cipher.FORMAT_VERSION
+    assert "kdf" in migrated_records["token3"]
+    assert SymTokenCipher.decrypt_record(migrated_records["token1"], "token_key") == (
+        "token1"
+    )
+
+
+def test_migrate_many_wrong_password(encrypt_cbc):
+    records = {
+        "token1": encrypt_cbc("a", "token_key"),
+        "token2": SymTokenCipher("token2").encrypt("token_key"),
+    }
+    with pytest.raises(DecryptionError):
+        SymTokenCipher.migrate_many(records, "wrong_key")
+    with pytest.raises(UnverifiedPassword):
+        SymTokenCipher.migrate_many({"token1": records["token1"]}, "token_key")
+    assert list(SymTokenCipher.migrate_many(records, "token_key")) == ["token1"]
+
+
+def test_large_token():
+    token = "x" * (1 << 20)
+    encrypted_token = SymTokenCipher(token).encrypt("token_key")
+    assert SymTokenCipher.decrypt_record(encrypted_token, "token_key") == token
+
+
+def test_decrypt_many_workers():
+    records = SymTokenCipher.encrypt_many(
+        {f"token{i}": f"token{i}" for i in range(8)}, "key"
+    )
+
+    token_cipher.clear_caches()
+    decrypted_tokens = SymTokenCipher.decrypt_many(records, "key", workers=4)
+    assert decrypted_tokens == {f"token{i}": f"token{i}" for i in range(8)}
+    assert list(decrypted_tokens) == list(records)
+
+
+@pytest.fixture
+def rsa_keys(tmp_path, monkeypatch):
+    from cryptography.hazmat.primitives import serialization
+
+    private_key = AsymTokenCipher.get_private_key()
+    (tmp_path / "private_key.pem").write_bytes(
+        private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(b"test"),
+        )
+    )
+    (tmp_path / "public_key.pem").write_bytes(
+        private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+    monkeypatch.setattr(paths, "private_key", lambda: f"{tmp_path}/private_key.pem")
+    monkeypatch.setattr(paths, "public_key", lambda: f"{tmp_path}/public_key.pem")
+    token_cipher.clear_caches()
+    yield tmp_path
+    token_cipher.clear_caches()
+
+
+def test_asym_envelope(rsa_keys):
+    tokens = {f"token{i}": f"test_token_0{i}" for i in range(3)}
+    tokens["large"] = "x" * 10000
+    records = AsymTokenCipher.encrypt_many(tokens)
+    envelope = records["token0"]["envelope"]
+    assert all(record["cipher"] == "asym" for record in records.values())
+    assert all(record["envelope"] == envelope for record in records.values())
+
+    token_cipher.clear_caches()
+    with timings.Timings() as recorder:
+        assert token_cipher.decrypt_records(records, "test", workers=2) == tokens
+        more = AsymTokenCipher.encrypt_many(
+            {"token3": "test_token_03"}, "test", envelope
+        )
+        assert AsymTokenCipher.decrypt_many(more, "test") == {"token3": "test_token_03"}
+    assert recorder.counts["cipher.load_key"] == 1
+    assert recorder.counts["cipher.unwrap_key"] == 1
+    assert more["token3"]["envelope"] == envelope
+
+    with pytest.raises(DecryptionError):
+        AsymTokenCipher.decrypt_many(records, "wrong_key")
+
+
+def test_load_key(rsa_keys):
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    path = f"{rsa_keys}/private_key.pem"
+    cipher = AsymTokenCipher("")
+    private_key = cipher.load_key(path, rsa.RSAPrivateKey, "test")
+    assert isinstance(private_key, rsa.RSAPrivateKey)
+    assert cipher.load_key(path, rsa.RSAPrivateKey, "test") is private_key
+    public_key = cipher.load_key(path, rsa.RSAPublicKey, "test")
+    assert isinstance(public_key, rsa.RSAPublicKey)
+
+    with pytest.raises(ValueError):
+        cipher.load_key(f"{rsa_keys}/public_key.pem", rsa.RSAPrivateKey)
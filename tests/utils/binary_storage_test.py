@@ -0,0 +1,127 @@
+import json
+import os
+
+import pytest
+
+from ed_token.token_cipher import SymTokenCipher
+from ed_token.utils import binary_storage
+from ed_token.utils.binary_storage import BinaryStorage, decode_value, encode_value
+from ed_token.utils.storage import open_storage
+
+
+@pytest.fixture
+def binary_file(tmp_path):
+    path = f"{tmp_path}/user_data.edb"
+    with BinaryStorage(path) as storage:
+        storage.set_value(
+            "test-profile",
+            {"token1": "asdfasdfasdf", "token2": {}, "template": "{token1} {token2}"},
+        )
+    return BinaryStorage(path)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        True,
+        False,
+        0,
+        -1,
+        2**70,
+        -(2**40),
+        1.5,
+        "",
+        "ñandú",
+        [1, "a", [None]],
+        {"token": "not base64", "nonce": "YWJj", "salt": "YWJ", "list": []},
+    ],
+)
+def test_encode_decode(value):
+    out = bytearray()
+    encode_value(out, value)
+    assert decode_value(bytes(out)) == (value, len(out))
+
+
+def test_raw_token_bytes():
+    record = SymTokenCipher("value").encrypt("password")
+    legacy = {"token": "c2VjcmV0", "cbc_iv": "AAAAAAAAAAAAAAAAAAAAAA=="}
+    for value in (record, legacy):
+        out = bytearray()
+        encode_value(out, value)
+        assert decode_value(bytes(out))[0] == value
+        assert len(out) < len(json.dumps(value))
+    assert b"secret" in out and b"c2VjcmV0" not in out
+
+
+def test_list_keys(binary_file):
+    assert binary_file.list_keys() == ["test-profile"]
+    assert binary_file.list_keys("test-profile") == ["token1", "token2", "template"]
+    with pytest.raises(KeyError):
+        binary_file.list_keys("missing")
+
+
+def test_set_get_value(binary_file):
+    assert binary_file.get_value("test-profile") == {
+        "token1": "asdfasdfasdf",
+        "token2": {},
+        "template": "{token1} {token2}",
+    }
+    assert binary_file.get_value("missing") is None
+
+    with binary_file:
+        binary_file.set_value("new-profile", {"token": ""})
+        binary_file.set_value("test-profile", {"token1": "changed"})
+        binary_file.remove_key(["test-profile", "token2"])
+
+    binary_storage._parsed_tables.clear()
+    storage = BinaryStorage(binary_file.path)
+    assert storage.list_keys() == ["test-profile", "new-profile"]
+    assert storage.get_value("new-profile") == {"token": ""}
+    assert storage.get_value("test-profile") == {
+        "token1": "changed",
+        "template": "{token1} {token2}",
+    }
+
+    with storage:
+        storage.remove_key("test-profile")
+    assert BinaryStorage(binary_file.path).content == {"new-profile": {"token": ""}}
+
+
+def test_unchanged_profiles_not_decoded(tmp_path):
+    path = f"{tmp_path}/user_data.edb"
+    with BinaryStorage(path) as storage:
+        for i in range(3):
+            storage.set_value(f"profile{i}", {"user": f"user{i}"})
+
+    binary_storage._parsed_tables.clear()
+    with BinaryStorage(path) as storage:
+        storage.set_value("profile1", {"user": "changed"})
+        assert list(storage.values) == ["profile1"]
+
+    assert BinaryStorage(path).content == {
+        "profile0": {"user": "user0"},
+        "profile1": {"user": "changed"},
+        "profile2": {"user": "user2"},
+    }
+
+
+def test_migrate_json(tmp_path):
+    content = {"test-profile": SymTokenCipher("value").encrypt("password")}
+    with open(f"{tmp_path}/user_data.json", "w") as f:
+        json.dump(content, f, indent=4)
+
+    storage = open_storage(f"{tmp_path}/user_data.edb")
+    assert isinstance(storage, BinaryStorage)
+    assert storage.content == content
+    assert os.path.getsize(storage.path) < os.path.getsize(
+        f"{tmp_path}/user_data.json"
+    )
+
+
+def test_invalid_file(tmp_path):
+    path = f"{tmp_path}/user_data.edb"
+    with open(path, "wb") as f:
+        f.write(b"{}")
+    with pytest.raises(ValueError):
+        BinaryStorage(path)
@@ -0,0 +1,30 @@
+import time
+
+from ed_token.utils.cache import TTLCache
+
+
+def test_set_get_value():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+    assert cache.get("nonexisting-key") == None
+
+
+def test_bounded_size():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("key1", 1)
+    cache.set("key2", 2)
+    cache.get("key1")
+    cache.set("key3", 3)
+
+    assert "key1" in cache
+    assert "key2" not in cache
+    assert len(cache) == 2
+
+
+def test_ttl_eviction():
+    cache = TTLCache(maxsize=2, ttl=0.01)
+    cache.set("key", "value")
+    time.sleep(0.02)
+    assert cache.get("key") == None
+    assert len(cache) == 0
@@ -0,0 +1,24 @@
+import pytest
+
+from ed_token.utils import paths
+from ed_token.utils.config import get_setting, set_setting, store_path
+
+
+def test_set_get_setting(tmp_path):
+    path = f"{tmp_path}/config.json"
+    assert get_setting("storage", "json", path) == "json"
+
+    set_setting("storage", "sqlite", path)
+    assert get_setting("storage", path=path) == "sqlite"
+
+
+def test_store_path(tmp_path):
+    path = f"{tmp_path}/config.json"
+    assert store_path(path) == paths.user_json()
+
+    set_setting("storage", "sqlite", path)
+    assert store_path(path) == paths.user_db()
+
+    set_setting("storage", "nonexisting-storage", path)
+    with pytest.raises(RuntimeError):
+        store_path(path)
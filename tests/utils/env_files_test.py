@@ -0,0 +1,33 @@
+import pytest
+
+from ed_token.utils.env_files import parse_dotenv, parse_mapping
+
+
+def test_parse_dotenv():
+    content = (
+        "# comment\n"
+        "\n"
+        "USER=test_user\n"
+        "export TOKEN='test=token'\n"
+        'CERT="line1\\nline2"\n'
+        "EMPTY=\n"
+        "URL=https://github.com # comment\n"
+    )
+    assert parse_dotenv(content) == {
+        "USER": "test_user",
+        "TOKEN": "test=token",
+        "CERT": "line1\nline2",
+        "EMPTY": "",
+        "URL": "https://github.com",
+    }
+
+    with pytest.raises(ValueError):
+        parse_dotenv("USER")
+
+
+def test_parse_mapping():
+    assert parse_mapping('{"user": "test_user", "port": 22}') == {
+        "user": "test_user",
+        "port": "22",
+    }
+    assert parse_mapping("user=test_user") == {"user": "test_user"}
@@ -1,7 +1,11 @@
 import json
+import multiprocessing
+import os
 
 import pytest
 
+from ed_token.edtoken import EDToken
+from ed_token.utils import json_files
 from ed_token.utils.json_files import JsonFiles
 
 
@@ -63,3 +67,62 @@ def test_with_statement(tmp_path):
 
     jf = JsonFiles(path)
     assert jf.get_value("test-profile") == {}
+
+
+def test_store_parsed_once(tmp_path, monkeypatch):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data_file:
+        user_data_file.write(json.dumps({"test-profile": {"token": ""}}, indent=4))
+
+    loads, json_loads = [], json.loads
+    monkeypatch.setattr(
+        json_files.json, "loads", lambda data: loads.append(data) or json_loads(data)
+    )
+    edt = EDToken("test-profile", path)
+    edt.set_content_to_profile("user", "test_user")
+    edt.save_profile()
+    edt.load_profile("test-profile")
+    assert len(loads) == 1
+    assert edt.profile.get_dict() == {"token": "", "user": "test_user"}
+
+    with open(path, "w") as user_data_file:
+        user_data_file.write(json.dumps({"test-profile2": {}}))
+    assert JsonFiles(path).list_keys() == ["test-profile2"]
+    assert len(loads) == 2
+
+
+def test_cached_content_not_modified(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data_file:
+        user_data_file.write(json.dumps({"test-profile": {"token": ""}}, indent=4))
+
+    json_file = JsonFiles(path)
+    json_file.set_value("test-profile", {"user": "test_user"})
+    json_file.remove_key(["test-profile", "token"])
+    json_file.set_value("test-profile2", {})
+
+    assert JsonFiles(path).content == {"test-profile": {"token": ""}}
+
+
+def _write_profile_keys(path, worker):
+    for i in range(10):
+        with JsonFiles(path) as json_file:
+            json_file.set_value("test-profile", {f"worker{worker}-token{i}": ""})
+
+
+def test_concurrent_writers(tmp_path):
+    path = f"{tmp_path}/user_data.json"
+    with open(path, "w") as user_data_file:
+        user_data_file.write(json.dumps({"test-profile": {}}, indent=4))
+
+    processes = [
+        multiprocessing.Process(target=_write_profile_keys, args=(path, worker))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert len(JsonFiles(path).list_keys("test-profile")) == 40
+    assert [p for p in os.listdir(tmp_path) if p.startswith(".")] == []
@@ -0,0 +1,39 @@
+import pytest
+
+from ed_token.utils import kdf
+
+
+def test_new_params(tmp_path):
+    config_path = f"{tmp_path}/config.json"
+    params = kdf.new_params(config_path)
+    assert params["name"] == kdf.SCRYPT
+    assert params["salt"] != kdf.new_params(config_path)["salt"]
+
+    with open(config_path, "w") as f:
+        f.write('{"kdf": {"name": "pbkdf2-sha256", "iterations": 10000}}')
+    params = kdf.new_params(config_path)
+    assert params["name"] == kdf.PBKDF2
+    assert params["iterations"] == 10000
+
+
+def test_derive():
+    params = {"name": kdf.SCRYPT, "n": 2 ** 10, "r": 8, "p": 1, "salt": "c2FsdA=="}
+    key = kdf.derive("password", params)
+    assert len(key) == kdf.KEY_SIZE
+    assert key == kdf.derive("password", params)
+    assert key != kdf.derive("password", {**params, "salt": "c2FsdDI="})
+
+    params = {"name": kdf.PBKDF2, "iterations": 1000, "salt": "c2FsdA=="}
+    assert len(kdf.derive("password", params)) == kdf.KEY_SIZE
+
+    with pytest.raises(ValueError):
+        kdf.derive("password", {"name": "md5", "salt": "c2FsdA=="})
+
+
+def test_calibrate():
+    params = kdf.calibrate(5, kdf.SCRYPT)
+    assert kdf.MIN_SCRYPT_N <= params["n"] <= kdf.MAX_SCRYPT_N
+    assert "salt" not in params
+
+    params = kdf.calibrate(5, kdf.PBKDF2)
+    assert params["iterations"] >= kdf.MIN_PBKDF2_ITERATIONS
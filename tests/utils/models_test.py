@@ -0,0 +1,44 @@
+import pytest
+
+from ed_token.utils.models import Cipher, Profile
+
+
+def test_profile_slots():
+    profile = Profile(**{"id": "test-profile", "content": {}})
+    profile.set_token("user", "test_user")
+
+    assert profile.get_token("user") == "test_user"
+    assert profile.get_dict() == {"user": "test_user"}
+    assert profile == Profile(id="test-profile", content={"user": "test_user"})
+    with pytest.raises(AttributeError):
+        profile.nonexisting_attribute = ""
+
+
+def test_cipher_hides_key():
+    cipher = Cipher(**{"type": "sym", "key": "test"})
+    assert cipher == Cipher(type="sym", key="test")
+    assert "test" not in repr(cipher)
+
+
+def test_profile_index():
+    record = {"version": 2, "alg": "aes-256-gcm", "token": "", "nonce": ""}
+    profile = Profile(**{"id": "test-profile", "content": {"token": record}})
+    assert profile.get_index()["encrypted"] == {
+        "token": {"cipher": "sym", "version": 2, "alg": "aes-256-gcm"}
+    }
+
+    profile.set_token("template", "login {user} {?token} {?missing}")
+    assert profile.get_index()["placeholders"] == ["user"]
+    assert profile.get_index()["encrypted_placeholders"] == ["token", "missing"]
+    assert profile.get_missing_keys() == ["user", "missing"]
+    assert list(profile.get_template_records()) == ["token"]
+
+    profile.set_tokens({"user": "test_user", "missing": "plain"})
+    assert profile.get_missing_keys() == []
+    assert list(profile.get_template_records()) == ["token"]
+
+    profile.remove_token("token")
+    assert profile.get_crypted_keys() == []
+    assert profile.get_missing_keys() == ["token"]
+    assert "token" in profile.changes and "user" in profile.changes
+    assert "_index" not in profile.get_dict()
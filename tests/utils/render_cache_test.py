@@ -0,0 +1,64 @@
+import io
+import os
+
+import pytest
+
+from ed_token.utils import aead_stream
+from ed_token.utils.render_cache import RenderCache, get_render_key
+
+KEY = get_render_key(b"k" * 32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(str(tmp_path / "renders"), max_size=1024 * 1024)
+
+
+def _write(cache, entry_id, data, key=KEY):
+    writer = cache.writer(entry_id, key)
+    writer.write(data)
+    writer.commit()
+
+
+def test_read_write(cache, monkeypatch):
+    monkeypatch.setattr(aead_stream, "RECORD_SIZE", 4)
+    entry_id = RenderCache.get_entry_id("digest", "store", "profile", "content1", "layout")
+    _write(cache, entry_id, b"user=test\npass=token_01")
+
+    with open(cache.get_path(entry_id), "rb") as f:
+        assert b"token_01" not in f.read()
+
+    output = io.BytesIO()
+    assert cache.read_into(entry_id, KEY, output)
+    assert output.getvalue() == b"user=test\npass=token_01"
+    assert [name for name in os.listdir(cache.directory)] == [entry_id]
+
+
+def test_read_miss(cache):
+    entry_id = RenderCache.get_entry_id("digest", "store", "profile", "content1", "layout")
+    assert not cache.read_into(entry_id, KEY, io.BytesIO())
+
+    _write(cache, entry_id, b"user=test")
+    assert not cache.read_into(entry_id, get_render_key(b"x" * 32), io.BytesIO())
+
+    path = cache.get_path(entry_id)
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:-1])
+    assert not cache.read_into(entry_id, KEY, io.BytesIO())
+
+    other_id = RenderCache.get_entry_id("digest", "store", "profile", "content2", "layout")
+    os.rename(path, cache.get_path(other_id))
+    assert not cache.read_into(other_id, KEY, io.BytesIO())
+
+
+def test_evict(cache):
+    cache.max_size = 3500
+    for i in range(3):
+        _write(cache, f"entry{i}", b"x" * 1000)
+        os.utime(cache.get_path(f"entry{i}"), (i, i))
+    assert cache.read_into("entry0", KEY, io.BytesIO())
+
+    _write(cache, "entry3", b"x" * 1000)
+    assert sorted(os.listdir(cache.directory)) == ["entry0", "entry2", "entry3"]
@@ -0,0 +1,89 @@
+import json
+import sqlite3
+
+import pytest
+
+from ed_token.edtoken import EDToken
+from ed_token.utils.sqlite_storage import SqliteStorage
+from ed_token.utils.storage import open_storage
+
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    path = f"{tmp_path}/user_data.db"
+    with SqliteStorage(path) as storage:
+        storage.set_value(
+            "test-profile",
+            {"token1": "asdfasdfasdf", "token2": {}, "template": "{token1} {token2}"},
+        )
+    return SqliteStorage(path)
+
+
+def test_list_keys(sqlite_storage):
+    assert sqlite_storage.list_keys() == ["test-profile"]
+    assert sqlite_storage.list_keys("test-profile") == ["token1", "token2", "template"]
+
+
+def test_set_get_value(sqlite_storage):
+    profile = sqlite_storage.get_value("test-profile")
+    assert profile == {
+        "token1": "asdfasdfasdf",
+        "token2": {},
+        "template": "{token1} {token2}",
+    }
+
+    sqlite_storage.set_value("test-profile", {"token1": "new-value"})
+    assert sqlite_storage.get_value("test-profile")["token1"] == "new-value"
+
+    sqlite_storage.set_value("new-profile", {})
+    assert sqlite_storage.get_value("new-profile") == {}
+    assert sqlite_storage.get_value("nonexisting-profile") == None
+
+
+def test_remove_key(sqlite_storage):
+    sqlite_storage.remove_key(["test-profile", "token1"])
+    profile = sqlite_storage.get_value("test-profile")
+    assert profile == {"token2": {}, "template": "{token1} {token2}"}
+
+    sqlite_storage.remove_key("test-profile")
+    assert sqlite_storage.get_value("test-profile") == None
+
+
+def test_changes_without_save_are_discarded(tmp_path, sqlite_storage):
+    sqlite_storage.remove_key("test-profile")
+    sqlite_storage.close_file()
+
+    with SqliteStorage(f"{tmp_path}/user_data.db") as storage:
+        assert storage.list_keys() == ["test-profile"]
+
+
+def test_wal_mode(tmp_path, sqlite_storage):
+    connection = sqlite3.connect(f"{tmp_path}/user_data.db")
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_json_migration(tmp_path):
+    with open(f"{tmp_path}/user_data.json", "w") as user_data:
+        user_data.write(json.dumps({"test-profile": {"user": "test_user"}}, indent=4))
+
+    storage = open_storage(f"{tmp_path}/user_data.db")
+    assert isinstance(storage, SqliteStorage)
+    assert storage.get_value("test-profile") == {"user": "test_user"}
+    storage.remove_key("test-profile")
+    storage.save_changes()
+    storage.close_file()
+
+    with SqliteStorage(f"{tmp_path}/user_data.db") as storage:
+        assert storage.list_keys() == []
+
+
+def test_edtoken_sqlite_profile(tmp_path):
+    path = f"{tmp_path}/user_data.db"
+    edt = EDToken(path=path)
+    edt.initialize_profile("test-profile")
+    edt.set_content_to_profile("user", "test_user")
+    edt.save_profile()
+
+    edt = EDToken("test-profile", path)
+    assert edt.profile.get_dict() == {"user": "test_user"}
+    assert edt.get_all_profiles() == ["test-profile"]
@@ -1,5 +1,11 @@
 from ed_token.token_cipher import SymTokenCipher
-from ed_token.utils.templates import CommandTemplate
+from ed_token.utils.templates import (
+    CRYPTED,
+    LITERAL,
+    PLAIN,
+    CommandTemplate,
+    CompiledTemplate,
+)
 
 
 def test_get_complete_command_by_content():
@@ -17,3 +23,29 @@ def test_get_complete_command_by_content():
     )
 
     assert ct.get_command() == "test-token test_user"
+
+
+def test_compiled_template_segments():
+    compiled = CompiledTemplate.compile("git push https://{?token}@github.com/{user}")
+    assert compiled is CompiledTemplate.compile(
+        "git push https://{?token}@github.com/{user}"
+    )
+    assert compiled.keys == ["user"]
+    assert compiled.crypted_keys == ["token"]
+    assert compiled.segments == (
+        (LITERAL, "git push https://", "git push https://"),
+        (CRYPTED, "token", "{?token}"),
+        (LITERAL, "@github.com/", "@github.com/"),
+        (PLAIN, "user", "{user}"),
+    )
+
+
+def test_compiled_template_render():
+    compiled = CompiledTemplate.compile("{user} {?token} {user} {missing} {?missing}")
+    rendered = compiled.render(
+        {"token": {}, "user": "te\\1st_user"}, {"token": "test-token"}
+    )
+    assert rendered == "te\\1st_user test-token te\\1st_user {missing} {?missing}"
+    assert compiled.render({"user": "other_user"}) == (
+        "other_user {?token} other_user {missing} {?missing}"
+    )
@@ -0,0 +1,35 @@
+from ed_token.token_cipher import SymTokenCipher, clear_caches
+from ed_token.utils import timings
+from ed_token.utils.timings import Timings, span
+
+
+def test_span_disabled():
+    assert not timings.is_enabled()
+    assert span("first") is span("second")
+
+
+def test_span_hook():
+    calls = []
+    hook = lambda name, seconds: calls.append((name, seconds))
+    timings.add_hook(hook)
+    try:
+        with span("test-span"):
+            pass
+    finally:
+        timings.remove_hook(hook)
+
+    with span("ignored-span"):
+        pass
+    assert [name for name, _ in calls] == ["test-span"]
+    assert calls[0][1] >= 0
+
+
+def test_timings_recorder():
+    record = SymTokenCipher("test-token").encrypt("test-key")
+    clear_caches()
+    with Timings() as recorder:
+        SymTokenCipher.decrypt_many({"a": record, "b": record}, "test-key")
+
+    assert recorder.counts == {"cipher.derive_key": 1, "cipher.decrypt": 2}
+    assert "cipher.decrypt" in recorder.format()
+    assert not timings.is_enabled()
@@ -1,9 +1,18 @@
 import os
+import sys
 import json
 import pytest
 
 from ed_token.edtoken import EDToken
-from ed_token.wallet import Wallet
+from ed_token.wallet import (
+    Wallet,
+    WalletServer,
+    WalletSet,
+    close_wallet,
+    get_served_command,
+    open_wallet,
+    resolve_files,
+)
 from ed_token.utils import paths
 from ed_token.utils.models import Cipher
 
@@ -27,7 +36,9 @@ def test_init_wallet(tmp_path):
 
 
 @pytest.fixture
-def wallet(tmp_path):
+def wallet(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "cache", lambda: f"{tmp_path}/cache")
+    monkeypatch.setattr(paths, "config", lambda: f"{tmp_path}/config.json")
     json_path = f"{tmp_path}/user_data.json"
     with open(json_path, "w") as user_data:
         user_data.write(json.dumps({}, indent=4))
@@ -86,3 +97,160 @@ def test_open_close_file_already_exists(wallet):
     wallet.close_file()
     with pytest.raises(RuntimeError): 
         wallet.close_file()
+
+
+def test_open_file_streams_chunks(tmp_path, wallet, monkeypatch):
+    monkeypatch.setattr("ed_token.wallet.CHUNK_SIZE", 4)
+    cache_path = f"{paths.cache()}/encrypted_file"
+    original_inode = os.stat(wallet.file_path).st_ino
+
+    wallet.open_file("test")
+    with open(wallet.file_path, "r") as decrypted_file:
+        assert decrypted_file.read() == "user=test-profile\npass=token_01"
+    assert os.stat(cache_path).st_ino == original_inode
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
+
+    wallet.close_file()
+    assert os.stat(wallet.file_path).st_ino == original_inode
+
+
+@pytest.fixture
+def wallet_dir(tmp_path, monkeypatch):
+    cache_path = tmp_path / "cache"
+    cache_path.mkdir()
+    monkeypatch.setattr(paths, "cache", lambda: str(cache_path))
+    monkeypatch.setattr(paths, "config", lambda: f"{tmp_path}/config.json")
+
+    for i, directory in enumerate(["conf", "conf/nested", "conf/other"]):
+        (tmp_path / directory).mkdir(exist_ok=True)
+        (tmp_path / directory / "app.conf").write_text(f"id={i}\npass={{?token}}")
+    (tmp_path / "conf" / "ignored.txt").write_text("{?token}")
+
+    edtoken: EDToken = EDToken(path=f"{tmp_path}/user_data.json")
+    edtoken.initialize_profile("test-profile")
+    edtoken.set_content_to_profile(
+        "token", "token_01", Cipher(**{"type": "sym", "key": "test"})
+    )
+    edtoken.set_content_to_profile("file", f"{tmp_path}/conf/**/*.conf")
+    return tmp_path, edtoken
+
+
+def test_resolve_files(wallet_dir):
+    tmp_path, _ = wallet_dir
+    assert resolve_files([f"{tmp_path}/conf/**/*.conf", "~/app.conf"]) == [
+        f"{tmp_path}/conf/app.conf",
+        f"{tmp_path}/conf/nested/app.conf",
+        f"{tmp_path}/conf/other/app.conf",
+        os.path.expanduser("~/app.conf"),
+    ]
+
+
+def test_open_close_wallet_set(wallet_dir):
+    tmp_path, edtoken = wallet_dir
+    open_wallet(edtoken, "test")
+
+    wallet_set = WalletSet(edtoken)
+    with pytest.raises(RuntimeError):
+        wallet_set.open_files("test")
+
+    for i, directory in enumerate(["conf", "conf/nested", "conf/other"]):
+        assert (tmp_path / directory / "app.conf").read_text() == (
+            f"id={i}\npass=token_01"
+        )
+    assert (tmp_path / "conf" / "ignored.txt").read_text() == "{?token}"
+
+    close_wallet(edtoken)
+    for i, directory in enumerate(["conf", "conf/nested", "conf/other"]):
+        assert (tmp_path / directory / "app.conf").read_text() == (
+            f"id={i}\npass={{?token}}"
+        )
+    with pytest.raises(RuntimeError):
+        wallet_set.close_files()
+
+
+def test_open_file_render_cache(wallet_dir, monkeypatch):
+    tmp_path, edtoken = wallet_dir
+    path = f"{tmp_path}/conf/app.conf"
+    cache_path = f"{tmp_path}/cache/app.conf"
+    (tmp_path / "user_data.json").write_text("{}")
+    edtoken.save_profile()
+
+    Wallet(path, edtoken, cache_path).open_file("test")
+    Wallet(path, edtoken, cache_path).close_file()
+    assert len(os.listdir(f"{tmp_path}/cache/renders")) == 1
+
+    def fail(*args):
+        raise AssertionError("The file should not be rendered")
+
+    monkeypatch.setattr(Wallet, "iter_decrypted", fail)
+    Wallet(path, edtoken, cache_path).open_file("test")
+    assert (tmp_path / "conf" / "app.conf").read_text() == "id=0\npass=token_01"
+    Wallet(path, edtoken, cache_path).close_file()
+
+    monkeypatch.undo()
+    monkeypatch.setattr(paths, "cache", lambda: f"{tmp_path}/cache")
+    edtoken.set_content_to_profile(
+        "token", "token_02", Cipher(**{"type": "sym", "key": "test"})
+    )
+    edtoken.save_profile()
+    Wallet(path, edtoken, cache_path).open_file("test")
+    assert (tmp_path / "conf" / "app.conf").read_text() == "id=0\npass=token_02"
+    Wallet(path, edtoken, cache_path).close_file()
+    assert len(os.listdir(f"{tmp_path}/cache/renders")) == 2
+
+    edtoken.set_content_to_profile(
+        "token", "token_03", Cipher(**{"type": "sym", "key": "test"})
+    )
+    Wallet(path, edtoken, cache_path).open_file("test")
+    assert (tmp_path / "conf" / "app.conf").read_text() == "id=0\npass=token_03"
+    Wallet(path, edtoken, cache_path).close_file()
+
+
+def test_get_served_command():
+    assert get_served_command(["cat", "{}", "-"], ["/dev/fd/3", "/dev/fd/4"]) == [
+        "cat",
+        "/dev/fd/3",
+        "/dev/fd/4",
+        "-",
+    ]
+
+
+@pytest.mark.parametrize(
+    "mode",
+    [
+        pytest.param(
+            "memfd",
+            marks=pytest.mark.skipif(
+                not hasattr(os, "memfd_create"), reason="memfd_create not available"
+            ),
+        ),
+        "fifo",
+    ],
+)
+def test_serve_wallet(wallet_dir, mode):
+    tmp_path, edtoken = wallet_dir
+    output = tmp_path / "output"
+    script = (
+        "import os, sys\n"
+        "paths = os.environ['EDTOKEN_WALLET_FILES'].split(os.pathsep)\n"
+        "assert paths == sys.argv[2:]\n"
+        "with open(sys.argv[1], 'w') as output:\n"
+        "    for path in paths:\n"
+        "        output.write(open(path).read() + '\\n')\n"
+        "sys.exit(3)\n"
+    )
+    server = WalletServer(edtoken, mode=mode)
+    command = [sys.executable, "-c", script, str(output), "{}"]
+    assert server.serve("test", command) == 3
+
+    assert output.read_text() == "".join(
+        f"id={i}\npass=token_01\n" for i in range(3)
+    )
+    for i, directory in enumerate(["conf", "conf/nested", "conf/other"]):
+        assert (tmp_path / directory / "app.conf").read_text() == (
+            f"id={i}\npass={{?token}}"
+        )
+    assert not os.path.exists(tmp_path / "cache" / "renders")
+
+    # The files are not read by the command.
+    assert server.serve("test", ["true"]) == 0